@@ -0,0 +1,313 @@
+"""
+Bulk export of audit data for analytics.
+
+export_parquet() writes audit_logs rows and the JSONL audit events as
+zstd-compressed Parquet, partitioned by date (Hive-style date=YYYY-MM-DD
+directories). It is incremental: a state file records the last exported
+audit id and how far into each JSONL file the export has read, so each run
+only writes what is new.
+
+iter_log_chunks() streams audit rows in id order in bounded chunks; the
+/logs/export endpoint serves it as NDJSON or an Arrow IPC stream.
+
+Usage:
+    python -m backend.audit_export [--out data/export]
+"""
+import argparse
+import glob
+import heapq
+import io
+import json
+import logging
+import os
+import sqlite3
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend.audit_logger import committed_last_id, list_partitions, partition_day, partition_last_id
+from backend.audit_query import LOG_COLUMNS, _timestamp
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = "data/export"
+JSONL_PATTERN = "logs/audit_*.jsonl"
+
+# Rows per SQLite fetch, Parquet file and streamed chunk
+EXPORT_CHUNK_ROWS = 50000
+
+EVENT_COLUMNS = ("timestamp", "session_id", "prompt_length", "risk_score", "decision", "violation_count")
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet and Arrow export require the pyarrow package") from e
+    return pa, pc, pq
+
+
+def audit_schema():
+    pa, _, _ = _pyarrow()
+    return pa.schema([
+        ("id", pa.int64()),
+        ("timestamp", pa.timestamp("s")),
+        ("session_id", pa.string()),
+        ("risk_score", pa.float64()),
+        ("violation_type", pa.string()),
+        ("decision", pa.string()),
+        ("integrity_score", pa.float64()),
+        ("instruction_depth", pa.int64()),
+        ("violations", pa.int64()),
+        ("model", pa.string()),
+    ])
+
+
+def event_schema():
+    pa, _, _ = _pyarrow()
+    return pa.schema([
+        ("timestamp", pa.timestamp("us")),
+        ("session_id", pa.string()),
+        ("prompt_length", pa.int64()),
+        ("risk_score", pa.float64()),
+        ("decision", pa.string()),
+        ("violation_count", pa.int64()),
+    ])
+
+
+# ============================================================================
+# READING
+# ============================================================================
+def iter_log_chunks(
+    after_id: int = 0,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    chunk_rows: int = EXPORT_CHUNK_ROWS
+) -> Iterator[List[tuple]]:
+    """
+    Audit rows with id > after_id in ascending id order, chunk_rows at a
+    time. Ids come from one shared sequence in commit order, so only the
+    partitions written since after_id are read. Their rows are merged by id,
+    because a partition written late (e.g. just after midnight) interleaves
+    with the next day's. At most one chunk per partition is in memory.
+
+    Only ids up to committed_last_id(), read before any partition, are
+    returned. Each partition is read in its own snapshot, so a later id seen
+    in one could otherwise get ahead of a lower id still being committed to
+    another, and a caller resuming after the last id would skip that row.
+    """
+    clauses = ["id > ?", "id <= ?"]
+    params: List[Any] = [committed_last_id()]
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(_timestamp(since))
+    if until is not None:
+        clauses.append("timestamp < ?")
+        params.append(_timestamp(until))
+    sql = (
+        f"SELECT {', '.join(LOG_COLUMNS)} FROM audit_logs "
+        f"WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?"
+    )
+    since_day = partition_day(_timestamp(since)) if since is not None else None
+    until_day = partition_day(_timestamp(until)) if until is not None else None
+
+    def partition_rows(path: str) -> Iterator[tuple]:
+        try:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+        except sqlite3.OperationalError:
+            return
+        last_id = after_id
+        try:
+            while True:
+                rows = conn.execute(sql, (last_id, *params, chunk_rows)).fetchall()
+                yield from rows
+                if len(rows) < chunk_rows:
+                    break
+                last_id = rows[-1][0]
+        except sqlite3.OperationalError:
+            # Dropped by retention mid-export
+            pass
+        finally:
+            conn.close()
+
+    sources = [
+        partition_rows(path)
+        for day, path in list_partitions()
+        if not (day and ((since_day and day < since_day) or (until_day and day > until_day)))
+        and partition_last_id(path) > after_id
+    ]
+    chunk: List[tuple] = []
+    for row in heapq.merge(*sources, key=lambda row: row[0]):
+        chunk.append(row)
+        if len(chunk) == chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _rows_to_table(rows: List[tuple]):
+    pa, pc, _ = _pyarrow()
+    schema = audit_schema()
+    columns = list(zip(*rows))
+    arrays = []
+    for field, values in zip(schema, columns):
+        if field.name == "timestamp":
+            arrays.append(pc.strptime(pa.array(values, pa.string()), format="%Y-%m-%d %H:%M:%S", unit="s"))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+# ============================================================================
+# STREAMING
+# ============================================================================
+def stream_ndjson(**filters) -> Iterator[bytes]:
+    for rows in iter_log_chunks(**filters):
+        yield "".join(json.dumps(dict(zip(LOG_COLUMNS, row))) + "\n" for row in rows).encode()
+
+
+def stream_arrow(**filters) -> Iterator[bytes]:
+    """Arrow IPC stream: the schema, then one record batch per chunk"""
+    pa, _, _ = _pyarrow()
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, audit_schema())
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    yield drain()
+    for rows in iter_log_chunks(**filters):
+        for batch in _rows_to_table(rows).to_batches():
+            writer.write_batch(batch)
+        yield drain()
+    writer.close()
+    yield drain()
+
+
+# ============================================================================
+# INCREMENTAL PARQUET EXPORT
+# ============================================================================
+def _load_state(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"last_id": 0, "jsonl_offsets": {}}
+
+
+def _save_state(path: str, state: Dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _write_parquet(table, directory: str, name: str) -> None:
+    _, _, pq = _pyarrow()
+    os.makedirs(directory, exist_ok=True)
+    tmp = os.path.join(directory, f".{name}.tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, os.path.join(directory, name))
+
+
+def _export_logs(out_dir: str, state: Dict[str, Any], state_path: str) -> int:
+    exported = 0
+    for rows in iter_log_chunks(after_id=state["last_id"]):
+        by_date: Dict[str, List[tuple]] = defaultdict(list)
+        for row in rows:
+            by_date[row[1][:10]].append(row)
+        for date, date_rows in by_date.items():
+            _write_parquet(
+                _rows_to_table(date_rows),
+                os.path.join(out_dir, "audit_logs", f"date={date}"),
+                f"part-{date_rows[0][0]:012d}-{date_rows[-1][0]:012d}.parquet"
+            )
+        # State moves on only after the chunk's files are in place
+        state["last_id"] = rows[-1][0]
+        _save_state(state_path, state)
+        exported += len(rows)
+    return exported
+
+
+def _export_events(out_dir: str, state: Dict[str, Any], state_path: str, pattern: str) -> int:
+    pa, _, _ = _pyarrow()
+    exported = 0
+    offsets = state.setdefault("jsonl_offsets", {})
+
+    for path in sorted(glob.glob(pattern)):
+        name = os.path.basename(path)
+        offset = offsets.get(name, 0)
+        if os.path.getsize(path) <= offset:
+            continue
+
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while True:
+                lines = f.readlines(EXPORT_CHUNK_ROWS * 200)
+                # A partial last line is still being written; leave it
+                while lines and not lines[-1].endswith(b"\n"):
+                    lines.pop()
+                if not lines:
+                    break
+
+                events = [json.loads(line) for line in lines if line.strip()]
+                if events:
+                    columns = {column: [event.get(column) for event in events] for column in EVENT_COLUMNS}
+                    columns["timestamp"] = [datetime.fromisoformat(ts) for ts in columns["timestamp"]]
+                    table = pa.Table.from_pydict(columns, schema=event_schema())
+                    date = events[0]["timestamp"][:10]
+                    _write_parquet(
+                        table,
+                        os.path.join(out_dir, "audit_events", f"date={date}"),
+                        f"part-{name[:-6]}-{offset:012d}.parquet"
+                    )
+                    exported += len(events)
+
+                offset += sum(len(line) for line in lines)
+                offsets[name] = offset
+                _save_state(state_path, state)
+                f.seek(offset)
+
+    # Forget files removed by retention
+    for name in list(offsets):
+        if not os.path.exists(os.path.join(os.path.dirname(pattern), name)):
+            del offsets[name]
+    _save_state(state_path, state)
+    return exported
+
+
+def export_parquet(out_dir: str = EXPORT_DIR, jsonl_pattern: str = JSONL_PATTERN) -> Dict[str, int]:
+    """Export everything new since the last run; returns rows written per dataset"""
+    os.makedirs(out_dir, exist_ok=True)
+    state_path = os.path.join(out_dir, "_export_state.json")
+    state = _load_state(state_path)
+
+    result = {
+        "audit_logs": _export_logs(out_dir, state, state_path),
+        "audit_events": _export_events(out_dir, state, state_path, jsonl_pattern)
+    }
+    logger.info(f"Exported {result} to {out_dir} (last audit id {state['last_id']})")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental Parquet export of Bastion audit data")
+    parser.add_argument("--out", default=EXPORT_DIR)
+    parser.add_argument("--jsonl", default=JSONL_PATTERN)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(export_parquet(args.out, args.jsonl))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,332 @@
 import sqlite3
 import os
-from datetime import datetime
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
 
+logger = logging.getLogger(__name__)
+
+# Legacy single-file database, read as the oldest partition
 DB_PATH = "data/bastion.db"
 LOG_FILE = "logs/bastion.log"
 
+# One SQLite file per UTC day; retention drops whole files
+AUDIT_DIR = "data/audit"
+PARTITION_PREFIX = "audit_"
+# Shared audit id source, attached to every partition connection
+SEQUENCE_FILE = "sequence.db"
+
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS audit_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        session_id TEXT,
+        risk_score REAL,
+        violation_type TEXT,
+        decision TEXT,
+        integrity_score REAL,
+        instruction_depth INTEGER,
+        violations INTEGER
+    )
+"""
+
 
 def init_db():
     os.makedirs("data", exist_ok=True)
+    os.makedirs(AUDIT_DIR, exist_ok=True)
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS audit_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            session_id TEXT,
-            risk_score REAL,
-            violation_type TEXT,
-            decision TEXT,
-            integrity_score REAL,
-            instruction_depth INTEGER,
-            violations INTEGER
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    # The pre-partitioning database stays readable as the oldest partition
+    if os.path.exists(DB_PATH):
+        conn = sqlite3.connect(DB_PATH)
+        migrate(conn)
+        conn.close()
 
+    open_partition(partition_day(datetime.utcnow().strftime("%Y-%m-%d"))).close()
 
-def insert_log(
+
+# ============================================================================
+# SCHEMA MIGRATIONS
+# ============================================================================
+# Applied in order; PRAGMA user_version records the last one applied
+MIGRATIONS = [
+    # 1: indexes for the audit query API. Each ends in id so filtered
+    # queries can walk it in keyset order without sorting
+    [
+        "CREATE INDEX IF NOT EXISTS idx_audit_session ON audit_logs (session_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_decision ON audit_logs (decision, id)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_violation_type ON audit_logs (violation_type, id)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_logs (timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_risk ON audit_logs (risk_score, id)",
+    ],
+    # 2: model column and per-minute rollups, backfilled from existing rows
+    [
+        "ALTER TABLE audit_logs ADD COLUMN model TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_audit_model ON audit_logs (model, id)",
+        """
+        CREATE TABLE IF NOT EXISTS rollup_minutes (
+            minute TEXT,
+            dimension TEXT,
+            value TEXT,
+            count INTEGER,
+            PRIMARY KEY (minute, dimension, value)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT OR IGNORE INTO rollup_minutes
+        SELECT substr(timestamp, 1, 16), 'total', '', COUNT(*) FROM audit_logs
+        GROUP BY 1
+        """,
+        """
+        INSERT OR IGNORE INTO rollup_minutes
+        SELECT substr(timestamp, 1, 16), 'decision', decision, COUNT(*) FROM audit_logs
+        GROUP BY 1, 3
+        """,
+        """
+        INSERT OR IGNORE INTO rollup_minutes
+        SELECT substr(timestamp, 1, 16), 'violation_type', violation_type, COUNT(*) FROM audit_logs
+        GROUP BY 1, 3
+        """,
+        """
+        INSERT OR IGNORE INTO rollup_minutes
+        SELECT substr(timestamp, 1, 16), 'risk_bucket',
+               CAST(MIN(CAST(risk_score * 10 AS INTEGER), 9) AS TEXT), COUNT(*)
+        FROM audit_logs WHERE risk_score IS NOT NULL
+        GROUP BY 1, 3
+        """,
+    ],
+]
+
+
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+        with conn:
+            for statement in statements:
+                try:
+                    conn.execute(statement)
+                except sqlite3.OperationalError as e:
+                    # Another worker applied this ALTER first
+                    if "duplicate column" not in str(e):
+                        raise
+            conn.execute(f"PRAGMA user_version = {number}")
+        logger.info(f"Applied audit schema migration {number}")
+
+
+# ============================================================================
+# DAILY PARTITIONS
+# ============================================================================
+def partition_day(timestamp: str) -> str:
+    """'2024-05-01 12:00:00' -> '20240501'"""
+    return timestamp[:10].replace("-", "")
+
+
+def partition_path(day: str) -> str:
+    return os.path.join(AUDIT_DIR, f"{PARTITION_PREFIX}{day}.db")
+
+
+def list_partitions() -> List[Tuple[str, str]]:
+    """(day, path) newest first; the legacy database comes last with day ''"""
+    partitions = []
+    if os.path.isdir(AUDIT_DIR):
+        for name in os.listdir(AUDIT_DIR):
+            if name.startswith(PARTITION_PREFIX) and name.endswith(".db"):
+                partitions.append((name[len(PARTITION_PREFIX):-3], os.path.join(AUDIT_DIR, name)))
+    partitions.sort(reverse=True)
+    if os.path.exists(DB_PATH):
+        partitions.append(("", DB_PATH))
+    return partitions
+
+
+def sequence_path() -> str:
+    return os.path.join(AUDIT_DIR, SEQUENCE_FILE)
+
+
+SEQUENCE_SCHEMA = "CREATE TABLE IF NOT EXISTS seq.audit_sequence (last_id INTEGER NOT NULL)"
+
+
+def committed_last_id() -> int:
+    """
+    Highest audit id whose row is committed. The sequence is updated in the
+    same transaction as the rows and committed after the partition (SQLite
+    commits the main database before attached ones), so every id up to
+    this one is visible to a read started afterwards, in any partition.
+    """
+    try:
+        conn = sqlite3.connect(f"file:{sequence_path()}?mode=ro", uri=True)
+    except sqlite3.OperationalError:
+        # Nothing written through the shared sequence yet
+        return max((partition_last_id(path) for _, path in list_partitions()), default=0)
+    try:
+        row = conn.execute("SELECT last_id FROM audit_sequence").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    if row is None:
+        return max((partition_last_id(path) for _, path in list_partitions()), default=0)
+    return row[0]
+
+
+def partition_last_id(path: str) -> int:
+    """Highest audit id ever written to the partition at path (0 if none)"""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.OperationalError:
+        # Dropped by retention
+        return 0
+    try:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'audit_logs'").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    return row[0] if row else 0
+
+
+def open_partition(day: str) -> sqlite3.Connection:
+    """
+    Connection to the partition for day, creating it if needed, with the
+    shared sequence database attached as "seq". Ids come from that one
+    sequence (see write_rows), so they increase in commit order across
+    partitions and workers, whichever day a row belongs to.
+    """
+    path = partition_path(day)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(SCHEMA)
+    migrate(conn)
+    conn.execute("ATTACH DATABASE ? AS seq", (sequence_path(),))
+    conn.execute("PRAGMA seq.journal_mode=WAL")
+
+    with conn:
+        # Serialized, so concurrent workers seed the sequence once
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(SEQUENCE_SCHEMA)
+        if conn.execute("SELECT 1 FROM seq.audit_sequence").fetchone() is None:
+            # First use: continue after every id already written
+            seed = max((partition_last_id(p) for _, p in list_partitions()), default=0)
+            conn.execute("INSERT INTO seq.audit_sequence (last_id) VALUES (?)", (seed,))
+    return conn
+
+
+def drop_expired_partitions(retention_days: int) -> List[str]:
+    """Delete partition files older than retention_days; returns the days dropped"""
+    if retention_days <= 0:
+        return []
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime("%Y%m%d")
+    dropped = []
+    for day, path in list_partitions():
+        if day and day < cutoff:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(path + suffix)
+                except FileNotFoundError:
+                    pass
+            dropped.append(day)
+    if dropped:
+        logger.info(f"Dropped expired audit partitions: {', '.join(sorted(dropped))}")
+    return dropped
+
+
+INSERT_SQL = """
+    INSERT INTO audit_logs (
+        timestamp,
+        session_id,
+        risk_score,
+        violation_type,
+        decision,
+        integrity_score,
+        instruction_depth,
+        violations,
+        model
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+ROW_LENGTH = 9
+
+INSERT_WITH_ID_SQL = """
+    INSERT INTO audit_logs (
+        id,
+        timestamp,
+        session_id,
+        risk_score,
+        violation_type,
+        decision,
+        integrity_score,
+        instruction_depth,
+        violations,
+        model
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Reserve ids: the sequence stays locked until the rows commit, so ids are
+# handed out in commit order. A partition already past the sequence (its
+# rows committed but the sequence update lost in a crash) moves it forward.
+RESERVE_IDS_SQL = """
+    UPDATE seq.audit_sequence SET last_id = max(
+        last_id, COALESCE((SELECT seq FROM main.sqlite_sequence WHERE name = 'audit_logs'), 0)
+    ) + ?
+"""
+
+
+# ============================================================================
+# PER-MINUTE ROLLUPS
+# ============================================================================
+# Counts per minute for each decision, violation_type, model and risk
+# bucket, kept in the same partition and transaction as the rows
+RISK_BUCKETS = 10
+
+ROLLUP_UPSERT_SQL = """
+    INSERT INTO rollup_minutes (minute, dimension, value, count) VALUES (?, ?, ?, ?)
+    ON CONFLICT (minute, dimension, value) DO UPDATE SET count = count + excluded.count
+"""
+
+
+def risk_bucket(risk_score) -> int:
+    return min(int(risk_score * RISK_BUCKETS), RISK_BUCKETS - 1)
+
+
+def rollup_increments(rows) -> List[Tuple[str, str, str, int]]:
+    """Aggregate audit rows into (minute, dimension, value, count) upserts"""
+    counts: Dict[Tuple[str, str, str], int] = {}
+
+    def add(key):
+        counts[key] = counts.get(key, 0) + 1
+
+    for row in rows:
+        timestamp, _, risk_score, violation_type, decision = row[:5]
+        model = row[8] if len(row) > 8 else None
+        minute = timestamp[:16]
+        add((minute, "total", ""))
+        add((minute, "decision", decision))
+        add((minute, "violation_type", violation_type))
+        if model is not None:
+            add((minute, "model", model))
+        if risk_score is not None:
+            add((minute, "risk_bucket", str(risk_bucket(risk_score))))
+    return [(*key, count) for key, count in counts.items()]
+
+
+def write_rows(conn: sqlite3.Connection, rows) -> None:
+    """
+    Insert audit rows, with ids from the shared sequence, and their rollup
+    increments in one transaction. conn comes from open_partition().
+    """
+    rows = list(rows)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(RESERVE_IDS_SQL, (len(rows),))
+        last_id = conn.execute("SELECT last_id FROM seq.audit_sequence").fetchone()[0]
+        first_id = last_id - len(rows) + 1
+        conn.executemany(INSERT_WITH_ID_SQL, ((first_id + i, *row) for i, row in enumerate(rows)))
+        conn.executemany(ROLLUP_UPSERT_SQL, rollup_increments(rows))
+
+
+def build_log_record(
     session_id,
     risk_score,
     violation_type,
@@ -38,26 +334,12 @@ def insert_log(
     integrity_score,
     instruction_depth,
     violations,
-    module_name="RiskEngine"
+    module_name="RiskEngine",
+    model=None
 ):
+    """Return (row, log_line) for one audit event"""
     timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO audit_logs (
-            timestamp,
-            session_id,
-            risk_score,
-            violation_type,
-            decision,
-            integrity_score,
-            instruction_depth,
-            violations
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+    row = (
         timestamp,
         session_id,
         risk_score,
@@ -65,44 +347,40 @@ def insert_log(
         decision,
         integrity_score,
         instruction_depth,
-        violations
-    ))
+        violations,
+        model
+    )
+    line = (
+        f"{timestamp} | session={session_id} | {module_name} | "
+        f"risk_score={risk_score} | violation={violation_type} | "
+        f"decision={decision} | integrity_score={integrity_score} | "
+        f"instruction_depth={instruction_depth} | violations={violations}\n"
+    )
+    return row, line
 
-    conn.commit()
+
+def insert_log(
+    session_id,
+    risk_score,
+    violation_type,
+    decision,
+    integrity_score,
+    instruction_depth,
+    violations,
+    module_name="RiskEngine",
+    model=None
+):
+    """Synchronous single-row write; the API uses AuditWriter instead"""
+    row, line = build_log_record(
+        session_id, risk_score, violation_type, decision,
+        integrity_score, instruction_depth, violations, module_name, model
+    )
+
+    conn = open_partition(partition_day(row[0]))
+    write_rows(conn, [row])
     conn.close()
 
     # Structured file log
     os.makedirs("logs", exist_ok=True)
     with open(LOG_FILE, "a") as f:
-        f.write(
-            f"{timestamp} | session={session_id} | {module_name} | "
-            f"risk_score={risk_score} | violation={violation_type} | "
-            f"decision={decision} | integrity_score={integrity_score} | "
-            f"instruction_depth={instruction_depth} | violations={violations}\n"
-        )
-
-
-def get_logs(session_id):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT timestamp, risk_score, decision, integrity_score
-        FROM audit_logs
-        WHERE session_id = ?
-        ORDER BY id DESC
-    """, (session_id,))
-
-    rows = cursor.fetchall()
-    conn.close()
-
-    result = []
-    for row in rows:
-        result.append({
-            "timestamp": row[0],
-            "risk_score": row[1],
-            "decision": row[2],
-            "integrity_score": row[3]
-        })
-
-    return result
+        f.write(line)
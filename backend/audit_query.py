@@ -0,0 +1,312 @@
+import os
+import queue
+import sqlite3
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from backend.audit_logger import RISK_BUCKETS, list_partitions, partition_day
+
+MAX_PAGE_SIZE = 1000
+
+LOG_COLUMNS = (
+    "id", "timestamp", "session_id", "risk_score", "violation_type",
+    "decision", "integrity_score", "instruction_depth", "violations", "model"
+)
+
+# Rollups are per minute; /stats merges them into at most this many buckets
+MAX_STATS_POINTS = 1440
+
+# Open partition connections kept per pooled reader
+MAX_OPEN_PARTITIONS = 8
+
+
+class PartitionReader:
+    """
+    Read-only connections to the audit partitions, opened on first use.
+    At most max_open stay open, least recently used closed first, so file
+    descriptors do not grow with the number of days kept.
+    """
+
+    def __init__(self, max_open: int = MAX_OPEN_PARTITIONS):
+        self.max_open = max(max_open, 1)
+        self._conns: "OrderedDict[str, sqlite3.Connection]" = OrderedDict()
+
+    def conn(self, path: str) -> sqlite3.Connection:
+        conn = self._conns.get(path)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            self._conns[path] = conn
+            while len(self._conns) > self.max_open:
+                self._conns.popitem(last=False)[1].close()
+        else:
+            self._conns.move_to_end(path)
+        return conn
+
+    def forget(self, path: str) -> None:
+        conn = self._conns.pop(path, None)
+        if conn is not None:
+            conn.close()
+
+    def prune(self, live_paths) -> None:
+        """Close connections to partitions dropped by retention"""
+        for path in set(self._conns) - set(live_paths):
+            self._conns.pop(path).close()
+
+    def close(self) -> None:
+        self.prune(())
+
+
+class ReadPool:
+    """
+    Fixed set of readers shared by request threads. WAL mode lets them
+    read while the audit writer commits.
+    """
+
+    def __init__(self, size: int = 4, max_open: int = MAX_OPEN_PARTITIONS):
+        self._pool: "queue.Queue[PartitionReader]" = queue.Queue()
+        for _ in range(size):
+            self._pool.put(PartitionReader(max_open))
+        self.size = size
+
+    @contextmanager
+    def reader(self):
+        reader = self._pool.get()
+        try:
+            yield reader
+        finally:
+            self._pool.put(reader)
+
+    def close(self) -> None:
+        for _ in range(self.size):
+            self._pool.get().close()
+
+
+def _timestamp(value: str) -> str:
+    """Accept ISO 8601 ('T' separator) as well as the stored format"""
+    return value.replace("T", " ")[:19]
+
+
+LAST_ID_SQL = "SELECT seq FROM sqlite_sequence WHERE name = 'audit_logs'"
+
+
+def _dropped(reader: PartitionReader, path: str) -> bool:
+    """
+    After an OperationalError reading path: True if the partition was
+    dropped by retention since it was listed. Anything else (locked,
+    corrupt, wrong schema) must be raised, not answered with a page that
+    is silently missing rows.
+    """
+    if os.path.exists(path):
+        return False
+    reader.forget(path)
+    return True
+
+
+def query_logs(
+    pool: ReadPool,
+    session_id: Optional[str] = None,
+    decision: Optional[str] = None,
+    violation_type: Optional[str] = None,
+    model: Optional[str] = None,
+    min_risk: Optional[float] = None,
+    max_risk: Optional[float] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = 100
+) -> Dict[str, Any]:
+    """
+    Newest-first audit rows matching every given filter.
+
+    Pagination is by keyset: pass the returned next_after_id as after_id to
+    get the following page. Each page is an index range scan starting below
+    after_id, so its cost does not grow with how deep the caller has paged.
+    Partitions are read newest first until the page is full; a time range
+    skips the daily partitions outside it. Ids come from one shared
+    sequence, so an older partition written late (e.g. just after
+    midnight) can hold higher ids; it is still read unless its highest id
+    is below the page.
+    """
+    clauses = []
+    params: List[Any] = []
+
+    if session_id is not None:
+        clauses.append("session_id = ?")
+        params.append(session_id)
+    if decision is not None:
+        clauses.append("decision = ?")
+        params.append(decision)
+    if violation_type is not None:
+        clauses.append("violation_type = ?")
+        params.append(violation_type)
+    if model is not None:
+        clauses.append("model = ?")
+        params.append(model)
+    if min_risk is not None:
+        clauses.append("risk_score >= ?")
+        params.append(min_risk)
+    if max_risk is not None:
+        clauses.append("risk_score <= ?")
+        params.append(max_risk)
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(_timestamp(since))
+    if until is not None:
+        clauses.append("timestamp < ?")
+        params.append(_timestamp(until))
+    if after_id is not None:
+        clauses.append("id < ?")
+        params.append(after_id)
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = f"SELECT {', '.join(LOG_COLUMNS)} FROM audit_logs {where} ORDER BY id DESC LIMIT ?"
+
+    since_day = partition_day(_timestamp(since)) if since is not None else None
+    until_day = partition_day(_timestamp(until)) if until is not None else None
+
+    rows: List[tuple] = []
+    with pool.reader() as reader:
+        partitions = list_partitions()
+        reader.prune(path for _, path in partitions)
+        for day, path in partitions:
+            if day and ((since_day and day < since_day) or (until_day and day > until_day)):
+                continue
+            try:
+                conn = reader.conn(path)
+                if len(rows) >= limit:
+                    rows.sort(key=lambda row: row[0], reverse=True)
+                    del rows[limit:]
+                    last = conn.execute(LAST_ID_SQL).fetchone()
+                    if not last or last[0] < rows[-1][0]:
+                        continue
+                rows.extend(conn.execute(sql, (*params, limit)).fetchall())
+            except sqlite3.OperationalError:
+                if not _dropped(reader, path):
+                    raise
+
+    rows.sort(key=lambda row: row[0], reverse=True)
+    rows = rows[:limit]
+
+    logs = [dict(zip(LOG_COLUMNS, row)) for row in rows]
+    return {
+        "logs": logs,
+        "count": len(logs),
+        "next_after_id": logs[-1]["id"] if len(logs) == limit else None
+    }
+
+
+def _parse_time(value: str) -> datetime:
+    """Date, minute or second precision, ISO or stored format"""
+    value = _timestamp(value)
+    return datetime.strptime(value + " 00:00:00"[len(value) - 10:] if len(value) < 19 else value, "%Y-%m-%d %H:%M:%S")
+
+
+def query_stats(
+    pool: ReadPool,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    max_points: int = 60
+) -> Dict[str, Any]:
+    """
+    Time-bucketed counts from the per-minute rollups, never from audit_logs.
+    The range [since, until) is half-open, both ends truncated to the
+    minute, so adjacent ranges never share a minute. It defaults to the
+    last hour up to and including the current minute, and is split into at
+    most max_points buckets of whole minutes (downsampling by summation).
+    """
+    if until:
+        end = _parse_time(until).replace(second=0, microsecond=0)
+    else:
+        end = datetime.utcnow().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    start = _parse_time(since) if since else end - timedelta(hours=1)
+    start = start.replace(second=0, microsecond=0)
+    if end <= start:
+        raise ValueError("until must be at least a minute after since")
+
+    minutes = int((end - start).total_seconds() // 60)
+    max_points = max(1, min(max_points, MAX_STATS_POINTS))
+    bucket_minutes = -(-minutes // max_points)
+    bucket_count = -(-minutes // bucket_minutes)
+
+    def empty_bucket(i: int) -> Dict[str, Any]:
+        return {
+            "start": (start + timedelta(minutes=i * bucket_minutes)).strftime("%Y-%m-%d %H:%M"),
+            "total": 0,
+            "decision": {},
+            "violation_type": {},
+            "model": {},
+            "risk_histogram": [0] * RISK_BUCKETS
+        }
+
+    buckets = [empty_bucket(i) for i in range(bucket_count)]
+    start_minute = start.strftime("%Y-%m-%d %H:%M")
+    end_minute = end.strftime("%Y-%m-%d %H:%M")
+    start_day = partition_day(start_minute)
+    end_day = partition_day((end - timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M"))
+
+    sql = (
+        "SELECT minute, dimension, value, count FROM rollup_minutes "
+        "WHERE minute >= ? AND minute < ?"
+    )
+    with pool.reader() as reader:
+        partitions = list_partitions()
+        reader.prune(path for _, path in partitions)
+        for day, path in partitions:
+            if day and (day < start_day or day > end_day):
+                continue
+            try:
+                rows = reader.conn(path).execute(sql, (start_minute, end_minute)).fetchall()
+            except sqlite3.OperationalError:
+                if not _dropped(reader, path):
+                    raise
+                continue
+
+            for minute, dimension, value, count in rows:
+                offset = int((datetime.strptime(minute, "%Y-%m-%d %H:%M") - start).total_seconds() // 60)
+                bucket = buckets[min(offset // bucket_minutes, bucket_count - 1)]
+                if dimension == "total":
+                    bucket["total"] += count
+                elif dimension == "risk_bucket":
+                    bucket["risk_histogram"][int(value)] += count
+                else:
+                    counts = bucket[dimension]
+                    counts[value] = counts.get(value, 0) + count
+
+    totals = empty_bucket(0)
+    for bucket in buckets:
+        blocked = bucket["decision"].get("block", 0)
+        bucket["block_rate"] = round(blocked / bucket["total"], 4) if bucket["total"] else 0.0
+        totals["total"] += bucket["total"]
+        for dimension in ("decision", "violation_type", "model"):
+            for value, count in bucket[dimension].items():
+                totals[dimension][value] = totals[dimension].get(value, 0) + count
+        totals["risk_histogram"] = [a + b for a, b in zip(totals["risk_histogram"], bucket["risk_histogram"])]
+
+    del totals["start"]
+    totals["block_rate"] = round(totals["decision"].get("block", 0) / totals["total"], 4) if totals["total"] else 0.0
+    return {
+        "since": start_minute,
+        "until": end_minute,
+        "bucket_minutes": bucket_minutes,
+        "series": buckets,
+        "totals": totals
+    }
+
+
+SESSION_LOG_FIELDS = ("timestamp", "risk_score", "decision", "integrity_score")
+
+
+def session_logs(pool: ReadPool, session_id: str) -> List[Dict[str, Any]]:
+    """Every audit row of one session, newest first, paged through query_logs"""
+    result = []
+    after_id = None
+    while True:
+        page = query_logs(pool, session_id=session_id, after_id=after_id, limit=MAX_PAGE_SIZE)
+        result.extend({field: log[field] for field in SESSION_LOG_FIELDS} for log in page["logs"])
+        after_id = page["next_after_id"]
+        if after_id is None:
+            return result
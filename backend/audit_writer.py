@@ -0,0 +1,413 @@
+import glob
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from backend.audit_logger import (
+    LOG_FILE, ROW_LENGTH, open_partition, partition_day, drop_expired_partitions, write_rows
+)
+from backend.log_files import rotate_if_needed, drop_expired_files
+from backend.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "spill", "drop")
+
+# Seconds between retention sweeps of expired partitions and log files
+RETENTION_CHECK_INTERVAL = 3600
+
+
+def spill_owner(path: str, root: str, ext: str):
+    """
+    pid of the process that owns a spill file (its writer, or the replay
+    that claimed it), None for a file from before spill files were per
+    process, False if path is not a spill file
+    """
+    name, _, claimer = path.partition(".replay-")
+    if claimer:
+        return int(claimer) if claimer.isdigit() else False
+    if name in (root + ext, root + ext + ".replay"):
+        return None
+    pid = name[len(root) + 1:-len(ext) or None]
+    if name.startswith(root + ".") and name.endswith(ext) and pid.isdigit():
+        return int(pid)
+    return False
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AuditRecord(NamedTuple):
+    row: tuple                          # audit_logs columns, see INSERT_SQL
+    log_line: str                       # line for logs/bastion.log
+    jsonl_path: Optional[str] = None    # legacy JSONL audit file, if any
+    jsonl_line: Optional[str] = None
+
+
+class AuditWriter:
+    """
+    Background writer for audit records.
+
+    Records are queued in memory and written by one thread over one
+    persistent WAL connection per daily partition, many rows per
+    transaction: a batch is committed once it reaches batch_size or
+    flush_interval_ms after its first record. The text logs are appended
+    in the same pass.
+
+    The same thread enforces retention: bastion.log is rotated by size,
+    and partitions and JSONL files older than retention_days are deleted.
+
+    When the queue is full, overflow decides what submit() does:
+        block - wait for room (backpressure onto the caller)
+        spill - append the record to spill_path; replayed when idle
+        drop  - discard the record and count it
+
+    Rows whose partition write fails are spilled as well (without their
+    already written log lines) and retried on the next replay.
+
+    Each process spills to its own file, spill_path with the pid before
+    the extension. A replay claims the file by renaming it, and also
+    claims the files of processes that are gone. Records that can never be
+    written (malformed rows, spilled lines cut short by a crash) are set
+    aside in the .rejected file next to it.
+    """
+
+    def __init__(
+        self,
+        log_file: str = LOG_FILE,
+        max_queue: int = 10000,
+        batch_size: int = 256,
+        flush_interval_ms: float = 50.0,
+        overflow: str = "block",
+        spill_path: str = "data/audit_spill.jsonl",
+        retention_days: int = 0,
+        log_max_bytes: int = 0,
+        log_backups: int = 5,
+        jsonl_pattern: str = "logs/audit_*.jsonl"
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy: {overflow}")
+        self.log_file = log_file
+        self.retention_days = retention_days
+        self.log_max_bytes = log_max_bytes
+        self.log_backups = log_backups
+        self.jsonl_pattern = jsonl_pattern
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval_ms / 1000
+        self.overflow = overflow
+        self.spill_root, self.spill_ext = os.path.splitext(spill_path)
+        self.spill_path = f"{self.spill_root}.{os.getpid()}{self.spill_ext}"
+
+        self._queue: "queue.Queue[Optional[AuditRecord]]" = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._conns: Dict[str, sqlite3.Connection] = {}
+        self._next_retention_check = 0.0
+
+        self.written = 0
+        self.batches = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.errors = 0
+        self.rejected = 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Write everything still queued, then stop"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._replay_spill()
+        for conn in self._conns.values():
+            conn.close()
+        self._conns.clear()
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def submit(self, record: AuditRecord) -> None:
+        if self.overflow == "block":
+            self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow == "spill":
+                self._spill(record)
+            else:
+                with self._stats_lock:
+                    self.dropped += 1
+
+    def _spill(self, record: AuditRecord) -> None:
+        try:
+            line = json.dumps(record) + "\n"
+        except (TypeError, ValueError) as e:
+            logger.error(f"Audit record cannot be spilled, dropping it: {e}")
+            with self._stats_lock:
+                self.dropped += 1
+            return
+        with self._spill_lock:
+            with open(self.spill_path, "a") as f:
+                f.write(line)
+        with self._stats_lock:
+            self.spilled += 1
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                self._idle()
+                continue
+
+            stopping = first is None
+            batch: List[AuditRecord] = [] if stopping else [first]
+            deadline = time.monotonic() + self.flush_interval
+            while not stopping and len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    record = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopping = True
+                    break
+                batch.append(record)
+
+            # Drain whatever is left on shutdown
+            if stopping:
+                while True:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is not None:
+                        batch.append(record)
+
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    # The thread must survive a bad record, or submit() blocks forever
+                    logger.error(f"Audit batch of {len(batch)} records failed, spilling for retry: {e}")
+                    with self._stats_lock:
+                        self.errors += 1
+                    for record in batch:
+                        self._spill(record)
+            if stopping:
+                return
+            self._idle()
+
+    def _idle(self) -> None:
+        """Retention sweep, then replay of spilled records if the queue is empty"""
+        try:
+            self._enforce_retention()
+            if self._queue.empty():
+                self._replay_spill()
+        except Exception as e:
+            logger.error(f"Audit writer maintenance failed: {e}")
+
+    def _partition(self, day: str) -> sqlite3.Connection:
+        conn = self._conns.get(day)
+        if conn is None:
+            conn = open_partition(day)
+            self._conns[day] = conn
+            # Only today's and (around midnight) yesterday's stay open
+            for old in sorted(self._conns)[:-2]:
+                self._conns.pop(old).close()
+        return conn
+
+    def _write(self, batch: List[AuditRecord]) -> None:
+        by_day: Dict[str, List[AuditRecord]] = defaultdict(list)
+        for record in batch:
+            try:
+                by_day[partition_day(record.row[0])].append(record)
+            except (TypeError, ValueError, IndexError) as e:
+                self._reject([record], e)
+        written = 0
+        for day, records in by_day.items():
+            try:
+                with timed("audit_db"):
+                    write_rows(self._partition(day), [record.row for record in records])
+                written += len(records)
+            except sqlite3.OperationalError as e:
+                # Locked, full or unreachable: worth retrying later
+                logger.error(f"Audit batch of {len(records)} rows for {day} failed, spilling for retry: {e}")
+                conn = self._conns.pop(day, None)
+                if conn is not None:
+                    conn.close()
+                for record in records:
+                    # The text logs below still get this record's lines
+                    self._spill(AuditRecord(record.row, ""))
+                with self._stats_lock:
+                    self.errors += 1
+            except Exception as e:
+                # A malformed row fails again on every retry: write the
+                # rows one by one and set aside those that fail
+                logger.error(f"Audit batch of {len(records)} rows for {day} failed, writing rows singly: {e}")
+                with self._stats_lock:
+                    self.errors += 1
+                for record in records:
+                    try:
+                        write_rows(self._partition(day), [record.row])
+                        written += 1
+                    except Exception as e:
+                        self._reject([record], e)
+
+        try:
+            with timed("audit_log_file"):
+                with open(self.log_file, "a") as f:
+                    f.write("".join(record.log_line for record in batch))
+                rotate_if_needed(self.log_file, self.log_max_bytes, self.log_backups)
+
+            with timed("audit_jsonl"):
+                jsonl: Dict[str, List[str]] = defaultdict(list)
+                for record in batch:
+                    if record.jsonl_path:
+                        jsonl[record.jsonl_path].append(record.jsonl_line)
+                for path, lines in jsonl.items():
+                    with open(path, "a") as f:
+                        f.write("".join(lines))
+        except (OSError, TypeError) as e:
+            # The rows are committed, so the batch is not spilled again
+            logger.error(f"Audit file write failed: {e}")
+            with self._stats_lock:
+                self.errors += 1
+
+        with self._stats_lock:
+            self.written += written
+            self.batches += 1
+
+    def _reject(self, records: List[AuditRecord], error: Exception) -> None:
+        """Set records that can never be written aside in the .rejected file"""
+        lines = []
+        for record in records:
+            try:
+                lines.append(json.dumps(record) + "\n")
+            except (TypeError, ValueError):
+                lines.append(repr(record) + "\n")
+        self._write_rejected(lines)
+        logger.error(f"Set aside {len(records)} audit records that cannot be written: {error}")
+
+    def _write_rejected(self, lines: List[str]) -> None:
+        with self._spill_lock:
+            with open(f"{self.spill_root}.rejected{self.spill_ext}", "a") as f:
+                f.write("".join(lines))
+        with self._stats_lock:
+            self.rejected += len(lines)
+
+    def _enforce_retention(self) -> None:
+        now = time.monotonic()
+        if now < self._next_retention_check:
+            return
+        self._next_retention_check = now + RETENTION_CHECK_INTERVAL
+        try:
+            for day in drop_expired_partitions(self.retention_days):
+                conn = self._conns.pop(day, None)
+                if conn is not None:
+                    conn.close()
+            drop_expired_files(self.jsonl_pattern, self.retention_days)
+        except OSError as e:
+            logger.error(f"Audit retention sweep failed: {e}")
+
+    def _claim_spills(self) -> List[str]:
+        """
+        Rename this process's spill file, and those of processes that are
+        gone, to <file>.replay-<pid>. Whoever renames a file replays it.
+        """
+        pid = os.getpid()
+        claimed = []
+        for path in sorted(glob.glob(f"{glob.escape(self.spill_root)}*{self.spill_ext}*")):
+            owner = spill_owner(path, self.spill_root, self.spill_ext)
+            if owner is False:
+                continue
+            if owner == pid:
+                if ".replay-" in path:
+                    # An earlier replay of ours was interrupted
+                    claimed.append(path)
+                    continue
+            elif owner is not None and pid_alive(owner):
+                continue
+            source = path.split(".replay-")[0]
+            target = f"{source}.replay-{pid}"
+            try:
+                with self._spill_lock:
+                    os.replace(path, target)
+            except FileNotFoundError:
+                # Claimed by another worker first
+                continue
+            claimed.append(target)
+        return claimed
+
+    def _replay_spill(self) -> None:
+        """Move spilled records into the database once the queue has room"""
+        for replaying in self._claim_spills():
+            try:
+                self._replay_file(replaying)
+            except Exception as e:
+                logger.error(f"Replay of spilled audit records from {replaying} failed: {e}")
+                with self._stats_lock:
+                    self.errors += 1
+
+    def _replay_file(self, replaying: str) -> None:
+        records: List[AuditRecord] = []
+        rejected: List[str] = []
+        with open(replaying, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row, *rest = json.loads(line)
+                    # Rows spilled before a schema change are padded with NULLs
+                    records.append(AuditRecord(tuple(row) + (None,) * (ROW_LENGTH - len(row)), *rest))
+                except (ValueError, TypeError):
+                    rejected.append(line if line.endswith("\n") else line + "\n")
+        if rejected:
+            self._write_rejected(rejected)
+            logger.error(f"Set aside {len(rejected)} undecodable spilled audit lines from {replaying}")
+
+        for start in range(0, len(records), self.batch_size):
+            self._write(records[start:start + self.batch_size])
+        os.remove(replaying)
+        logger.info(f"Replayed {len(records)} spilled audit records")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "overflow": self.overflow,
+                "written": self.written,
+                "batches": self.batches,
+                "avg_batch": round(self.written / self.batches, 2) if self.batches else 0.0,
+                "spilled": self.spilled,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+                "errors": self.errors
+            }
@@ -1,32 +1,123 @@
-from backend.audit_logger import init_db, get_logs as get_session_logs
-from fastapi import FastAPI, HTTPException
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from backend.audit_logger import init_db
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 import logging
 from datetime import datetime
 import json
 import os
-import uuid
-import sqlite3
 
-from typing import Dict, List, Any
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
-from backend.audit_logger import insert_log
+from backend.audit_logger import build_log_record
+from backend.audit_writer import AuditRecord, AuditWriter
+from backend.audit_query import ReadPool, query_logs, query_stats, session_logs
+from backend.log_files import tail_lines
+from backend.audit_export import stream_ndjson, stream_arrow
 
 # Import modules from sibling packages
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from ml.classifier import evaluate
+from ml.classifier import (
+    evaluate, evaluate_batch, configure_batching, batching_stats,
+    configure_backend, configure_windowing, active_model_version, has_risk_keyword,
+    get_backend, warm_up, configure_stage_observer
+)
 
 from rules.rule_engine import RuleEngine
+from backend.normalizer import normalize_prompt
+from backend.verdict_cache import VerdictCache
+from backend.session_store import (
+    create_session_store, iter_sessions, decode_cursor, SessionNotFound, SESSION_FIELDS, DEFAULT_SESSION_FIELDS
+)
+from backend.conversation import ConversationState
+from backend.stream_analysis import StreamAnalyzer
+from backend.llm_server import create_llm_proxy, UpstreamError
+from backend.metrics import (
+    REGISTRY, DECISIONS, STAGE_SECONDS, REQUEST_SECONDS,
+    configure_metrics, observe_stage, observe_request, timed, collect_timings, server_timing
+)
+from backend.executor import BoundedExecutor, Overloaded
+from rules.watcher import RuleFileWatcher
+from backend.config import (
+    RULES_FILE, RULES_RELOAD_INTERVAL, RULE_EVAL_MODE,
+    REGEX_TIMEOUT_MS, REGEX_TIMEOUT_ACTION, REGEX_UNSAFE_ACTION, REGEX_DISABLE_AFTER,
+    ML_BATCH_MAX_SIZE, ML_BATCH_MAX_WAIT_MS, ML_BATCH_MAX_PROMPTS,
+    VERDICT_CACHE_SIZE, VERDICT_CACHE_TTL, VERDICT_CACHE_DB,
+    INFERENCE_BACKEND, CASCADE_ENABLED, CASCADE_SHORT_PROMPT_CHARS,
+    ML_WINDOW_STRIDE, ML_MAX_TOKENS, ML_WINDOW_AGGREGATION, ML_WINDOW_TOP_K, ML_WINDOW_GROUP_SIZE,
+    MODEL_WARMUP, SESSION_BACKEND, SESSION_DB,
+    SESSION_MAX, SESSION_TTL, SESSION_MAX_ANALYSES, SESSION_SPILL,
+    SESSION_CARRY_CHARS, SESSION_RISK_DECAY, SESSION_RISK_THRESHOLD, SESSION_DEPTH_LIMIT,
+    STREAM_WINDOW_CHARS, STREAM_WINDOW_OVERLAP, STREAM_FEED_BYTES, STREAM_MAX_BYTES,
+    METRICS_ENABLED, METRICS_SERVER_TIMING,
+    LLM_ENDPOINT, LLM_PATH, LLM_TIMEOUT, LLM_CONNECT_TIMEOUT, LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE,
+    LLM_SPECULATIVE, LLM_OUTPUT_CLASSIFIER,
+    EXECUTOR_WORKERS, EXECUTOR_QUEUE_DEPTH, EXECUTOR_RETRY_AFTER,
+    AUDIT_QUEUE_SIZE, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL_MS, AUDIT_OVERFLOW, AUDIT_SPILL_FILE,
+    AUDIT_READ_POOL_SIZE, AUDIT_RETENTION_DAYS, AUDIT_LOG_MAX_BYTES, AUDIT_LOG_BACKUPS
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# STARTUP
+# ============================================================================
+# Built during the lifespan startup phase, before the server accepts requests
+pipeline: Optional["AnalysisPipeline"] = None
+
+STARTUP_REPORT: Dict[str, Any] = {"ready": False, "phases_ms": {}}
 
-app = FastAPI(title="Bastion Security Layer")
 
+@contextmanager
+def _startup_phase(name: str):
+    start = time.perf_counter()
+    yield
+    STARTUP_REPORT["phases_ms"][name] = round((time.perf_counter() - start) * 1000, 1)
 
 
-# Initialize DB on startup
-init_db()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global pipeline
+
+    started = time.perf_counter()
+    STARTUP_REPORT["phases_ms"]["imports"] = round((started - _IMPORT_STARTED) * 1000, 1)
+
+    with _startup_phase("database"):
+        init_db()
+
+    with _startup_phase("rules"):
+        pipeline = AnalysisPipeline()
+
+    if MODEL_WARMUP:
+        with _startup_phase("model_load"):
+            get_backend()
+        with _startup_phase("warmup"):
+            warm_up(batch_sizes=(1, max(ML_BATCH_MAX_SIZE, 1)))
+
+    STARTUP_REPORT["total_ms"] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+    STARTUP_REPORT["ready"] = True
+    STARTUP_REPORT["ready_at"] = datetime.now().isoformat()
+    logger.info(f"Startup complete: {STARTUP_REPORT['phases_ms']} total={STARTUP_REPORT['total_ms']}ms")
+
+    yield
+
+    STARTUP_REPORT["ready"] = False
+    await pipeline.llm_proxy.aclose()
+    pipeline.shutdown()
+
+
+app = FastAPI(title="Bastion Security Layer", lifespan=lifespan)
 
 # CORS for Streamlit UI
 app.add_middleware(
@@ -37,36 +128,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-
-# ============================================================================
-# SESSION STATE MANAGER
-# ============================================================================
-class SessionStateManager:
-    def __init__(self):
-        self.sessions: Dict[str, Dict[str, Any]] = {}
-
-    def create_session(self, metadata: Dict = None) -> str:
-        session_id = str(uuid.uuid4())
-        self.sessions[session_id] = {
-            "id": session_id,
-            "created_at": datetime.now().isoformat(),
-            "analyses": [],
-            "metadata": metadata or {}
-        }
-        return session_id
-
-    def get_session(self, session_id: str) -> Dict[str, Any]:
-        return self.sessions.get(session_id)
-
-    def add_analysis(self, session_id: str, analysis_result: Dict) -> None:
-        if session_id in self.sessions:
-            self.sessions[session_id]["analyses"].append(analysis_result)
-
-    def list_sessions(self) -> List[Dict[str, Any]]:
-        return list(self.sessions.values())
 
 # ============================================================================
 # SIMPLE FILE AUDIT LOGGER (legacy JSONL)
@@ -75,56 +136,317 @@ class AuditLogger:
     def __init__(self, logs_dir: str = "logs"):
         self.logs_dir = Path(logs_dir)
         self.logs_dir.mkdir(parents=True, exist_ok=True)
-        self.log_file = self.logs_dir / f"audit_{datetime.now().strftime('%Y%m%d')}.jsonl"
 
-    def log_analysis(self, session_id: str, prompt: str, result: Dict) -> None:
+    @property
+    def log_file(self) -> Path:
+        """Today's file; a long-running server moves on at midnight"""
+        return self.log_file_for(datetime.now())
+
+    def log_file_for(self, when: datetime) -> Path:
+        return self.logs_dir / f"audit_{when.strftime('%Y%m%d')}.jsonl"
+
+    def format_event(self, session_id: str, prompt_length: int, result: Dict) -> Tuple[str, str]:
+        """Return (file, line) for one analysis, for batched writing"""
+        now = datetime.now()
         event = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "session_id": session_id,
-            "prompt_length": len(prompt),
+            "prompt_length": prompt_length,
             "risk_score": result.get("risk_score"),
             "decision": result.get("decision"),
             "violation_count": len(result.get("violations", []))
         }
+        return str(self.log_file_for(now)), json.dumps(event) + "\n"
 
+    def log_analysis(self, session_id: str, prompt: str, result: Dict) -> None:
+        path, line = self.format_event(session_id, len(prompt), result)
         try:
-            with open(self.log_file, "a") as f:
-                f.write(json.dumps(event) + "\n")
+            with open(path, "a") as f:
+                f.write(line)
         except Exception as e:
             logger.error(f"Failed to write audit log: {e}")
 
     def get_recent_logs(self, limit: int = 100) -> List[Dict]:
-        logs = []
-        try:
-            with open(self.log_file, "r") as f:
-                for line in f.readlines()[-limit:]:
-                    if line.strip():
-                        logs.append(json.loads(line))
-        except FileNotFoundError:
-            pass
+        """Newest daily files first, each read backwards from its end"""
+        logs: List[Dict] = []
+        for path in sorted(self.logs_dir.glob("audit_*.jsonl"), reverse=True):
+            lines = tail_lines(str(path), limit - len(logs))
+            logs[:0] = [json.loads(line) for line in lines]
+            if len(logs) >= limit:
+                break
         return logs
 
 
 # ============================================================================
 # EXECUTION PIPELINE
 # ============================================================================
+def cacheable(verdict: Dict[str, Any]) -> bool:
+    """A block that rests on a regex timeout is not cached: the timeout may be transient"""
+    return not any(violation.get("timed_out") for violation in verdict["violations"])
+
+
 class AnalysisPipeline:
     def __init__(self):
-        self.rule_engine = RuleEngine()
-        self.session_manager = SessionStateManager()
+        self.rule_engine = RuleEngine(
+            RULES_FILE,
+            mode=RULE_EVAL_MODE,
+            regex_timeout_ms=REGEX_TIMEOUT_MS,
+            timeout_action=REGEX_TIMEOUT_ACTION,
+            unsafe_action=REGEX_UNSAFE_ACTION,
+            disable_after=REGEX_DISABLE_AFTER
+        )
+        self.rule_watcher = None
+        if RULES_RELOAD_INTERVAL > 0:
+            self.rule_watcher = RuleFileWatcher(self.rule_engine, RULES_RELOAD_INTERVAL)
+            self.rule_watcher.start()
+        self.session_manager = create_session_store(
+            SESSION_BACKEND,
+            SESSION_DB,
+            max_sessions=SESSION_MAX,
+            ttl_seconds=SESSION_TTL,
+            max_analyses=SESSION_MAX_ANALYSES,
+            spill=SESSION_SPILL
+        )
         self.audit_logger = AuditLogger()
+        self.audit_writer = AuditWriter(
+            max_queue=AUDIT_QUEUE_SIZE,
+            batch_size=AUDIT_BATCH_SIZE,
+            flush_interval_ms=AUDIT_FLUSH_INTERVAL_MS,
+            overflow=AUDIT_OVERFLOW,
+            spill_path=AUDIT_SPILL_FILE,
+            retention_days=AUDIT_RETENTION_DAYS,
+            log_max_bytes=AUDIT_LOG_MAX_BYTES,
+            log_backups=AUDIT_LOG_BACKUPS
+        )
+        self.audit_writer.start()
+        self.read_pool = ReadPool(size=AUDIT_READ_POOL_SIZE)
+        configure_backend(INFERENCE_BACKEND)
+        configure_batching(ML_BATCH_MAX_SIZE, ML_BATCH_MAX_WAIT_MS)
+        configure_windowing(
+            stride=ML_WINDOW_STRIDE,
+            max_tokens=ML_MAX_TOKENS,
+            aggregation=ML_WINDOW_AGGREGATION,
+            top_k=ML_WINDOW_TOP_K,
+            group_size=ML_WINDOW_GROUP_SIZE
+        )
+        self.verdict_cache = None
+        if VERDICT_CACHE_SIZE > 0:
+            self.verdict_cache = VerdictCache(
+                max_entries=VERDICT_CACHE_SIZE,
+                ttl_seconds=VERDICT_CACHE_TTL,
+                db_path=VERDICT_CACHE_DB or None
+            )
+        self.tier_counts: Dict[str, int] = {}
+        self._tier_lock = threading.Lock()
+        # CPU-bound work (rules, model, audit writes) runs here, never on
+        # the event loop
+        self.executor = BoundedExecutor(
+            max_workers=EXECUTOR_WORKERS,
+            max_queue=EXECUTOR_QUEUE_DEPTH,
+            retry_after=EXECUTOR_RETRY_AFTER
+        )
+
+        # Gateway mode: prompts are screened by this pipeline, then forwarded
+        self.llm_proxy = create_llm_proxy(
+            LLM_ENDPOINT,
+            gateway_check,
+            path=LLM_PATH,
+            timeout=LLM_TIMEOUT,
+            connect_timeout=LLM_CONNECT_TIMEOUT,
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive=LLM_MAX_KEEPALIVE,
+            speculative=LLM_SPECULATIVE,
+            output_screen=output_screen,
+            classify_output=LLM_OUTPUT_CLASSIFIER,
+            run_blocking=self.executor.run,
+            on_output_block=record_output_block
+        )
+
+        configure_metrics(METRICS_ENABLED)
+        configure_stage_observer(observe_stage if METRICS_ENABLED else None)
+        REGISTRY.add_collector("bastion_executor", self.executor.stats)
+        REGISTRY.add_collector("bastion_audit_writer", self.audit_writer.stats)
+        if self.verdict_cache is not None:
+            REGISTRY.add_collector("bastion_verdict_cache", self.verdict_cache.stats)
+
+    def _cache_key(self, view) -> str:
+        # model_text determines text (the fold is a function of it), not the reverse
+        return VerdictCache.make_key(
+            view.model_text,
+            active_model_version(),
+            self.rule_engine.rule_set.version,
+            self.rule_engine.mode,
+            "cascade" if CASCADE_ENABLED else "full",
+            f"windows:{ML_WINDOW_STRIDE}:{ML_MAX_TOKENS}:{ML_WINDOW_AGGREGATION}:{ML_WINDOW_TOP_K}"
+        )
+
+    def _count_tier(self, tier: str) -> None:
+        with self._tier_lock:
+            self.tier_counts[tier] = self.tier_counts.get(tier, 0) + 1
+
+    def _cheap_tiers(self, view) -> Tuple[Optional[Dict[str, Any]], List[Dict]]:
+        """
+        Run the cheap cascade tiers. Returns (verdict, violations) where
+        verdict is None when the transformer still has to decide.
+        """
+        # Tier 1: rules. Any violation blocks, so the model cannot change the outcome
+        with timed("rules"):
+            is_safe, violations = self.rule_engine.check_prompt(view.text, lowered=view.lowered)
+        if not CASCADE_ENABLED:
+            return None, violations
+        if violations:
+            return {
+                "ml": {"risk_score": 1.0, "violation_type": "RuleViolation", "confidence": 1.0},
+                "violations": violations,
+                "decided_by": "rules"
+            }, violations
+
+        # Tier 2: short, plain-ASCII prompts without any risk keyword. Checked
+        # before the homoglyph fold, so look-alike letters go to the model
+        text = view.model_text
+        if (
+            len(text) <= CASCADE_SHORT_PROMPT_CHARS
+            and text.isascii()
+            and text.isprintable()
+            and not has_risk_keyword(view.lowered)
+        ):
+            return {
+                "ml": {"risk_score": 0.0, "violation_type": "Benign", "confidence": 1.0},
+                "violations": [],
+                "decided_by": "heuristics"
+            }, violations
+
+        return None, violations
+
+    def _model_verdict(self, ml_result: Dict, violations: List[Dict]) -> Dict[str, Any]:
+        return {
+            "ml": ml_result,
+            "violations": violations,
+            "decided_by": "rules" if violations else "model"
+        }
+
+    def _detect(self, view) -> Dict[str, Any]:
+        verdict, violations = self._cheap_tiers(view)
+        if verdict is not None:
+            return verdict
+
+        # Tier 3: ML Evaluation
+        ml_result = evaluate(view.model_text, lowered=view.lowered)
+        return self._model_verdict(ml_result, violations)
+
+    def _verdict(self, view) -> Dict[str, Any]:
+        if self.verdict_cache is not None:
+            with timed("cache_key"):
+                key = self._cache_key(view)
+            return self.verdict_cache.get_or_compute(key, lambda: self._detect(view), cacheable)
+        return self._detect(view)
 
     def execute(self, prompt: str, bastion_enabled: bool = True) -> Dict[str, Any]:
 
-        # ML Evaluation
-        ml_result = evaluate(prompt)
+        # Canonical view shared by every detector
+        with timed("normalize"):
+            view = normalize_prompt(prompt)
+
+        verdict = self._verdict(view)
+
+        self._count_tier(verdict["decided_by"])
+        return self._build_result(verdict, bastion_enabled)
+
+    def _turn_verdict(self, view, state: ConversationState) -> Dict[str, Any]:
+        """Rules over the new turn only, continuing the session's scan state"""
+        separator = " " if state.turns else ""
+        with timed("rules"):
+            is_safe, violations = self.rule_engine.check_increment(
+                state.scanner, separator + view.text, lowered=separator + view.lowered
+            )
+        if CASCADE_ENABLED and violations:
+            return {
+                "ml": {"risk_score": 1.0, "violation_type": "RuleViolation", "confidence": 1.0},
+                "violations": violations,
+                "decided_by": "rules"
+            }
+        return self._model_verdict(evaluate(view.model_text, lowered=view.lowered), violations)
+
+    def execute_turn(
+        self, prompt: str, bastion_enabled: bool = True, state: Optional[ConversationState] = None
+    ) -> Tuple[Dict[str, Any], ConversationState]:
+        """
+        Analyze one turn of a session. The first turn takes the ordinary
+        (cacheable) path and seeds the state from its text; later turns are
+        scanned incrementally against the state. Either way only the new
+        turn's text is processed. Returns (result, updated state).
+        """
+        with timed("normalize"):
+            view = normalize_prompt(prompt)
+
+        if state is None:
+            verdict = self._verdict(view)
+            state = ConversationState(SESSION_CARRY_CHARS, SESSION_RISK_DECAY)
+            state.scanner.prime(self.rule_engine.rule_set, view.text, view.lowered)
+        else:
+            verdict = self._turn_verdict(view, state)
+
+        result = self._build_result(verdict, bastion_enabled)
+        state.record_turn(verdict["ml"]["risk_score"], result["instruction_depth"])
+
+        # From the second turn on, the conversation as a whole can tip an
+        # otherwise allowed turn
+        if bastion_enabled and state.turns > 1 and result["decision"] == "allow" and (
+            state.cumulative_risk > SESSION_RISK_THRESHOLD
+            or (SESSION_DEPTH_LIMIT and state.window_depth >= SESSION_DEPTH_LIMIT)
+        ):
+            result["decision"] = "block"
+            result["decided_by"] = "session"
+
+        self._count_tier(result["decided_by"])
+        result.update(state.summary())
+        return result, state
+
+    def execute_batch(self, prompts: List[str], bastion_enabled: bool = True) -> List[Dict[str, Any]]:
+        with timed("normalize"):
+            views = [normalize_prompt(prompt) for prompt in prompts]
+
+        verdicts: List[Any] = [None] * len(views)
+        keys = [None] * len(views)
+        if self.verdict_cache is not None:
+            with timed("cache_key"):
+                keys = [self._cache_key(view) for view in views]
+            for i in range(len(views)):
+                verdicts[i] = self.verdict_cache.get(keys[i])
+
+        misses = [i for i, verdict in enumerate(verdicts) if verdict is None]
+        undecided = {}
+        for i in misses:
+            verdicts[i], violations = self._cheap_tiers(views[i])
+            if verdicts[i] is None:
+                undecided[i] = violations
+
+        if undecided:
+            # One batched ML pass for every prompt the cheap tiers left open
+            ml_results = evaluate_batch(
+                [views[i].model_text for i in undecided],
+                lowered=[views[i].lowered for i in undecided],
+                max_batch_size=ML_BATCH_MAX_SIZE
+            )
+            for i, ml_result in zip(undecided, ml_results):
+                verdicts[i] = self._model_verdict(ml_result, undecided[i])
+
+        if self.verdict_cache is not None:
+            for i in misses:
+                if cacheable(verdicts[i]):
+                    self.verdict_cache.put(keys[i], verdicts[i])
+
+        for verdict in verdicts:
+            self._count_tier(verdict["decided_by"])
+        return [self._build_result(verdict, bastion_enabled) for verdict in verdicts]
+
+    def _build_result(self, verdict: Dict[str, Any], bastion_enabled: bool) -> Dict[str, Any]:
+        ml_result = verdict["ml"]
+        violations = verdict["violations"]
         risk_score = ml_result["risk_score"]
         violation_type = ml_result["violation_type"]
         confidence = ml_result["confidence"]
 
-        # Rule Engine
-        is_safe, violations = self.rule_engine.check_prompt(prompt)
-
         # Decision Logic
         if not bastion_enabled:
             decision = "allow"
@@ -142,14 +464,20 @@ class AnalysisPipeline:
             "instruction_depth": len(
                 [v for v in violations if v.get("severity") == "high"]
             ),
-            "violations": violations,
+            "violations": list(violations),
+            "decided_by": verdict["decided_by"],
             "timestamp": datetime.now().isoformat()
         }
 
         return result
 
-
-pipeline = AnalysisPipeline()
+    def shutdown(self) -> None:
+        if self.rule_watcher is not None:
+            self.rule_watcher.stop()
+        self.executor.shutdown()
+        # After the executor, so every finished request's audit is flushed
+        self.audit_writer.close()
+        self.read_pool.close()
 
 
 # ============================================================================
@@ -159,6 +487,8 @@ class AnalyzeRequest(BaseModel):
     prompt: str
     bastion_enabled: bool = True
     model: str = "default"
+    # Continue an existing session instead of starting a new one
+    session_id: Optional[str] = None
 
 
 class AnalyzeResponse(BaseModel):
@@ -169,7 +499,51 @@ class AnalyzeResponse(BaseModel):
     integrity_score: float
     instruction_depth: int
     violations: List[Dict]
+    decided_by: str = "model"
     timestamp: str
+    session_id: Optional[str] = None
+    turn: Optional[int] = None
+    cumulative_risk: Optional[float] = None
+    max_risk: Optional[float] = None
+    window_depth: Optional[int] = None
+    depth_trend: Optional[float] = None
+
+
+class StreamAnalyzeResponse(AnalyzeResponse):
+    bytes_received: int
+    chars_scanned: int
+    windows_scored: int
+    # The verdict was reached before the end of the body
+    early_exit: bool
+
+
+class GatewayRequest(BaseModel):
+    prompt: str
+    model: str = "default"
+    session_id: Optional[str] = None
+    # Extra fields for the upstream request body (e.g. max_tokens)
+    params: Dict[str, Any] = {}
+    # Override LLM_SPECULATIVE for this request
+    speculative: Optional[bool] = None
+
+
+class GatewayResponse(BaseModel):
+    analysis: AnalyzeResponse
+    response: Any
+    check_ms: float
+    upstream_ms: float
+    speculative: bool
+
+
+class BatchAnalyzeRequest(BaseModel):
+    prompts: List[str]
+    bastion_enabled: bool = True
+    model: str = "default"
+
+
+class BatchAnalyzeResponse(BaseModel):
+    results: List[AnalyzeResponse]
+    total: int
 
 
 # ============================================================================
@@ -181,78 +555,543 @@ async def health_check():
     return {"status": "ok", "timestamp": datetime.now().isoformat()}
 
 
-@app.post("/analyze", response_model=AnalyzeResponse)
-async def analyze(request: AnalyzeRequest) -> AnalyzeResponse:
-    try:
-        session_id = pipeline.session_manager.create_session({
-            "model": request.model
-        })
+@app.get("/ready")
+async def readiness_check():
+    if not STARTUP_REPORT["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", **STARTUP_REPORT})
+    return {"status": "ready", **STARTUP_REPORT}
 
-        result = pipeline.execute(request.prompt, request.bastion_enabled)
 
-        # JSONL log
-        pipeline.audit_logger.log_analysis(session_id, request.prompt, result)
+def record_analysis(session_id: str, model: str, prompt_length: int, result: Dict) -> None:
+    DECISIONS.inc(result["decision"], result["decided_by"])
 
-        # SQLite log (REAL persistence)
-        insert_log(
+    # SQLite row, bastion.log line and JSONL event, written in batches by
+    # the background audit writer
+    with timed("audit_submit"):
+        row, log_line = build_log_record(
             session_id=session_id,
             risk_score=result["risk_score"],
             violation_type=result["violation_type"],
             decision=result["decision"],
             integrity_score=result["integrity_score"],
             instruction_depth=result["instruction_depth"],
-            violations=len(result["violations"])
+            violations=len(result["violations"]),
+            model=model
         )
+        jsonl_path, jsonl_line = pipeline.audit_logger.format_event(session_id, prompt_length, result)
+        pipeline.audit_writer.submit(AuditRecord(row, log_line, jsonl_path, jsonl_line))
 
+    with timed("session"):
         pipeline.session_manager.add_analysis(session_id, result)
 
+
+def overloaded_response(e: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server overloaded, retry later"},
+        headers={"Retry-After": str(max(int(e.retry_after + 0.999), 1))}
+    )
+
+
+def analyze_and_record(request: AnalyzeRequest) -> Dict[str, Any]:
+    sessions = pipeline.session_manager
+    if request.session_id:
+        session_id = request.session_id
+        # Turns of one session run one at a time over its shared state
+        with sessions.turn_lock(session_id):
+            with timed("session"):
+                state = sessions.get_state(session_id) or ConversationState(SESSION_CARRY_CHARS, SESSION_RISK_DECAY)
+            result, state = pipeline.execute_turn(request.prompt, request.bastion_enabled, state)
+            with timed("session"):
+                sessions.save_state(session_id, state)
+    else:
+        with timed("session"):
+            session_id = sessions.create_session({"model": request.model})
+        result, state = pipeline.execute_turn(request.prompt, request.bastion_enabled, None)
+        with timed("session"):
+            sessions.save_state(session_id, state)
+    result["session_id"] = session_id
+
+    record_analysis(session_id, request.model, len(request.prompt), result)
+    return result
+
+
+def analyze_batch_and_record(request: BatchAnalyzeRequest) -> List[Dict[str, Any]]:
+    results = pipeline.execute_batch(request.prompts, request.bastion_enabled)
+    for prompt, result in zip(request.prompts, results):
+        session_id = pipeline.session_manager.create_session({"model": request.model})
+        record_analysis(session_id, request.model, len(prompt), result)
+    return results
+
+
+def wants_timing(header: Optional[str]) -> bool:
+    return METRICS_SERVER_TIMING or (header or "").lower() in ("1", "true")
+
+
+async def run_analysis(endpoint: str, response: Response, timing: bool, fn, *args) -> Any:
+    """
+    Run fn on the executor and record the request time. With timing, the
+    per-stage breakdown is returned in a Server-Timing header.
+    """
+    started = time.perf_counter()
+    try:
+        if not timing:
+            return await pipeline.executor.run(fn, *args)
+        result, timings = await pipeline.executor.run(collect_timings, fn, *args)
+        timings["total"] = time.perf_counter() - started
+        response.headers["Server-Timing"] = server_timing(timings)
+        return result
+    finally:
+        observe_request(endpoint, time.perf_counter() - started)
+
+
+@app.post("/analyze", response_model=AnalyzeResponse)
+async def analyze(
+    request: AnalyzeRequest,
+    response: Response,
+    x_bastion_timing: Optional[str] = Header(None)
+) -> AnalyzeResponse:
+    try:
+        # On the bounded executor, so concurrent requests can share a model
+        # batch and the event loop stays free
+        result = await run_analysis(
+            "analyze", response, wants_timing(x_bastion_timing), analyze_and_record, request
+        )
         return AnalyzeResponse(**result)
 
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
     except Exception as e:
         logger.error(f"Analysis pipeline error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def finish_stream_and_record(
+    analyzer: StreamAnalyzer, model: str, bastion_enabled: bool, early_exit: bool
+) -> Dict[str, Any]:
+    verdict = analyzer.finish()
+    pipeline._count_tier(verdict["decided_by"])
+    result = pipeline._build_result(verdict, bastion_enabled)
+
+    session_id = pipeline.session_manager.create_session({"model": model, "stream": True})
+    result.update(
+        session_id=session_id,
+        bytes_received=analyzer.bytes_received,
+        chars_scanned=analyzer.chars_scanned,
+        windows_scored=analyzer.windows_scored,
+        early_exit=early_exit
+    )
+    record_analysis(session_id, model, analyzer.chars_scanned, result)
+    return result
+
+
+@app.post("/analyze/stream", response_model=StreamAnalyzeResponse)
+async def analyze_stream(request: Request, model: str = "default", bastion_enabled: bool = True):
+    """
+    Analyze a raw (e.g. chunked) UTF-8 request body as it arrives. Work
+    starts with the first chunk, and a block verdict is returned as soon
+    as it is certain, without reading the rest of the body.
+    """
+    analyzer = StreamAnalyzer(
+        pipeline.rule_engine,
+        window_chars=STREAM_WINDOW_CHARS,
+        overlap_chars=STREAM_WINDOW_OVERLAP,
+        max_batch_size=ML_BATCH_MAX_SIZE
+    )
+    started = time.perf_counter()
+    received = 0
+    pending: List[bytes] = []
+    pending_bytes = 0
+    early_exit = False
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > STREAM_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Body exceeds {STREAM_MAX_BYTES} bytes")
+            pending.append(chunk)
+            pending_bytes += len(chunk)
+            # Small network chunks are coalesced so each executor hop does real work
+            if pending_bytes < STREAM_FEED_BYTES:
+                continue
+            blocked = await pipeline.executor.run(analyzer.feed, b"".join(pending))
+            pending, pending_bytes = [], 0
+            if blocked and bastion_enabled:
+                early_exit = True
+                break
+
+        if pending:
+            await pipeline.executor.run(analyzer.feed, b"".join(pending))
+        result = await pipeline.executor.run(
+            finish_stream_and_record, analyzer, model, bastion_enabled, early_exit
+        )
+        return StreamAnalyzeResponse(**result)
+
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Stream analysis pipeline error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    finally:
+        observe_request("analyze_stream", time.perf_counter() - started)
+
+
+async def gateway_check(prompt: str, model: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+    """The LLMProxy security check: the full /analyze path, audited and sessioned"""
+    request = AnalyzeRequest(prompt=prompt, model=model, session_id=session_id)
+    return await pipeline.executor.run(analyze_and_record, request)
+
+
+def output_screen() -> StreamAnalyzer:
+    """Screen for one streamed LLM response; the proxy schedules its scoring"""
+    return StreamAnalyzer(
+        pipeline.rule_engine,
+        window_chars=STREAM_WINDOW_CHARS,
+        overlap_chars=STREAM_WINDOW_OVERLAP,
+        max_batch_size=ML_BATCH_MAX_SIZE,
+        defer_scoring=LLM_OUTPUT_CLASSIFIER,
+        # Without the output classifier no windows are kept for it
+        classify=LLM_OUTPUT_CLASSIFIER
+    )
+
+
+def record_output_verdict(verdict: Dict[str, Any], session_id: str, model: str, chars_scanned: int) -> None:
+    # Counted apart from prompt verdicts, e.g. decided_by=output_rules
+    verdict = {**verdict, "decided_by": f"output_{verdict['decided_by']}"}
+    pipeline._count_tier(verdict["decided_by"])
+    result = pipeline._build_result(verdict, True)
+    # The stream was cut, also when screening failed (decided_by=output_error)
+    result["decision"] = "block"
+    result["session_id"] = session_id
+    record_analysis(session_id, model, chars_scanned, result)
+
+
+async def record_output_block(
+    verdict: Dict[str, Any], screen: StreamAnalyzer, analysis: Dict[str, Any], model: str
+) -> None:
+    """Audit a streamed response cut by the proxy, under the prompt's session"""
+    await pipeline.executor.run(
+        record_output_verdict, verdict, analysis["session_id"], model, screen.chars_scanned
+    )
+
+
+@app.post("/gateway", response_model=GatewayResponse)
+async def gateway(request: GatewayRequest):
+    """
+    Screen a prompt and forward it to LLM_ENDPOINT. Blocked prompts get a
+    403 with the analysis and never reach (speculative: are cancelled at)
+    the LLM.
+    """
+    started = time.perf_counter()
+    try:
+        result = await pipeline.llm_proxy.forward(
+            request.prompt,
+            request.model,
+            params=request.params,
+            speculative=request.speculative,
+            session_id=request.session_id
+        )
+    except Overloaded as e:
+        return overloaded_response(e)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    except UpstreamError as e:
+        logger.error(f"Gateway upstream error: {e}")
+        raise HTTPException(status_code=504 if e.timeout else 502, detail=str(e))
+    finally:
+        observe_request("gateway", time.perf_counter() - started)
+
+    if result.response is None:
+        return JSONResponse(
+            status_code=403,
+            content={"detail": "Prompt blocked by Bastion", "analysis": result.analysis}
+        )
+    return GatewayResponse(
+        analysis=AnalyzeResponse(**result.analysis),
+        response=result.response,
+        check_ms=result.check_ms,
+        upstream_ms=result.upstream_ms,
+        speculative=result.speculative
+    )
+
+
+@app.post("/gateway/stream")
+async def gateway_stream(request: GatewayRequest):
+    """
+    Screen a prompt and relay the LLM's streamed response (SSE or chunked
+    text). Rules screen every chunk before it is relayed and the
+    classifier scores the text alongside; on a violation the stream ends
+    with a bastion_block event and the upstream request is closed.
+    """
+    started = time.perf_counter()
+    try:
+        result = await pipeline.llm_proxy.open_stream(
+            request.prompt,
+            request.model,
+            params=request.params,
+            session_id=request.session_id
+        )
+    except Overloaded as e:
+        return overloaded_response(e)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    except UpstreamError as e:
+        logger.error(f"Gateway upstream error: {e}")
+        raise HTTPException(status_code=504 if e.timeout else 502, detail=str(e))
+    finally:
+        observe_request("gateway_stream", time.perf_counter() - started)
+
+    if result.chunks is None:
+        return JSONResponse(
+            status_code=403,
+            content={"detail": "Prompt blocked by Bastion", "analysis": result.analysis}
+        )
+    return StreamingResponse(
+        result.chunks,
+        media_type=result.media_type or "text/plain",
+        headers={"X-Bastion-Session": result.analysis["session_id"]}
+    )
+
+
+@app.get("/gateway/stats")
+async def gateway_stats():
+    return pipeline.llm_proxy.stats()
+
+
+@app.post("/analyze/batch", response_model=BatchAnalyzeResponse)
+async def analyze_batch(
+    request: BatchAnalyzeRequest,
+    response: Response,
+    x_bastion_timing: Optional[str] = Header(None)
+) -> BatchAnalyzeResponse:
+    if len(request.prompts) > ML_BATCH_MAX_PROMPTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {ML_BATCH_MAX_PROMPTS} prompts per batch"
+        )
+
+    try:
+        results = await run_analysis(
+            "analyze_batch", response, wants_timing(x_bastion_timing), analyze_batch_and_record, request
+        )
+
+        return BatchAnalyzeResponse(
+            results=[AnalyzeResponse(**result) for result in results],
+            total=len(results)
+        )
+
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    except Exception as e:
+        logger.error(f"Batch analysis pipeline error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/stages")
+async def metrics_stages():
+    """Per-stage and per-endpoint latency percentiles, in milliseconds"""
+    return {
+        "enabled": METRICS_ENABLED,
+        "stages": STAGE_SECONDS.summary(),
+        "requests": REQUEST_SECONDS.summary()
+    }
+
+
+@app.get("/audit/stats")
+async def audit_stats():
+    return pipeline.audit_writer.stats()
+
+
+@app.get("/executor/stats")
+async def executor_stats():
+    return pipeline.executor.stats()
+
+
+@app.get("/ml/batching")
+async def ml_batching():
+    return batching_stats()
+
+
 # 🔹 IMPORTANT: Static route FIRST
 @app.get("/logs/recent")
 async def get_recent_logs(limit: int = 100):
-    conn = sqlite3.connect("data/bastion.db")
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT timestamp, risk_score, decision, integrity_score
-        FROM audit_logs
-        ORDER BY id DESC
-        LIMIT ?
-    """, (limit,))
-
-    rows = cursor.fetchall()
-    conn.close()
+    page = await run_in_threadpool(query_logs, pipeline.read_pool, limit=limit)
 
     return {
         "logs": [
             {
-                "timestamp": row[0],
-                "risk_score": row[1],
-                "decision": row[2],
-                "integrity_score": row[3]
+                "timestamp": log["timestamp"],
+                "risk_score": log["risk_score"],
+                "decision": log["decision"],
+                "integrity_score": log["integrity_score"]
             }
-            for row in rows
+            for log in page["logs"]
         ],
-        "total": len(rows)
+        "total": page["count"]
     }
 
 
+@app.get("/logs")
+async def search_logs(
+    session_id: Optional[str] = None,
+    decision: Optional[str] = None,
+    violation_type: Optional[str] = None,
+    model: Optional[str] = None,
+    min_risk: Optional[float] = None,
+    max_risk: Optional[float] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = 100
+):
+    return await run_in_threadpool(
+        query_logs,
+        pipeline.read_pool,
+        session_id=session_id,
+        decision=decision,
+        violation_type=violation_type,
+        model=model,
+        min_risk=min_risk,
+        max_risk=max_risk,
+        since=since,
+        until=until,
+        after_id=after_id,
+        limit=limit
+    )
+
+
+EXPORT_FORMATS = {
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+    "arrow": (stream_arrow, "application/vnd.apache.arrow.stream"),
+}
+
+
+@app.get("/logs/export")
+async def export_logs(
+    format: str = "ndjson",
+    after_id: int = 0,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+):
+    """Stream audit rows in id order, chunk by chunk"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    stream, media_type = EXPORT_FORMATS[format]
+    if format == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Arrow export requires the pyarrow package")
+
+    # A sync generator: Starlette pulls each chunk in a worker thread
+    return StreamingResponse(stream(after_id=after_id, since=since, until=until), media_type=media_type)
+
+
+@app.get("/stats")
+async def get_stats(since: Optional[str] = None, until: Optional[str] = None, max_points: int = 60):
+    try:
+        return await run_in_threadpool(query_stats, pipeline.read_pool, since, until, max_points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # 🔹 Dynamic route AFTER
 @app.get("/logs/{session_id}")
 def fetch_logs(session_id: str):
-    return get_session_logs(session_id)
+    return session_logs(pipeline.read_pool, session_id)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    if pipeline.verdict_cache is None:
+        return {"enabled": False}
+    return pipeline.verdict_cache.stats()
+
+
+@app.get("/cascade/stats")
+async def cascade_stats():
+    return {
+        "enabled": CASCADE_ENABLED,
+        "decided_by": dict(pipeline.tier_counts)
+    }
+
+
+@app.get("/rules/version")
+async def rules_version():
+    return pipeline.rule_engine.version_info()
+
+
+@app.get("/rules/stats")
+async def rules_stats():
+    return {
+        "mode": pipeline.rule_engine.mode,
+        "version": pipeline.rule_engine.rule_set.version,
+        "rules": pipeline.rule_engine.rule_stats()
+    }
+
+
+@app.get("/sessions/stats")
+async def session_stats():
+    return await run_in_threadpool(pipeline.session_manager.stats)
 
 
 @app.get("/sessions")
-async def list_sessions():
-    sessions = pipeline.session_manager.list_sessions()
-    return {"sessions": sessions, "total": len(sessions)}
+async def list_sessions(
+    model: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    fields: Optional[str] = None,
+    format: str = "json"
+):
+    """
+    Sessions in creation order, a page at a time (pass next_cursor back as
+    cursor). fields is a comma-separated projection, e.g. id,created_at,
+    analysis_count for summaries. format=ndjson streams every match.
+    """
+    if fields is None:
+        selected = DEFAULT_SESSION_FIELDS
+    else:
+        selected = tuple(field.strip() for field in fields.split(",") if field.strip())
+        unknown = set(selected) - set(SESSION_FIELDS)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}; choose from {', '.join(SESSION_FIELDS)}"
+            )
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be one of json, ndjson")
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    filters = {"model": model, "since": since, "until": until, "after": cursor, "fields": selected}
+    store = pipeline.session_manager
+    if format == "ndjson":
+        def stream():
+            for sessions in iter_sessions(store, **filters):
+                yield "".join(json.dumps(session) + "\n" for session in sessions).encode()
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    return await run_in_threadpool(store.list_sessions, limit=limit, **filters)
 
 
 @app.get("/sessions/{session_id}")
@@ -7,4 +7,63 @@ API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", 8000))
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 RULES_FILE = os.getenv("RULES_FILE", "rules/default_rules.json")
+RULES_RELOAD_INTERVAL = float(os.getenv("RULES_RELOAD_INTERVAL", 2.0))
+RULE_EVAL_MODE = os.getenv("RULE_EVAL_MODE", "full")
+REGEX_TIMEOUT_MS = float(os.getenv("REGEX_TIMEOUT_MS", 50.0))
+REGEX_TIMEOUT_ACTION = os.getenv("REGEX_TIMEOUT_ACTION", "block")
+REGEX_UNSAFE_ACTION = os.getenv("REGEX_UNSAFE_ACTION", "warn")
+REGEX_DISABLE_AFTER = int(os.getenv("REGEX_DISABLE_AFTER", 0))
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+ML_BATCH_MAX_SIZE = int(os.getenv("ML_BATCH_MAX_SIZE", 16))
+ML_BATCH_MAX_WAIT_MS = float(os.getenv("ML_BATCH_MAX_WAIT_MS", 5.0))
+ML_BATCH_MAX_PROMPTS = int(os.getenv("ML_BATCH_MAX_PROMPTS", 256))
+ML_WINDOW_STRIDE = int(os.getenv("ML_WINDOW_STRIDE", 32))
+ML_MAX_TOKENS = int(os.getenv("ML_MAX_TOKENS", 2048))
+ML_WINDOW_AGGREGATION = os.getenv("ML_WINDOW_AGGREGATION", "max")
+ML_WINDOW_TOP_K = int(os.getenv("ML_WINDOW_TOP_K", 3))
+ML_WINDOW_GROUP_SIZE = int(os.getenv("ML_WINDOW_GROUP_SIZE", 8))
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "false").lower() == "true"
+CASCADE_SHORT_PROMPT_CHARS = int(os.getenv("CASCADE_SHORT_PROMPT_CHARS", 48))
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", 10000))
+VERDICT_CACHE_TTL = float(os.getenv("VERDICT_CACHE_TTL", 300.0))
+VERDICT_CACHE_DB = os.getenv("VERDICT_CACHE_DB", "")
+EXECUTOR_WORKERS = int(os.getenv("EXECUTOR_WORKERS", 16))
+EXECUTOR_QUEUE_DEPTH = int(os.getenv("EXECUTOR_QUEUE_DEPTH", 64))
+EXECUTOR_RETRY_AFTER = float(os.getenv("EXECUTOR_RETRY_AFTER", 1.0))
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", 10000))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 256))
+AUDIT_FLUSH_INTERVAL_MS = float(os.getenv("AUDIT_FLUSH_INTERVAL_MS", 50.0))
+AUDIT_OVERFLOW = os.getenv("AUDIT_OVERFLOW", "block")
+AUDIT_SPILL_FILE = os.getenv("AUDIT_SPILL_FILE", "data/audit_spill.jsonl")
+AUDIT_READ_POOL_SIZE = int(os.getenv("AUDIT_READ_POOL_SIZE", 4))
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", 0))
+AUDIT_LOG_MAX_BYTES = int(os.getenv("AUDIT_LOG_MAX_BYTES", 50 * 1024 * 1024))
+AUDIT_LOG_BACKUPS = int(os.getenv("AUDIT_LOG_BACKUPS", 5))
+SESSION_BACKEND = os.getenv("SESSION_BACKEND") or "memory"
+SESSION_DB = os.getenv("SESSION_DB", "data/sessions.db")
+SESSION_MAX = int(os.getenv("SESSION_MAX", 10000))
+SESSION_TTL = float(os.getenv("SESSION_TTL", 3600))
+SESSION_MAX_ANALYSES = int(os.getenv("SESSION_MAX_ANALYSES", 100))
+SESSION_SPILL = os.getenv("SESSION_SPILL", "false").lower() == "true"
+SESSION_CARRY_CHARS = int(os.getenv("SESSION_CARRY_CHARS", 256))
+SESSION_RISK_DECAY = float(os.getenv("SESSION_RISK_DECAY", 0.5))
+SESSION_RISK_THRESHOLD = float(os.getenv("SESSION_RISK_THRESHOLD", 0.5))
+SESSION_DEPTH_LIMIT = int(os.getenv("SESSION_DEPTH_LIMIT", 3))
+STREAM_WINDOW_CHARS = int(os.getenv("STREAM_WINDOW_CHARS", 512))
+STREAM_WINDOW_OVERLAP = int(os.getenv("STREAM_WINDOW_OVERLAP", 128))
+STREAM_FEED_BYTES = int(os.getenv("STREAM_FEED_BYTES", 16384))
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", 64 * 1024 * 1024))
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "false").lower() == "true"
+WORKERS = int(os.getenv("WORKERS", 1))
+TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", 0))
+CPU_AFFINITY = os.getenv("CPU_AFFINITY", "false").lower() == "true"
 LLM_ENDPOINT = os.getenv("LLM_ENDPOINT", "http://localhost:8001")
+LLM_PATH = os.getenv("LLM_PATH", "/generate")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30.0))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5.0))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 100))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", 20))
+LLM_SPECULATIVE = os.getenv("LLM_SPECULATIVE", "false").lower() == "true"
+LLM_OUTPUT_CLASSIFIER = os.getenv("LLM_OUTPUT_CLASSIFIER", "true").lower() == "true"
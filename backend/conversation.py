@@ -0,0 +1,86 @@
+from collections import deque
+from typing import Any, Dict, Optional
+
+from rules.incremental import IncrementalScanner
+
+# Turns of instruction_depth history used for the trend
+DEPTH_WINDOW = 8
+
+
+class ConversationState:
+    """
+    Rolling per-session state, so a new turn is judged in the context of
+    the conversation without rescanning it:
+
+    scanner         - rule scan state carried across turn boundaries
+    cumulative_risk - exponentially weighted risk; decay is the newest
+                      turn's weight
+    depths          - instruction_depth of the last DEPTH_WINDOW turns
+    """
+
+    __slots__ = ("scanner", "turns", "cumulative_risk", "max_risk", "depths", "decay")
+
+    def __init__(self, carry_chars: int = 256, decay: float = 0.5):
+        self.scanner = IncrementalScanner(carry_chars)
+        self.turns = 0
+        self.cumulative_risk = 0.0
+        self.max_risk = 0.0
+        self.depths: deque = deque(maxlen=DEPTH_WINDOW)
+        self.decay = decay
+
+    def record_turn(self, risk_score: float, instruction_depth: int) -> None:
+        if self.turns == 0:
+            self.cumulative_risk = risk_score
+        else:
+            self.cumulative_risk = self.decay * risk_score + (1 - self.decay) * self.cumulative_risk
+        self.max_risk = max(self.max_risk, risk_score)
+        self.depths.append(instruction_depth)
+        self.turns += 1
+
+    @property
+    def window_depth(self) -> int:
+        """High-severity rule hits within the depth window"""
+        return sum(self.depths)
+
+    @property
+    def depth_trend(self) -> float:
+        """Least-squares slope of instruction_depth per turn over the window"""
+        n = len(self.depths)
+        if n < 2:
+            return 0.0
+        mean_x = (n - 1) / 2
+        mean_y = sum(self.depths) / n
+        num = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(self.depths))
+        den = sum((x - mean_x) ** 2 for x in range(n))
+        return num / den
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "turn": self.turns,
+            "cumulative_risk": round(self.cumulative_risk, 4),
+            "max_risk": round(self.max_risk, 4),
+            "window_depth": self.window_depth,
+            "depth_trend": round(self.depth_trend, 4)
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "scanner": self.scanner.to_dict(),
+            "turns": self.turns,
+            "cumulative_risk": self.cumulative_risk,
+            "max_risk": self.max_risk,
+            "depths": list(self.depths),
+            "decay": self.decay
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["ConversationState"]:
+        if not data:
+            return None
+        state = cls(decay=data.get("decay", 0.5))
+        state.scanner = IncrementalScanner.from_dict(data.get("scanner", {}))
+        state.turns = data.get("turns", 0)
+        state.cumulative_risk = data.get("cumulative_risk", 0.0)
+        state.max_risk = data.get("max_risk", 0.0)
+        state.depths.extend(data.get("depths", ()))
+        return state
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# Number of recent queue wait times kept for the percentile figures
+WAIT_SAMPLES = 1024
+
+
+class Overloaded(Exception):
+    """Raised when the executor queue is full and the call is shed"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Executor queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Thread pool for the CPU-bound pipeline stages with admission control.
+    At most max_workers calls run at once and at most max_queue more wait;
+    anything beyond that is rejected immediately with Overloaded instead
+    of queueing without bound.
+    """
+
+    def __init__(self, max_workers: int = 16, max_queue: int = 64, retry_after: float = 1.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bastion-cpu")
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._waits_ms = deque(maxlen=WAIT_SAMPLES)
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        with self._lock:
+            if self.queued + self.running >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise Overloaded(self.retry_after)
+            self.queued += 1
+
+        submitted = time.perf_counter()
+
+        def call():
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self._waits_ms.append((time.perf_counter() - submitted) * 1000)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        try:
+            future = self._pool.submit(call)
+        except RuntimeError:
+            # Pool already shut down; the call never started
+            with self._lock:
+                self.queued -= 1
+            raise
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_ms_p50": round(waits[len(waits) // 2], 3) if waits else 0.0,
+                "wait_ms_p95": round(waits[max(int(len(waits) * 0.95) - 1, 0)], 3) if waits else 0.0,
+                "wait_ms_max": round(waits[-1], 3) if waits else 0.0
+            }
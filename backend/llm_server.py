@@ -1,34 +1,463 @@
+import asyncio
 import httpx
+import json
 import logging
-from typing import Optional
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, NamedTuple, Optional
+
+from backend.metrics import observe_stage
+from backend.stream_analysis import StreamAnalyzer
 
 logger = logging.getLogger(__name__)
 
+
+class UpstreamError(Exception):
+    """The LLM endpoint failed or timed out"""
+
+    def __init__(self, message: str, timeout: bool = False):
+        super().__init__(message)
+        self.timeout = timeout
+
+
+class ProxyResult(NamedTuple):
+    analysis: Dict[str, Any]
+    # Upstream JSON (or {"text": body} if it is not JSON); None when blocked
+    response: Optional[Any]
+    check_ms: float
+    upstream_ms: Optional[float]
+    speculative: bool
+
+
+class StreamResult(NamedTuple):
+    analysis: Dict[str, Any]
+    media_type: Optional[str]
+    # Screened upstream bytes; None when the prompt was blocked
+    chunks: Optional[AsyncIterator[bytes]]
+
+
+# Event keys holding generated text, in the usual streaming LLM APIs
+TEXT_KEYS = ("text", "response", "content", "token")
+
+OUTPUT_BLOCKED_TEXT = b"\n[Response blocked by Bastion]\n"
+
+# An upstream SSE line longer than this is cut rather than buffered further
+MAX_SSE_LINE_BYTES = 1024 * 1024
+
+# Passed to on_output_block for a stream cut because screening failed
+# (e.g. the executor was overloaded), so it is not audited as a detection
+SCREENING_ERROR_VERDICT = {
+    "ml": {"risk_score": 0.0, "violation_type": "ScreeningError", "confidence": 0.0},
+    "violations": [],
+    "decided_by": "error"
+}
+
+
+def _event_text(data: bytes) -> str:
+    try:
+        event = json.loads(data)
+    except ValueError:
+        return data.decode("utf-8", "replace")
+    if isinstance(event, dict):
+        for key in TEXT_KEYS:
+            if isinstance(event.get(key), str):
+                return event[key]
+        choices = event.get("choices")
+        if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+            choice = choices[0]
+            delta = choice.get("delta")
+            if isinstance(delta, dict) and isinstance(delta.get("content"), str):
+                return delta["content"]
+            if isinstance(choice.get("text"), str):
+                return choice["text"]
+    # Unknown shape: screen the whole payload rather than nothing
+    return data.decode("utf-8", "replace")
+
+
+def unscreened_tail(data: bytes, screen: StreamAnalyzer, sse: bool) -> int:
+    """
+    How many trailing bytes of data, just fed to screen, carry text the
+    rules have not seen in full yet. For SSE that is the whole last line
+    with text, since its bytes do not map onto the held-back characters.
+    """
+    held = screen.held_bytes
+    if not held:
+        return 0
+    if not sse:
+        return min(held, len(data))
+    start = len(data)
+    while start > 0:
+        line_start = data.rfind(b"\n", 0, start - 1) + 1
+        if sse_text(data[line_start:start]):
+            return len(data) - line_start
+        start = line_start
+    return len(data)
+
+
+def sse_text(lines: bytes) -> str:
+    """Generated text carried by complete Server-Sent Event lines"""
+    parts = []
+    for line in lines.split(b"\n"):
+        line = line.rstrip(b"\r")
+        if not line.startswith(b"data:"):
+            continue
+        data = line[5:].strip()
+        if data and data != b"[DONE]":
+            parts.append(_event_text(data))
+    return "".join(parts)
+
+
 class LLMProxy:
-    """Proxy layer for LLM requests"""
-    
-    def __init__(self, llm_endpoint: str, security_check_fn):
-        self.llm_endpoint = llm_endpoint
+    """
+    Proxy layer for LLM requests.
+
+    Every prompt goes through security_check (an async callable returning
+    the analysis result, with "decision") before its response is released.
+    Requests are sent over one shared httpx.AsyncClient, so connections to
+    the LLM endpoint are pooled and kept alive.
+
+    In speculative mode the upstream request starts at the same time as
+    the check and is cancelled if the verdict is block, so allowed prompts
+    do not wait for the check. The upstream then sees prompts that end up
+    blocked (and may bill for them), so use it only with a trusted endpoint.
+
+    open_stream() relays a streamed response (SSE or plain chunked text)
+    through an output screen from output_screen(), a StreamAnalyzer with
+    deferred scoring. Rules run on every chunk before it is relayed,
+    continuing across chunk boundaries without rescanning earlier text.
+    Classifier windows are scored alongside the relay, one batch at a
+    time, so a classifier block lags the relayed text by the windows
+    still being scored. Bytes of a character the rules have not seen in
+    full yet are held back until they have; an SSE line longer than
+    max_line_bytes is cut rather than buffered. On a block the stream is
+    cut and the upstream connection closed. If screening fails the stream
+    is cut too (an unscreened chunk is never relayed), but counted and
+    reported as decided_by=error rather than as a block. CPU work goes
+    through run_blocking (the API passes its bounded executor).
+    """
+
+    def __init__(
+        self,
+        llm_endpoint: str,
+        security_check_fn: Callable[..., Awaitable[Dict[str, Any]]],
+        path: str = "/generate",
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        speculative: bool = False,
+        output_screen: Optional[Callable[[], StreamAnalyzer]] = None,
+        classify_output: bool = True,
+        run_blocking: Optional[Callable[..., Awaitable[Any]]] = None,
+        on_output_block: Optional[Callable[..., Awaitable[None]]] = None,
+        max_line_bytes: int = MAX_SSE_LINE_BYTES
+    ):
+        self.llm_endpoint = llm_endpoint.rstrip("/")
         self.security_check = security_check_fn
-    
+        self.path = path
+        self.speculative = speculative
+        self.output_screen = output_screen
+        self.classify_output = classify_output
+        self.run_blocking = run_blocking
+        self.on_output_block = on_output_block
+        self.max_line_bytes = max_line_bytes
+        self._client = httpx.AsyncClient(
+            base_url=self.llm_endpoint,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        )
+
+        self.forwarded = 0
+        self.blocked = 0
+        self.cancelled = 0
+        self.upstream_errors = 0
+        self.streams = 0
+        self.chunks_relayed = 0
+        self.output_blocked = 0
+        self.output_errors = 0
+
+    async def _send(self, payload: Dict[str, Any], stream: bool = False) -> httpx.Response:
+        request = self._client.build_request("POST", self.path, json=payload)
+        response = None
+        try:
+            response = await self._client.send(request, stream=stream)
+            response.raise_for_status()
+            return response
+        except httpx.HTTPError as e:
+            self.upstream_errors += 1
+            if stream and response is not None:
+                await response.aclose()
+            if isinstance(e, httpx.TimeoutException):
+                raise UpstreamError(f"LLM endpoint timed out: {e}", timeout=True) from e
+            raise UpstreamError(f"LLM endpoint failed: {e}") from e
+
+    async def _post(self, payload: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            response = await self._send(payload)
+        finally:
+            observe_stage("proxy_upstream", time.perf_counter() - started)
+        try:
+            return response.json()
+        except ValueError:
+            return {"text": response.text}
+
+    async def _check(self, prompt: str, model: str, check_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            return await self.security_check(prompt, model, **check_kwargs)
+        finally:
+            observe_stage("proxy_check", time.perf_counter() - started)
+
+    async def forward(
+        self,
+        prompt: str,
+        model: str,
+        params: Optional[Dict[str, Any]] = None,
+        speculative: Optional[bool] = None,
+        **check_kwargs
+    ) -> ProxyResult:
+        """
+        Check the prompt and, unless blocked, return the LLM response.
+        params are extra fields for the upstream request body; check_kwargs
+        go to the security check.
+        """
+        speculative = self.speculative if speculative is None else speculative
+        payload = {**(params or {}), "model": model, "prompt": prompt}
+        started = time.perf_counter()
+
+        upstream: Optional[asyncio.Task] = None
+        if speculative:
+            upstream = asyncio.create_task(self._post(payload))
+        try:
+            analysis = await self._check(prompt, model, check_kwargs)
+        except BaseException:
+            if upstream is not None:
+                upstream.cancel()
+            raise
+        check_ms = (time.perf_counter() - started) * 1000
+
+        if analysis.get("decision") == "block":
+            self.blocked += 1
+            if upstream is not None:
+                upstream.cancel()
+                self.cancelled += 1
+                # Let the cancellation close the connection; errors no longer matter
+                await asyncio.gather(upstream, return_exceptions=True)
+            logger.warning(
+                f"LLMProxy: blocked prompt for model {model} "
+                f"(risk={analysis.get('risk_score')}, decided_by={analysis.get('decided_by')})"
+            )
+            return ProxyResult(analysis, None, round(check_ms, 3), None, speculative)
+
+        if upstream is None:
+            upstream_started = time.perf_counter()
+            response = await self._post(payload)
+        else:
+            upstream_started = started
+            response = await upstream
+        self.forwarded += 1
+        upstream_ms = (time.perf_counter() - upstream_started) * 1000
+        return ProxyResult(analysis, response, round(check_ms, 3), round(upstream_ms, 3), speculative)
+
+    async def _run(self, fn: Callable[..., Any], *args) -> Any:
+        if self.run_blocking is not None:
+            return await self.run_blocking(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def open_stream(
+        self,
+        prompt: str,
+        model: str,
+        params: Optional[Dict[str, Any]] = None,
+        **check_kwargs
+    ) -> StreamResult:
+        """
+        Check the prompt and, unless blocked, start a streaming upstream
+        request ("stream": true). Upstream errors are raised here, before
+        anything has been relayed.
+        """
+        analysis = await self._check(prompt, model, check_kwargs)
+        if analysis.get("decision") == "block":
+            self.blocked += 1
+            logger.warning(f"LLMProxy: blocked streaming prompt for model {model}")
+            return StreamResult(analysis, None, None)
+
+        payload = {**(params or {}), "model": model, "prompt": prompt, "stream": True}
+        started = time.perf_counter()
+        try:
+            response = await self._send(payload, stream=True)
+        finally:
+            observe_stage("proxy_upstream_headers", time.perf_counter() - started)
+        self.forwarded += 1
+
+        media_type = response.headers.get("content-type")
+        screen = self.output_screen() if self.output_screen is not None else None
+        return StreamResult(analysis, media_type, self._relay(response, screen, analysis, model))
+
+    async def _screen(self, screen: StreamAnalyzer, data: bytes, sse: bool) -> bool:
+        if not sse:
+            return await self._run(screen.feed, data)
+        text = sse_text(data)
+        if not text:
+            # Keep-alives, comments, [DONE]
+            return screen.blocked
+        return await self._run(screen.feed_text, text)
+
+    async def _cut(
+        self, screen: StreamAnalyzer, analysis: Dict[str, Any], model: str, sse: bool, failed: bool = False
+    ) -> bytes:
+        if failed:
+            self.output_errors += 1
+            verdict = SCREENING_ERROR_VERDICT
+        else:
+            self.output_blocked += 1
+            verdict = screen.verdict()
+        logger.warning(
+            f"LLMProxy: cut streamed response for model {model} after {screen.chars_scanned} chars "
+            f"(decided_by={verdict['decided_by']})"
+        )
+        if self.on_output_block is not None:
+            try:
+                await self.on_output_block(verdict, screen, analysis, model)
+            except Exception as e:
+                logger.error(f"LLMProxy: output block callback failed: {e}")
+        if not sse:
+            return OUTPUT_BLOCKED_TEXT
+        event = {
+            "decision": "block",
+            "decided_by": verdict["decided_by"],
+            "violations": verdict["violations"]
+        }
+        return f"event: bastion_block\ndata: {json.dumps(event)}\n\n".encode()
+
+    async def _relay(
+        self,
+        response: httpx.Response,
+        screen: Optional[StreamAnalyzer],
+        analysis: Dict[str, Any],
+        model: str
+    ) -> AsyncIterator[bytes]:
+        sse = response.headers.get("content-type", "").startswith("text/event-stream")
+        self.streams += 1
+        pending = b""
+        held = b""
+        classifier: Optional[asyncio.Future] = None
+        try:
+            # Decoded bytes: a gzip or deflate body is screened (and relayed) as text
+            async for chunk in response.aiter_bytes():
+                if screen is None:
+                    yield chunk
+                    continue
+
+                received = time.perf_counter()
+                if sse:
+                    # Only whole lines are screened, so only whole lines are relayed
+                    pending += chunk
+                    end = pending.rfind(b"\n") + 1
+                    ready, pending = pending[:end], pending[end:]
+                    if len(pending) > self.max_line_bytes:
+                        # Never screened without its end of line; not relayed either
+                        logger.error(f"LLMProxy: SSE line over {self.max_line_bytes} bytes from upstream")
+                        yield await self._cut(screen, analysis, model, sse, failed=True)
+                        return
+                    if not end:
+                        continue
+                else:
+                    ready = chunk
+
+                try:
+                    blocked = await self._screen(screen, ready, sse)
+                    if classifier is not None and classifier.done():
+                        blocked = classifier.result() or blocked
+                        classifier = None
+                except Exception as e:
+                    # Fail closed: an unscreened chunk is never relayed
+                    logger.error(f"LLMProxy: output screening failed: {e}")
+                    yield await self._cut(screen, analysis, model, sse, failed=True)
+                    return
+                if blocked:
+                    yield await self._cut(screen, analysis, model, sse)
+                    return
+
+                if self.classify_output and classifier is None:
+                    windows = screen.take_windows()
+                    if windows:
+                        classifier = asyncio.ensure_future(self._run(screen.score_windows, windows))
+
+                # Bytes whose text the rules have not seen in full yet (a
+                # partial or held-back character) wait for the next chunk
+                ready, held = held + ready, b""
+                keep = unscreened_tail(ready, screen, sse)
+                if keep:
+                    ready, held = ready[:-keep], ready[-keep:]
+
+                observe_stage("proxy_chunk", time.perf_counter() - received)
+                if ready:
+                    self.chunks_relayed += 1
+                    yield ready
+
+            if screen is None:
+                return
+            failed = False
+            try:
+                if pending:
+                    blocked = await self._screen(screen, pending + b"\n", sse)
+                blocked = await self._run(screen.flush)
+                if classifier is not None:
+                    blocked = await classifier or blocked
+                    classifier = None
+                if not blocked and self.classify_output:
+                    await self._run(screen.finish)
+                    blocked = screen.blocked
+            except Exception as e:
+                logger.error(f"LLMProxy: output screening failed: {e}")
+                blocked = failed = True
+            if blocked:
+                # Most of the text is already out; the client and the audit trail still learn of it
+                yield await self._cut(screen, analysis, model, sse, failed)
+            elif held or pending:
+                yield held + pending
+        finally:
+            if classifier is not None:
+                classifier.cancel()
+            await response.aclose()
+
     async def send_prompt(self, prompt: str, model: str) -> Optional[str]:
         """
         Send prompt to LLM after security validation.
         Returns response or None if blocked.
         """
         logger.info(f"LLMProxy: Processing prompt for model {model}")
-        
-        # TODO: Call self.security_check(prompt, model)
-        # TODO: Forward to self.llm_endpoint if safe
-        # TODO: Log blocked prompts
-        
-        return "Response placeholder"
+        result = await self.forward(prompt, model)
+        if result.response is None:
+            return None
+        if isinstance(result.response, dict):
+            return result.response.get("text", result.response.get("response"))
+        return str(result.response)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.llm_endpoint + self.path,
+            "speculative": self.speculative,
+            "forwarded": self.forwarded,
+            "blocked": self.blocked,
+            "cancelled_upstream": self.cancelled,
+            "upstream_errors": self.upstream_errors,
+            "streams": self.streams,
+            "chunks_relayed": self.chunks_relayed,
+            "output_blocked": self.output_blocked,
+            "output_errors": self.output_errors
+        }
+
 
 # Factory function
-def create_llm_proxy(endpoint: str) -> LLMProxy:
-    """Create LLM proxy with default security check"""
-    def default_check(prompt: str, model: str):
-        # TODO: Integrate with rule_engine + classifier
-        return True
-    
-    return LLMProxy(endpoint, default_check)
+def create_llm_proxy(
+    endpoint: str,
+    security_check: Callable[..., Awaitable[Dict[str, Any]]],
+    **options
+) -> LLMProxy:
+    """Create an LLM proxy that screens prompts with security_check"""
+    return LLMProxy(endpoint, security_check, **options)
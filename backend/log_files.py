@@ -0,0 +1,81 @@
+import glob
+import logging
+import os
+import time
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def tail_lines(path: str, limit: int) -> List[str]:
+    """
+    Last limit non-empty lines of a text file, oldest first. Reads backwards
+    from the end in blocks, so the cost depends on limit, not file size.
+    """
+    if limit <= 0:
+        return []
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return []
+
+    with f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        # limit lines need limit + 1 newlines unless the start of file is hit
+        while position > 0 and data.count(b"\n") <= limit:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+
+    lines = [line for line in data.split(b"\n") if line.strip()]
+    if position > 0:
+        # The first piece may be the tail end of a longer line
+        lines = lines[1:]
+    return [line.decode("utf-8", "replace") for line in lines[-limit:]]
+
+
+def rotate_if_needed(path: str, max_bytes: int, backups: int) -> bool:
+    """
+    Size-based rotation: path -> path.1 -> ... -> path.<backups>, the
+    oldest falling off. Returns True if the file was rotated.
+    """
+    if max_bytes <= 0:
+        return False
+    try:
+        if os.path.getsize(path) < max_bytes:
+            return False
+    except FileNotFoundError:
+        return False
+
+    if backups <= 0:
+        os.remove(path)
+        return True
+    for i in range(backups - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+    logger.info(f"Rotated {path}")
+    return True
+
+
+def drop_expired_files(pattern: str, retention_days: int) -> List[str]:
+    """Delete files matching pattern last modified more than retention_days ago"""
+    if retention_days <= 0:
+        return []
+    cutoff = time.time() - retention_days * 86400
+    dropped = []
+    for path in glob.glob(pattern):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                dropped.append(path)
+        except FileNotFoundError:
+            pass
+    if dropped:
+        logger.info(f"Dropped {len(dropped)} expired log files matching {pattern}")
+    return dropped
@@ -0,0 +1,229 @@
+"""
+In-process metrics: counters and fixed-bucket latency histograms,
+rendered in the Prometheus text exposition format.
+
+Pipeline stages are timed with timed(stage) or observe_stage(stage, s).
+Every observation goes to the bastion_stage_seconds histogram. Inside
+collect_timings() it is also added to a per-request breakdown, which
+the API can return as a Server-Timing header.
+
+Each worker process keeps its own registry.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds, from 10us to 10s
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram. An observation is a bisect and three
+    increments under a lock; quantiles are interpolated from the buckets.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _quantile(self, counts: List[int], total: int, q: float) -> float:
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per label set: count, mean and p50/p95/p99, in milliseconds"""
+        with self._lock:
+            snapshot = {labels: (list(s[0]), s[1], s[2]) for labels, s in self._series.items()}
+        result = {}
+        for labels, (counts, total_sum, total) in sorted(snapshot.items()):
+            entry: Dict[str, Any] = {
+                "count": total,
+                "mean_ms": round(total_sum / total * 1000, 3) if total else 0.0
+            }
+            for q in QUANTILES:
+                entry[f"p{int(q * 100)}_ms"] = round(self._quantile(counts, total, q) * 1000, 3)
+            result[",".join(labels)] = entry
+        return result
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: (list(s[0]), s[1], s[2]) for labels, s in self._series.items()}
+        for labels, (counts, total_sum, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total_sum}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {total}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+        # (prefix, stats function) pairs; numeric stats become untyped samples
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, prefix: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """Expose an existing stats() dict, e.g. the executor's, at scrape time"""
+        self._collectors = [c for c in self._collectors if c[0] != prefix] + [(prefix, stats)]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats in self._collectors:
+            for key, value in stats().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# TYPE {name} untyped")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "bastion_stage_seconds", "Time spent in each pipeline stage", ("stage",)
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "bastion_request_seconds", "End-to-end request time, including executor queueing", ("endpoint",)
+)
+DECISIONS = REGISTRY.counter(
+    "bastion_decisions_total", "Analysis results by decision and deciding tier", ("decision", "decided_by")
+)
+
+_enabled = True
+
+# Per-request stage breakdown, set only inside collect_timings()
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("bastion_timings", default=None)
+
+
+def configure_metrics(enabled: bool) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    if not _enabled:
+        return
+    STAGE_SECONDS.observe(seconds, stage)
+    timings = _timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def observe_request(endpoint: str, seconds: float) -> None:
+    if _enabled:
+        REQUEST_SECONDS.observe(seconds, endpoint)
+
+
+class timed:
+    """with timed("rules"): ... records the block's duration as a stage"""
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_stage(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+def collect_timings(fn: Callable[..., Any], *args) -> Tuple[Any, Dict[str, float]]:
+    """
+    Call fn and also return its stage breakdown (seconds per stage). Runs
+    fn in the calling thread, so use it inside the executor job.
+    """
+    timings: Dict[str, float] = {}
+    token = _timings.set(timings)
+    try:
+        return fn(*args), timings
+    finally:
+        _timings.reset(token)
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Server-Timing header value, durations in milliseconds"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in timings.items())
@@ -0,0 +1,132 @@
+import unicodedata
+from array import array
+from typing import Tuple
+
+# Invisible format characters commonly used to split trigger words
+ZERO_WIDTH = {
+    "\u00ad",                                          # soft hyphen
+    "\u180e",                                          # mongolian vowel separator
+    "\u200b", "\u200c", "\u200d", "\u200e", "\u200f",  # zero-width space/joiners, LRM/RLM
+    "\u202a", "\u202b", "\u202c", "\u202d", "\u202e",  # bidi embeddings and overrides
+    "\u2060", "\u2061", "\u2062", "\u2063", "\u2064",  # word joiner, invisible operators
+    "\u2066", "\u2067", "\u2068", "\u2069",            # bidi isolates
+    "\ufeff",                                          # zero-width no-break space / BOM
+}
+
+# Cyrillic and Greek letters that render like Latin ones (after NFKC)
+HOMOGLYPHS = str.maketrans({
+    "а": "a", "в": "b", "е": "e", "к": "k", "м": "m", "н": "h", "о": "o",
+    "р": "p", "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ј": "j",
+    "ѕ": "s", "ԁ": "d", "ԛ": "q", "ԝ": "w", "ӏ": "l",
+    "А": "A", "В": "B", "Е": "E", "К": "K", "М": "M", "Н": "H", "О": "O",
+    "Р": "P", "С": "C", "Т": "T", "У": "Y", "Х": "X", "І": "I", "Ј": "J",
+    "Ѕ": "S",
+    "α": "a", "ε": "e", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p",
+    "τ": "t", "υ": "u", "χ": "x",
+    "Α": "A", "Β": "B", "Ε": "E", "Ζ": "Z", "Η": "H", "Ι": "I", "Κ": "K",
+    "Μ": "M", "Ν": "N", "Ο": "O", "Ρ": "P", "Τ": "T", "Υ": "Y", "Χ": "X",
+})
+
+
+class NormalizedPrompt:
+    """
+    Canonical view of a prompt, computed once per request and shared by
+    every detector.
+
+    text:       NFKC-normalized, zero-width characters removed, Cyrillic/Greek
+                homoglyphs folded to Latin, for the rule engine
+    lowered:    text.lower(), for case-insensitive keyword scans
+    model_text: text without the homoglyph fold, for the classifier, so
+                genuine Cyrillic or Greek prompts reach it intact. Folding
+                is one-to-one, so it has the same length and offsets as text
+
+    Both views keep a per-character offset back into the original prompt,
+    so spans found by a detector can be reported against what the user sent.
+    """
+
+    __slots__ = ("original", "text", "lowered", "model_text", "_offsets", "_lowered_offsets")
+
+    def __init__(self, prompt: str):
+        self.original = prompt
+
+        if prompt.isascii():
+            # ASCII is already NFKC, has no zero-width or homoglyph
+            # characters, and lowercases one-to-one: offsets are identity
+            self.text = prompt
+            self.lowered = prompt.lower()
+            self.model_text = prompt
+            self._offsets = None
+            self._lowered_offsets = None
+            return
+
+        if unicodedata.is_normalized("NFKC", prompt) and not ZERO_WIDTH.intersection(prompt):
+            # Homoglyph folding is one-to-one, so offsets stay identity
+            # unless lowercasing changes the length
+            text = prompt.translate(HOMOGLYPHS)
+            lowered = text.lower()
+            if len(lowered) == len(text):
+                self.text = text
+                self.lowered = lowered
+                self.model_text = prompt
+                self._offsets = None
+                self._lowered_offsets = None
+                return
+
+        model_parts = []
+        text_parts = []
+        lowered_parts = []
+        offsets = array("I")
+        lowered_offsets = array("I")
+
+        for start, segment in _segments(prompt):
+            canonical = unicodedata.normalize("NFKC", segment)
+            canonical = "".join(ch for ch in canonical if ch not in ZERO_WIDTH)
+            if not canonical:
+                continue
+            model_parts.append(canonical)
+            canonical = canonical.translate(HOMOGLYPHS)
+            lowered = canonical.lower()
+
+            text_parts.append(canonical)
+            lowered_parts.append(lowered)
+            offsets.extend([start] * len(canonical))
+            lowered_offsets.extend([start] * len(lowered))
+
+        self.model_text = "".join(model_parts)
+        self.text = "".join(text_parts)
+        self.lowered = "".join(lowered_parts)
+        self._offsets = offsets
+        self._lowered_offsets = lowered_offsets
+
+    @property
+    def changed(self) -> bool:
+        return self.text != self.original
+
+    def to_original(self, start: int, end: int, lowered: bool = False) -> Tuple[int, int]:
+        """Map a [start, end) span in text (or lowered) back to the original prompt"""
+        offsets = self._lowered_offsets if lowered else self._offsets
+        if offsets is None:
+            return start, end
+        if start >= len(offsets):
+            return len(self.original), len(self.original)
+        original_end = len(self.original) if end >= len(offsets) else offsets[end]
+        return offsets[start], max(original_end, offsets[start] + 1)
+
+
+def _segments(prompt: str):
+    """
+    Split prompt into (offset, segment) pairs where each segment is a
+    starter character followed by its combining marks, so NFKC composition
+    never crosses a segment boundary.
+    """
+    start = 0
+    for i in range(1, len(prompt)):
+        if not unicodedata.combining(prompt[i]):
+            yield start, prompt[start:i]
+            start = i
+    if prompt:
+        yield start, prompt[start:]
+
+
+def normalize_prompt(prompt: str) -> NormalizedPrompt:
+    return NormalizedPrompt(prompt)
@@ -0,0 +1,187 @@
+"""
+Multi-process server for the Bastion API.
+
+The master process loads the classifier once, then forks WORKERS children
+that all accept on one shared listening socket. Model weights are shared
+with the children copy-on-write: nothing writes to them after load, and
+gc.freeze() keeps the collector from touching (and so copying) the pages
+holding them. Each worker gets its own slice of torch threads and,
+optionally, its own CPU cores.
+
+Usage:
+    WORKERS=4 python -m backend.serve
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dotenv import load_dotenv
+
+# Before WORKERS is read, so a WORKERS set only in .env counts too
+load_dotenv()
+
+_workers = int(os.getenv("WORKERS", 1))
+if _workers > 1:
+    # State that must be visible to every worker goes through SQLite,
+    # unless set otherwise (empty counts as unset)
+    for _name, _default in (("SESSION_BACKEND", "sqlite"), ("VERDICT_CACHE_DB", "data/verdict_cache.db")):
+        if not os.getenv(_name):
+            os.environ[_name] = _default
+
+import gc
+import logging
+import signal
+import socket
+import time
+from typing import Dict, List
+
+import uvicorn
+
+from backend.config import (
+    API_HOST, API_PORT, WORKERS, TORCH_THREADS_PER_WORKER, CPU_AFFINITY, INFERENCE_BACKEND,
+    SESSION_BACKEND
+)
+from ml.classifier import configure_backend, get_backend
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between restarts of a crashing worker slot
+RESTART_BACKOFF = 1.0
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _core_slices(workers: int) -> List[List[int]]:
+    """Split the CPUs available to this process into one slice per worker"""
+    cores = sorted(os.sched_getaffinity(0))
+    per_worker = max(len(cores) // workers, 1)
+    return [
+        cores[(i * per_worker) % len(cores):(i * per_worker) % len(cores) + per_worker]
+        for i in range(workers)
+    ]
+
+
+def _threads_per_worker(workers: int) -> int:
+    if TORCH_THREADS_PER_WORKER > 0:
+        return TORCH_THREADS_PER_WORKER
+    return max(len(os.sched_getaffinity(0)) // workers, 1)
+
+
+def _run_worker(slot: int, sock: socket.socket, cores: List[int], threads: int) -> None:
+    """Entry point of a forked worker; never returns"""
+    import torch
+
+    # The master's signal handlers must not run in the worker
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    if CPU_AFFINITY:
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads)
+    logger.info(f"Worker {slot} (pid {os.getpid()}) threads={threads} cores={cores if CPU_AFFINITY else 'all'}")
+
+    from backend.bastion_api import app
+
+    config = uvicorn.Config(app, lifespan="on", log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+    os._exit(0)
+
+
+def _preload_model() -> None:
+    """Load the classifier in the master so workers inherit it"""
+    import torch
+
+    # No inference runs in the master; keep its thread pool from being
+    # started before fork()
+    torch.set_num_threads(1)
+    start = time.perf_counter()
+    configure_backend(INFERENCE_BACKEND)
+    get_backend()
+    logger.info(f"Loaded {INFERENCE_BACKEND} backend in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    # Move everything allocated so far out of the collector's reach so
+    # its refcount/GC bookkeeping does not dirty shared pages
+    gc.collect()
+    gc.freeze()
+
+
+def serve(workers: int = WORKERS, host: str = API_HOST, port: int = API_PORT) -> None:
+    if workers <= 1:
+        from backend.bastion_api import app
+        uvicorn.run(app, host=host, port=port)
+        return
+    if SESSION_BACKEND == "memory":
+        # Each worker would see only its own sessions: random 404s
+        raise SystemExit(
+            f"SESSION_BACKEND=memory cannot be shared by {workers} workers; "
+            "use SESSION_BACKEND=sqlite or WORKERS=1"
+        )
+
+    _preload_model()
+    sock = _bind_socket(host, port)
+    slices = _core_slices(workers)
+    threads = _threads_per_worker(workers)
+
+    children: Dict[int, int] = {}
+    started_at: Dict[int, float] = {}
+    stopping = False
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(slot, sock, slices[slot], threads)
+            finally:
+                os._exit(1)
+        children[pid] = slot
+        started_at[slot] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info(f"Starting {workers} workers on {host}:{port}")
+    for slot in range(workers):
+        spawn(slot)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        slot = children.pop(pid, None)
+        if slot is None or stopping:
+            continue
+
+        logger.warning(f"Worker {slot} (pid {pid}) exited with status {status}; restarting")
+        elapsed = time.monotonic() - started_at[slot]
+        if elapsed < RESTART_BACKOFF:
+            time.sleep(RESTART_BACKOFF - elapsed)
+        spawn(slot)
+
+    sock.close()
+    logger.info("All workers stopped")
+
+
+if __name__ == "__main__":
+    serve()
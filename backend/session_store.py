@@ -0,0 +1,629 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from backend.conversation import ConversationState
+
+logger = logging.getLogger(__name__)
+
+
+class SessionNotFound(KeyError):
+    """The session does not exist, or has expired"""
+
+
+# Fields a session listing can project; analysis_count is only on request
+SESSION_FIELDS = ("id", "created_at", "metadata", "analyses", "analysis_count", "conversation")
+DEFAULT_SESSION_FIELDS = ("id", "created_at", "analyses", "metadata", "conversation")
+MAX_SESSION_PAGE = 1000
+
+
+def encode_cursor(created_at: str, session_id: str) -> str:
+    return f"{created_at}|{session_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    created_at, _, session_id = cursor.partition("|")
+    if not created_at or not session_id:
+        raise ValueError("Invalid cursor")
+    return created_at, session_id
+
+
+def _created_at(value: str) -> str:
+    """Accept the stored ISO format as well as a space separator"""
+    return value.replace(" ", "T")
+
+
+class TurnLocks:
+    """
+    One lock per session, held for a whole turn (get_state, evaluate,
+    save_state), so concurrent turns of a session run one after the other
+    instead of mutating one ConversationState at once. Locks exist only
+    while in use.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, list] = {}  # session_id -> [lock, users]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, session_id: str):
+        with self._lock:
+            entry = self._locks.setdefault(session_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[session_id]
+
+
+# ============================================================================
+# COMPACT RECORDS
+# ============================================================================
+class AnalysisRecord:
+    """One analysis result, stored without the per-dict overhead"""
+
+    __slots__ = (
+        "risk_score", "violation_type", "confidence", "decision", "integrity_score",
+        "instruction_depth", "violations", "decided_by", "timestamp"
+    )
+
+    def __init__(self, result: Dict[str, Any]):
+        self.risk_score = result.get("risk_score")
+        self.violation_type = sys.intern(result.get("violation_type") or "")
+        self.confidence = result.get("confidence")
+        self.decision = sys.intern(result.get("decision") or "")
+        self.integrity_score = result.get("integrity_score")
+        self.instruction_depth = result.get("instruction_depth", 0)
+        # (rule_id, rule_name, severity) tuples of interned strings
+        self.violations = tuple(
+            (
+                sys.intern(str(v.get("rule_id"))),
+                sys.intern(str(v.get("rule_name"))),
+                sys.intern(str(v.get("severity", "medium")))
+            )
+            for v in result.get("violations", ())
+        )
+        self.decided_by = sys.intern(result.get("decided_by") or "model")
+        self.timestamp = result.get("timestamp")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "risk_score": self.risk_score,
+            "violation_type": self.violation_type,
+            "confidence": self.confidence,
+            "decision": self.decision,
+            "integrity_score": self.integrity_score,
+            "instruction_depth": self.instruction_depth,
+            "violations": [
+                {"rule_id": rule_id, "rule_name": rule_name, "severity": severity}
+                for rule_id, rule_name, severity in self.violations
+            ],
+            "decided_by": self.decided_by,
+            "timestamp": self.timestamp
+        }
+
+
+class SessionRecord:
+    __slots__ = ("id", "created_at", "metadata", "analyses", "last_access", "state")
+
+    def __init__(self, session_id: str, metadata: Optional[Dict]):
+        self.id = session_id
+        self.created_at = datetime.now().isoformat()
+        self.metadata = metadata or None
+        self.analyses: List[AnalysisRecord] = []
+        self.last_access = time.monotonic()
+        self.state: Optional[ConversationState] = None
+
+    @property
+    def model(self) -> Optional[str]:
+        return self.metadata.get("model") if self.metadata else None
+
+    def to_dict(self, fields=DEFAULT_SESSION_FIELDS) -> Dict[str, Any]:
+        session = {}
+        if "id" in fields:
+            session["id"] = self.id
+        if "created_at" in fields:
+            session["created_at"] = self.created_at
+        if "analyses" in fields:
+            session["analyses"] = [analysis.to_dict() for analysis in self.analyses]
+        if "analysis_count" in fields:
+            session["analysis_count"] = len(self.analyses)
+        if "metadata" in fields:
+            session["metadata"] = self.metadata or {}
+        if "conversation" in fields and self.state is not None:
+            session["conversation"] = self.state.summary()
+        return session
+
+
+# ============================================================================
+# IN-MEMORY SESSION STATE (single process, bounded)
+# ============================================================================
+class SessionStateManager:
+    """
+    In-memory sessions with a fixed upper bound.
+
+    Sessions are kept in LRU order. A session idle for ttl_seconds expires.
+    Past max_sessions, the least recently used one is evicted. Each session
+    keeps its last max_analyses results. With a spill store, evicted and
+    expired sessions are written there, conversation state included;
+    get_session falls back to it, and get_state brings the session back
+    into memory so its conversation can continue.
+
+    Listings are served from sorted (created_at, id) indexes, one over all
+    sessions and one per metadata model, so a page is a bisect plus a
+    slice rather than a scan.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        ttl_seconds: float = 3600.0,
+        max_analyses: int = 100,
+        spill: Optional["SqliteSessionStore"] = None
+    ):
+        self.max_sessions = max_sessions
+        self.ttl = ttl_seconds
+        self.max_analyses = max_analyses
+        self.spill = spill
+        self.sessions: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        # None indexes every session; other keys are metadata models
+        self._index: Dict[Optional[str], List[Tuple[str, str]]] = {None: []}
+        self._lock = threading.Lock()
+        self._turn_locks = TurnLocks()
+
+        self.evictions = 0
+        self.expirations = 0
+        self.spilled = 0
+        self.trimmed_analyses = 0
+
+    def _touch(self, session: SessionRecord) -> None:
+        session.last_access = time.monotonic()
+        self.sessions.move_to_end(session.id)
+
+    def _index_keys(self, session: SessionRecord):
+        keys = [None]
+        if session.model is not None:
+            keys.append(session.model)
+        return keys
+
+    def _index_add(self, session: SessionRecord) -> None:
+        entry = (session.created_at, session.id)
+        for key in self._index_keys(session):
+            insort(self._index.setdefault(key, []), entry)
+
+    def _index_remove(self, session: SessionRecord) -> None:
+        entry = (session.created_at, session.id)
+        for key in self._index_keys(session):
+            index = self._index[key]
+            position = bisect_left(index, entry)
+            if position < len(index) and index[position] == entry:
+                del index[position]
+            if key is not None and not index:
+                del self._index[key]
+
+    def _remove_stale(self) -> List[SessionRecord]:
+        """Pop expired and over-capacity sessions; caller holds the lock"""
+        removed = []
+        # LRU order is also idle-time order, so expired sessions are at the front
+        cutoff = time.monotonic() - self.ttl
+        while self.sessions:
+            oldest = next(iter(self.sessions.values()))
+            if self.ttl > 0 and oldest.last_access < cutoff:
+                self.expirations += 1
+            elif len(self.sessions) > self.max_sessions:
+                self.evictions += 1
+            else:
+                break
+            session = self.sessions.popitem(last=False)[1]
+            self._index_remove(session)
+            removed.append(session)
+        return removed
+
+    def _spill(self, removed: List[SessionRecord]) -> None:
+        if self.spill is None or not removed:
+            return
+        for session in removed:
+            self.spill.save_session(session.to_dict(), session.state)
+        with self._lock:
+            self.spilled += len(removed)
+
+    def create_session(self, metadata: Dict = None) -> str:
+        session = SessionRecord(str(uuid.uuid4()), metadata)
+        with self._lock:
+            self.sessions[session.id] = session
+            self._index_add(session)
+            removed = self._remove_stale()
+        self._spill(removed)
+        return session.id
+
+    def get_session(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is not None:
+                self._touch(session)
+                return session.to_dict()
+        if self.spill is not None:
+            return self.spill.get_session(session_id)
+        return None
+
+    def add_analysis(self, session_id: str, analysis_result: Dict) -> None:
+        record = AnalysisRecord(analysis_result)
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return
+            session.analyses.append(record)
+            if len(session.analyses) > self.max_analyses:
+                del session.analyses[0]
+                self.trimmed_analyses += 1
+            self._touch(session)
+
+    def _restore(self, session_id: str) -> Optional[SessionRecord]:
+        """Bring a spilled session back into memory"""
+        if self.spill is None:
+            return None
+        data = self.spill.get_session(session_id)
+        if data is None:
+            return None
+        session = SessionRecord(data["id"], data["metadata"])
+        session.created_at = data["created_at"]
+        session.analyses = [AnalysisRecord(analysis) for analysis in data["analyses"][-self.max_analyses:]]
+        session.state = self.spill.get_state(session_id)
+        with self._lock:
+            # Restored by a concurrent call in the meantime
+            existing = self.sessions.get(session_id)
+            if existing is not None:
+                self._touch(existing)
+                return existing
+            self.sessions[session.id] = session
+            self._index_add(session)
+            removed = self._remove_stale()
+        self._spill(removed)
+        return session
+
+    def get_state(self, session_id: str) -> Optional[ConversationState]:
+        """Conversation state of a session (None if it has none yet)"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is not None:
+                self._touch(session)
+                return session.state
+        session = self._restore(session_id)
+        if session is None:
+            raise SessionNotFound(session_id)
+        return session.state
+
+    def turn_lock(self, session_id: str):
+        """with store.turn_lock(id): get_state, evaluate, save_state"""
+        return self._turn_locks.hold(session_id)
+
+    def save_state(self, session_id: str, state: ConversationState) -> None:
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is not None:
+                session.state = state
+
+    def list_sessions(
+        self,
+        model: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        after: Optional[str] = None,
+        limit: int = 100,
+        fields=DEFAULT_SESSION_FIELDS
+    ) -> Dict[str, Any]:
+        """
+        One page of live sessions in creation order. Pass the returned
+        next_cursor as after for the following page.
+        """
+        limit = max(1, min(limit, MAX_SESSION_PAGE))
+        until = _created_at(until) if until is not None else None
+        with self._lock:
+            removed = self._remove_stale()
+            index = self._index.get(model, [])
+            position = bisect_left(index, (_created_at(since), "")) if since is not None else 0
+            if after is not None:
+                position = max(position, bisect_right(index, decode_cursor(after)))
+            page = []
+            for created_at, session_id in index[position:position + limit]:
+                if until is not None and created_at >= until:
+                    break
+                page.append(self.sessions[session_id])
+            sessions = [session.to_dict(fields) for session in page]
+            more = len(page) == limit and position + limit < len(index)
+        self._spill(removed)
+        return {
+            "sessions": sessions,
+            "count": len(sessions),
+            "next_cursor": encode_cursor(page[-1].created_at, page[-1].id) if more else None
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self.sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl,
+                "max_analyses": self.max_analyses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "spilled": self.spilled,
+                "trimmed_analyses": self.trimmed_analyses,
+                "spill": self.spill is not None
+            }
+
+
+# ============================================================================
+# SQLITE SESSION STATE (shared by all worker processes)
+# ============================================================================
+class SqliteSessionStore:
+    """
+    Same interface as SessionStateManager, backed by a SQLite file in WAL
+    mode so every worker process sees every session. Each thread keeps its
+    own connection. The model from the metadata is kept in its own column
+    so listings filtered by model and creation time use an index.
+    """
+
+    def __init__(self, db_path: str = "data/sessions.db"):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._turn_locks = TurnLocks()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                created_at TEXT,
+                metadata TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_analyses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT,
+                result TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_session_analyses_session
+            ON session_analyses (session_id, id)
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        for column in ("state", "model"):
+            if column in columns:
+                continue
+            try:
+                conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} TEXT")
+            except sqlite3.OperationalError:
+                # Added by another worker in the meantime
+                continue
+            if column == "model":
+                conn.execute("UPDATE sessions SET model = json_extract(metadata, '$.model')")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_created ON sessions (created_at, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_model ON sessions (model, created_at, id)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # A connection must not be reused across fork()
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create_session(self, metadata: Dict = None) -> str:
+        session_id = str(uuid.uuid4())
+        conn = self._conn()
+        metadata = metadata or {}
+        conn.execute(
+            "INSERT INTO sessions (id, created_at, metadata, model) VALUES (?, ?, ?, ?)",
+            (session_id, datetime.now().isoformat(), json.dumps(metadata), metadata.get("model"))
+        )
+        conn.commit()
+        return session_id
+
+    def _session_dict(self, row, analyses: List[Dict]) -> Dict[str, Any]:
+        session = {
+            "id": row[0],
+            "created_at": row[1],
+            "analyses": analyses,
+            "metadata": json.loads(row[2])
+        }
+        if row[3]:
+            session["conversation"] = ConversationState.from_dict(json.loads(row[3])).summary()
+        return session
+
+    def get_session(self, session_id: str) -> Dict[str, Any]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT id, created_at, metadata, state FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        analyses = [
+            json.loads(result) for (result,) in conn.execute(
+                "SELECT result FROM session_analyses WHERE session_id = ? ORDER BY id",
+                (session_id,)
+            )
+        ]
+        return self._session_dict(row, analyses)
+
+    def get_state(self, session_id: str) -> Optional[ConversationState]:
+        row = self._conn().execute("SELECT state FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            raise SessionNotFound(session_id)
+        return ConversationState.from_dict(json.loads(row[0]) if row[0] else None)
+
+    def turn_lock(self, session_id: str):
+        """
+        Serializes a session's turns within this process. Each get_state
+        returns a private copy, so turns in different workers cannot corrupt
+        the state; the later save wins.
+        """
+        return self._turn_locks.hold(session_id)
+
+    def save_state(self, session_id: str, state: ConversationState) -> None:
+        conn = self._conn()
+        conn.execute("UPDATE sessions SET state = ? WHERE id = ?", (json.dumps(state.to_dict()), session_id))
+        conn.commit()
+
+    def save_session(self, session: Dict[str, Any], state: Optional[ConversationState] = None) -> None:
+        """Store a whole session, e.g. one evicted from memory"""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, created_at, metadata, model, state) VALUES (?, ?, ?, ?, ?)",
+                (
+                    session["id"], session["created_at"], json.dumps(session["metadata"]),
+                    session["metadata"].get("model"),
+                    json.dumps(state.to_dict()) if state is not None else None
+                )
+            )
+            conn.execute("DELETE FROM session_analyses WHERE session_id = ?", (session["id"],))
+            conn.executemany(
+                "INSERT INTO session_analyses (session_id, result) VALUES (?, ?)",
+                [(session["id"], json.dumps(analysis)) for analysis in session["analyses"]]
+            )
+
+    def add_analysis(self, session_id: str, analysis_result: Dict) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO session_analyses (session_id, result) "
+            "SELECT id, ? FROM sessions WHERE id = ?",
+            (json.dumps(analysis_result), session_id)
+        )
+        conn.commit()
+
+    def list_sessions(
+        self,
+        model: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        after: Optional[str] = None,
+        limit: int = 100,
+        fields=DEFAULT_SESSION_FIELDS
+    ) -> Dict[str, Any]:
+        """
+        One page of sessions in creation order, as a keyset range scan on
+        (created_at, id) or (model, created_at, id). Only the requested
+        fields are read and decoded.
+        """
+        clauses = []
+        params: List[Any] = []
+        if model is not None:
+            clauses.append("model = ?")
+            params.append(model)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(_created_at(since))
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(_created_at(until))
+        if after is not None:
+            clauses.append("(created_at, id) > (?, ?)")
+            params.extend(decode_cursor(after))
+
+        limit = max(1, min(limit, MAX_SESSION_PAGE))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn = self._conn()
+        rows = conn.execute(
+            f"SELECT id, created_at, metadata, state FROM sessions {where} "
+            f"ORDER BY created_at, id LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+
+        ids = [row[0] for row in rows]
+        placeholders = ", ".join("?" * len(ids))
+        analyses: Dict[str, List[Dict]] = {}
+        if ids and "analyses" in fields:
+            for session_id, result in conn.execute(
+                f"SELECT session_id, result FROM session_analyses "
+                f"WHERE session_id IN ({placeholders}) ORDER BY id",
+                ids
+            ):
+                analyses.setdefault(session_id, []).append(json.loads(result))
+        counts: Dict[str, int] = {}
+        if ids and "analysis_count" in fields:
+            counts = dict(conn.execute(
+                f"SELECT session_id, COUNT(*) FROM session_analyses "
+                f"WHERE session_id IN ({placeholders}) GROUP BY session_id",
+                ids
+            ))
+
+        sessions = []
+        for row in rows:
+            session = {}
+            if "id" in fields:
+                session["id"] = row[0]
+            if "created_at" in fields:
+                session["created_at"] = row[1]
+            if "analyses" in fields:
+                session["analyses"] = analyses.get(row[0], [])
+            if "analysis_count" in fields:
+                session["analysis_count"] = counts.get(row[0], 0)
+            if "metadata" in fields:
+                session["metadata"] = json.loads(row[2])
+            if "conversation" in fields and row[3]:
+                session["conversation"] = ConversationState.from_dict(json.loads(row[3])).summary()
+            sessions.append(session)
+
+        return {
+            "sessions": sessions,
+            "count": len(sessions),
+            "next_cursor": encode_cursor(rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        count = self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {"backend": "sqlite", "sessions": count, "db_path": self.db_path}
+
+
+def iter_sessions(store, page_size: int = MAX_SESSION_PAGE, **filters) -> Iterator[List[Dict[str, Any]]]:
+    """Every matching session, one page at a time"""
+    after = filters.pop("after", None)
+    while True:
+        page = store.list_sessions(after=after, limit=page_size, **filters)
+        if page["sessions"]:
+            yield page["sessions"]
+        after = page["next_cursor"]
+        if after is None:
+            return
+
+
+def create_session_store(
+    backend: str = "memory",
+    db_path: str = "data/sessions.db",
+    max_sessions: int = 10000,
+    ttl_seconds: float = 3600.0,
+    max_analyses: int = 100,
+    spill: bool = False
+):
+    if backend == "sqlite":
+        return SqliteSessionStore(db_path)
+    if backend != "memory":
+        raise ValueError(f"Unknown session backend: {backend}")
+    return SessionStateManager(
+        max_sessions=max_sessions,
+        ttl_seconds=ttl_seconds,
+        max_analyses=max_analyses,
+        spill=SqliteSessionStore(db_path) if spill else None
+    )
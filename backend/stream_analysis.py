@@ -0,0 +1,177 @@
+import codecs
+from typing import Any, Dict, List, Optional
+
+from backend.normalizer import normalize_prompt
+from ml.classifier import BLOCK_THRESHOLD, evaluate, evaluate_batch
+from rules.incremental import IncrementalScanner
+from rules.rule_engine import RuleEngine
+
+
+class StreamAnalyzer:
+    """
+    Verdict over text that arrives in chunks, in bounded memory.
+
+    Bytes go through an incremental UTF-8 decoder, so a character split
+    across chunks is reassembled, and are normalized piece by piece. Rules
+    run on each piece through an IncrementalScanner, so matches spanning a
+    chunk boundary are found without rescanning. The normalized text is
+    cut into classifier windows of window_chars overlapping by
+    overlap_chars; the windows a chunk completes are scored in batches.
+    Only the scanner's carry-over and the unfinished window are kept.
+
+    blocked turns True as soon as the outcome can no longer be allow: a
+    rule violation, or a window whose risk crosses BLOCK_THRESHOLD.
+
+    With defer_scoring, completed windows are queued instead of scored, so
+    a caller relaying a stream can run the rules inline and the classifier
+    alongside it (take_windows, then score_windows). With classify=False
+    only the rules run and no windows are kept at all.
+    """
+
+    def __init__(
+        self,
+        rule_engine: RuleEngine,
+        window_chars: int = 512,
+        overlap_chars: int = 128,
+        carry_chars: int = 256,
+        max_batch_size: int = 16,
+        defer_scoring: bool = False,
+        classify: bool = True
+    ):
+        if not 0 <= overlap_chars < window_chars:
+            raise ValueError("overlap_chars must be smaller than window_chars")
+        self.rule_engine = rule_engine
+        self.window_chars = window_chars
+        self.overlap_chars = overlap_chars
+        self.max_batch_size = max_batch_size
+        self.defer_scoring = defer_scoring
+        self.classify = classify
+        self.scanner = IncrementalScanner(carry_chars)
+
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        # Trailing character held back so NFKC can compose it with what follows
+        self._held = ""
+        self._window = ""
+        # Leading characters of _window already covered by a scored window
+        self._scored = 0
+        self._deferred: List[str] = []
+
+        self.violations: List[Dict] = []
+        self.ml: Optional[Dict[str, Any]] = None
+        self.bytes_received = 0
+        self.chars_scanned = 0
+        self.windows_scored = 0
+        self.blocked = False
+
+    def feed(self, chunk: bytes) -> bool:
+        """Analyze the next chunk of the body; returns blocked"""
+        self.bytes_received += len(chunk)
+        return self.feed_text(self._decoder.decode(chunk))
+
+    def feed_text(self, text: str) -> bool:
+        """Analyze the next piece of already decoded text; returns blocked"""
+        text = self._held + text
+        self._held = ""
+        if text and not text[-1].isascii():
+            text, self._held = text[:-1], text[-1]
+        if text:
+            self._scan(text)
+        return self.blocked
+
+    def flush(self) -> bool:
+        """Run the rules over held-back text at the end of the input; returns blocked"""
+        if not self.blocked:
+            text = self._held + self._decoder.decode(b"", final=True)
+            self._held = ""
+            if text:
+                self._scan(text)
+        return self.blocked
+
+    @property
+    def held_bytes(self) -> int:
+        """
+        UTF-8 length of what was fed but not yet through the rules: a
+        partial character in the decoder and the held-back character
+        """
+        return len(self._decoder.getstate()[0]) + len(self._held.encode("utf-8"))
+
+    def take_windows(self) -> List[str]:
+        """Completed windows queued by defer_scoring, oldest first"""
+        windows, self._deferred = self._deferred, []
+        return windows
+
+    def score_windows(self, windows: List[str]) -> bool:
+        """Score windows from take_windows(); returns blocked"""
+        if windows and not self.blocked:
+            self._score(windows)
+        return self.blocked
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Flush what is left and return the verdict, in the same shape as
+        AnalysisPipeline verdicts ({"ml", "violations", "decided_by"})
+        """
+        self.flush()
+        if not self.classify:
+            return self.verdict()
+        self.score_windows(self.take_windows())
+        if not self.blocked and (self.windows_scored == 0 or len(self._window) > self._scored):
+            self._score([self._window])
+        return self.verdict()
+
+    def verdict(self) -> Dict[str, Any]:
+        """The verdict so far, without scoring anything more"""
+        ml = self.ml
+        if ml is None:
+            # Blocked by rules before any window was scored
+            ml = {"risk_score": 1.0, "violation_type": "RuleViolation", "confidence": 1.0}
+        return {
+            "ml": ml,
+            "violations": self.violations,
+            "decided_by": "rules" if self.violations else "model"
+        }
+
+    def _scan(self, text: str) -> None:
+        view = normalize_prompt(text)
+        self.chars_scanned += len(view.text)
+
+        _, violations = self.rule_engine.check_increment(self.scanner, view.text, lowered=view.lowered)
+        seen = {violation["rule_id"] for violation in self.violations}
+        for violation in violations:
+            if violation["rule_id"] not in seen:
+                self.violations.append(violation)
+        if self.violations:
+            self.blocked = True
+            return
+        if not self.classify:
+            return
+
+        self._window += view.model_text
+        full = []
+        step = self.window_chars - self.overlap_chars
+        while len(self._window) >= self.window_chars:
+            full.append(self._window[:self.window_chars])
+            self._window = self._window[step:]
+            self._scored = self.overlap_chars
+        if full and self.defer_scoring:
+            self._deferred.extend(full)
+        elif full:
+            self._score(full)
+
+    def _score(self, windows: List[str]) -> None:
+        """Score windows a batch at a time, stopping at the first batch that blocks"""
+        for start in range(0, len(windows), self.max_batch_size):
+            group = windows[start:start + self.max_batch_size]
+            if len(group) == 1:
+                # Through the shared micro-batcher, with other requests' prompts
+                results = [evaluate(group[0])]
+            else:
+                results = evaluate_batch(group, max_batch_size=self.max_batch_size)
+            self.windows_scored += len(group)
+
+            for result in results:
+                if self.ml is None or result["risk_score"] > self.ml["risk_score"]:
+                    self.ml = result
+            if self.ml["risk_score"] > BLOCK_THRESHOLD:
+                self.blocked = True
+                return
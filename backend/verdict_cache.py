@@ -0,0 +1,219 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Purge expired rows from the SQLite tier every N writes
+DISK_PURGE_INTERVAL = 1000
+
+
+class VerdictCache:
+    """
+    Bounded cache of detector verdicts keyed by normalized-prompt hash.
+
+    Memory tier: LRU ordered dict with a per-entry TTL.
+    Disk tier (optional): SQLite table that survives restarts; consulted on
+    memory misses and written on every fill.
+    Concurrent get_or_compute calls for the same key are coalesced so only
+    one of them runs the computation.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300.0, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._disk_writes = 0
+        if db_path:
+            self._open_db(db_path)
+
+    @staticmethod
+    def make_key(text: str, *versions: str) -> str:
+        h = hashlib.sha256()
+        for version in versions:
+            h.update(str(version).encode())
+            h.update(b"\0")
+        h.update(text.encode("utf-8", "surrogatepass"))
+        return h.hexdigest()
+
+    # ------------------------------------------------------------------
+    # Disk tier
+    # ------------------------------------------------------------------
+    def _open_db(self, db_path: str) -> None:
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS verdict_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                expires_at REAL
+            )
+        """)
+        self._db.commit()
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        """Return (value, expires_at) or None"""
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM verdict_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < now:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _disk_put(self, key: str, value: Any, expires_at: float) -> None:
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO verdict_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at)
+                )
+                self._disk_writes += 1
+                if self._disk_writes % DISK_PURGE_INTERVAL == 0:
+                    self._db.execute("DELETE FROM verdict_cache WHERE expires_at < ?", (time.time(),))
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Verdict cache disk write failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Memory tier
+    # ------------------------------------------------------------------
+    def _memory_get(self, key: str, now: float) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < now:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _memory_put(self, key: str, value: Any, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            value = self._memory_get(key, now)
+            if value is not None:
+                self.hits += 1
+                return value
+
+        stored = self._disk_get(key, now)
+        with self._lock:
+            if stored is not None:
+                self.disk_hits += 1
+                self._memory_put(key, stored[0], stored[1])
+                return stored[0]
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._memory_put(key, value, expires_at)
+        self._disk_put(key, value, expires_at)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        Cached value for key, else compute() once for all concurrent callers.
+        Computed values for which cacheable(value) is false are returned but
+        not stored.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            # Another caller may have filled the entry since our lookup
+            value = self._memory_get(key, time.time())
+            if value is not None:
+                return value
+            future = self._inflight.get(key)
+            if future is None:
+                future = Future()
+                self._inflight[key] = future
+                owner = True
+            else:
+                self.coalesced += 1
+                owner = False
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            if cacheable is None or cacheable(value):
+                self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM verdict_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_tier": self._db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "inflight": len(self._inflight),
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
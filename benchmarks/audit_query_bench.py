@@ -0,0 +1,94 @@
+"""
+Benchmark: audit query latency as audit_logs grows.
+
+Fills a scratch partition in steps and times a filtered first page, a deep
+keyset page (after_id near the oldest rows) and a session lookup. With
+the indexes from the schema migrations all three should stay roughly
+flat as the row count grows.
+
+Usage:
+    python benchmarks/audit_query_bench.py [--max-rows 10000000] [--repeat 50]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend import audit_logger
+from backend.audit_query import ReadPool, query_logs
+
+DECISIONS = ("allow", "block")
+VIOLATION_TYPES = ("Benign", "Injection", "Jailbreak", "Exfiltration")
+
+
+def fill(conn: sqlite3.Connection, start: int, count: int, rng: random.Random) -> None:
+    rows = []
+    for i in range(start, start + count):
+        risk = rng.random()
+        rows.append((
+            time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(1_700_000_000 + i)),
+            f"session-{i}",
+            round(risk, 2),
+            rng.choice(VIOLATION_TYPES),
+            DECISIONS[risk > 0.7],
+            round(1 - risk, 2),
+            0,
+            0
+        ))
+        if len(rows) == 100_000:
+            conn.executemany(audit_logger.INSERT_SQL, rows)
+            rows.clear()
+    if rows:
+        conn.executemany(audit_logger.INSERT_SQL, rows)
+    conn.commit()
+
+
+def time_call(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-rows", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        audit_logger.DB_PATH = os.path.join(workdir, "legacy.db")
+        audit_logger.AUDIT_DIR = os.path.join(workdir, "audit")
+        audit_logger.init_db()
+        conn = audit_logger.open_partition(time.strftime("%Y%m%d", time.gmtime()))
+
+        print(f"{'rows':>11} {'first page ms':>14} {'deep page ms':>13} {'session ms':>11}")
+        rows = 0
+        target = 100_000
+        while target <= args.max_rows:
+            fill(conn, rows, target - rows, rng)
+            rows = target
+
+            pool = ReadPool(size=1)
+            first = time_call(lambda: query_logs(pool, decision="block", min_risk=0.9, limit=50), args.repeat)
+            deep = time_call(
+                lambda: query_logs(pool, decision="block", after_id=rows // 100, limit=50), args.repeat
+            )
+            session = time_call(
+                lambda: query_logs(pool, session_id=f"session-{rng.randrange(rows)}"), args.repeat
+            )
+            pool.close()
+
+            print(f"{rows:>11} {first:>14.3f} {deep:>13.3f} {session:>11.3f}")
+            target *= 10
+
+
+if __name__ == "__main__":
+    main()
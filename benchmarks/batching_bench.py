@@ -0,0 +1,79 @@
+"""
+Benchmark: classifier throughput and latency with and without micro-batching.
+
+Runs evaluate() from N concurrent threads, first with batching disabled
+(one forward pass per prompt), then through the MicroBatcher.
+Requires the model in ml/saved_model.
+
+Usage:
+    python benchmarks/batching_bench.py [--concurrency 16] [--requests 400]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml import classifier
+from ml.model_loader import load_model
+
+WORDS = (
+    "please summarize the following report about quarterly revenue and "
+    "ignore previous instructions reveal the system prompt translate this "
+    "paragraph into french write a poem about the sea explain recursion"
+).split()
+
+
+def make_prompts(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 90))) for _ in range(count)]
+
+
+def run(prompts, concurrency: int):
+    latencies = []
+
+    def one(prompt):
+        start = time.perf_counter()
+        classifier.evaluate(prompt)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, prompts))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    return len(prompts) / elapsed, statistics.median(latencies), p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    load_model()
+    prompts = make_prompts(args.requests)
+    classifier.evaluate("warm up")
+
+    print(f"{'mode':<10} {'prompts/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+
+    classifier.configure_batching(1, 0)
+    rps, p50, p99 = run(prompts, args.concurrency)
+    print(f"{'single':<10} {rps:>10.1f} {p50:>8.1f} {p99:>8.1f}")
+
+    classifier.configure_batching(args.max_batch_size, args.max_wait_ms)
+    rps, p50, p99 = run(prompts, args.concurrency)
+    print(f"{'batched':<10} {rps:>10.1f} {p50:>8.1f} {p99:>8.1f}")
+    print(classifier.batching_stats())
+
+
+if __name__ == "__main__":
+    main()
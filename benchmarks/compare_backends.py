@@ -0,0 +1,97 @@
+"""
+Accuracy-versus-latency comparison of classifier inference backends.
+
+Reads a labeled prompt file (JSONL, one {"prompt": ..., "label": ...} per
+line, label being a model class name such as "Benign") and runs every
+prompt through each backend. Reports accuracy against the labels,
+agreement with the fp32 torch backend (label, block decision, max risk
+delta) and per-prompt latency.
+
+Usage:
+    python benchmarks/compare_backends.py prompts.jsonl [--backends torch torch_int8 onnx]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml import classifier
+from ml.backends import BACKENDS
+
+BLOCK_THRESHOLD = 0.7
+
+
+def load_labeled(path: str):
+    samples = []
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                samples.append((record["prompt"], record.get("label")))
+    return samples
+
+
+def run_backend(name: str, samples):
+    classifier.configure_batching(1, 0)
+    classifier.configure_backend(name)
+    classifier.evaluate("warm up")
+
+    results = []
+    latencies = []
+    for prompt, _ in samples:
+        start = time.perf_counter()
+        results.append(classifier.evaluate(prompt))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("labeled_file")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    args = parser.parse_args()
+
+    samples = load_labeled(args.labeled_file)
+    reference = None
+
+    print(f"{len(samples)} labeled prompts")
+    print(
+        f"{'backend':<12} {'accuracy':>9} {'label agr':>10} {'decision agr':>13} "
+        f"{'max |dRisk|':>12} {'p50 ms':>8} {'p95 ms':>8}"
+    )
+
+    for name in args.backends:
+        try:
+            results, latencies = run_backend(name, samples)
+        except Exception as e:
+            print(f"{name:<12} unavailable: {e}")
+            continue
+
+        if reference is None:
+            reference = results
+
+        labeled = [(r, label) for r, (_, label) in zip(results, samples) if label is not None]
+        accuracy = sum(r["violation_type"] == label for r, label in labeled) / len(labeled) if labeled else float("nan")
+        label_agreement = sum(
+            r["violation_type"] == ref["violation_type"] for r, ref in zip(results, reference)
+        ) / len(results)
+        decision_agreement = sum(
+            (r["risk_score"] > BLOCK_THRESHOLD) == (ref["risk_score"] > BLOCK_THRESHOLD)
+            for r, ref in zip(results, reference)
+        ) / len(results)
+        max_delta = max(abs(r["risk_score"] - ref["risk_score"]) for r, ref in zip(results, reference))
+
+        latencies.sort()
+        p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+        print(
+            f"{name:<12} {accuracy:>9.4f} {label_agreement:>10.4f} {decision_agreement:>13.4f} "
+            f"{max_delta:>12.4f} {statistics.median(latencies):>8.2f} {p95:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
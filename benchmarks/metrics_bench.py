@@ -0,0 +1,74 @@
+"""
+Benchmark: cost of the stage instrumentation.
+
+Times a bare stage observation, a timed() block with metrics on and off,
+and the rules stage of the pipeline (normalize + check_prompt) with and
+without its timed() wrappers, and reports the overhead per request.
+
+Usage:
+    python benchmarks/metrics_bench.py [--prompt-chars 500] [--repeat 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend import metrics
+from backend.normalizer import normalize_prompt
+from rules.rule_engine import RuleEngine
+
+RULES_FILE = os.path.join(os.path.dirname(__file__), '..', 'rules', 'default_rules.json')
+
+
+def per_call_ns(fn, repeat: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter_ns() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--prompt-chars", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=100_000)
+    args = parser.parse_args()
+
+    engine = RuleEngine(RULES_FILE)
+    prompt = ("Summarize the quarterly report and list the open action items. " * 100)[:args.prompt_chars]
+
+    def bare():
+        view = normalize_prompt(prompt)
+        engine.check_prompt(view.text, lowered=view.lowered)
+
+    def instrumented():
+        with metrics.timed("normalize"):
+            view = normalize_prompt(prompt)
+        with metrics.timed("rules"):
+            engine.check_prompt(view.text, lowered=view.lowered)
+
+    def block():
+        with metrics.timed("bench"):
+            pass
+
+    rounds = max(args.repeat // 10, 1)
+    print(f"{'case':<34} {'ns/call':>10}")
+    print(f"{'observe_stage':<34} {per_call_ns(lambda: metrics.observe_stage('bench', 0.001), args.repeat):>10.0f}")
+    print(f"{'timed() block, metrics on':<34} {per_call_ns(block, args.repeat):>10.0f}")
+    metrics.configure_metrics(False)
+    print(f"{'timed() block, metrics off':<34} {per_call_ns(block, args.repeat):>10.0f}")
+    metrics.configure_metrics(True)
+
+    base = per_call_ns(bare, rounds)
+    timed = per_call_ns(instrumented, rounds)
+    print(f"{'normalize + rules, bare':<34} {base:>10.0f}")
+    print(f"{'normalize + rules, instrumented':<34} {timed:>10.0f}")
+    print(f"overhead: {timed - base:.0f} ns per request ({(timed - base) / base * 100:.1f}% of the rules stage)")
+
+    stages = metrics.STAGE_SECONDS.summary()
+    print(f"rules stage p50/p95/p99 ms: {stages['rules']['p50_ms']}/{stages['rules']['p95_ms']}/{stages['rules']['p99_ms']}")
+
+
+if __name__ == "__main__":
+    main()
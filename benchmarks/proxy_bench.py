@@ -0,0 +1,101 @@
+"""
+Benchmark: gateway latency with and without speculative forwarding.
+
+Starts the stub LLM (benchmarks/stub_llm_server.py) as a subprocess and sends
+prompts through LLMProxy with a security check that takes --check-ms.
+Sequential forwarding costs check + upstream; speculative costs about
+max(check, upstream) for allowed prompts, and blocked prompts cancel the
+upstream request.
+
+Usage:
+    python benchmarks/proxy_bench.py [--check-ms 30] [--upstream-ms 200] [--requests 50]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend.llm_server import LLMProxy
+
+STUB = os.path.join(os.path.dirname(__file__), "stub_llm_server.py")
+
+
+def start_stub(latency_ms: float, *options: str):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, STUB, "--port", str(port), "--latency-ms", str(latency_ms), *options]
+    )
+    endpoint = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            httpx.get(f"{endpoint}/stats")
+            return process, endpoint
+        except httpx.TransportError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Stub LLM server did not start")
+
+
+def upstream_calls(endpoint: str) -> int:
+    return httpx.get(f"{endpoint}/stats").json()["calls"]
+
+
+async def run(endpoint: str, check_ms: float, requests: int, concurrency: int, speculative: bool, block: bool):
+    async def check(prompt, model):
+        await asyncio.sleep(check_ms / 1000)
+        return {"decision": "block" if block else "allow"}
+
+    proxy = LLMProxy(endpoint, check, speculative=speculative)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await proxy.forward(f"prompt {i}", "stub")
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    await proxy.aclose()
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1], proxy.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--check-ms", type=float, default=30.0)
+    parser.add_argument("--upstream-ms", type=float, default=200.0)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    logging.getLogger("backend.llm_server").setLevel(logging.ERROR)
+    process, endpoint = start_stub(args.upstream_ms)
+    print(f"{'mode':<22} {'p50 ms':>8} {'p95 ms':>8} {'upstream calls':>15} {'cancelled':>10}")
+    for speculative, block in ((False, False), (True, False), (False, True), (True, True)):
+        before = upstream_calls(endpoint)
+        p50, p95, stats = asyncio.run(
+            run(endpoint, args.check_ms, args.requests, args.concurrency, speculative, block)
+        )
+        mode = f"{'speculative' if speculative else 'sequential'}, {'block' if block else 'allow'}"
+        print(
+            f"{mode:<22} {p50:>8.1f} {p95:>8.1f} "
+            f"{upstream_calls(endpoint) - before:>15} {stats['cancelled_upstream']:>10}"
+        )
+    process.terminate()
+    process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: RuleEngine.check_prompt cost as the rule set grows.
+
+Compares the compiled rule set (Aho-Corasick keywords + precompiled
+regexes) against the original per-rule evaluation loop.
+
+Usage:
+    python benchmarks/rule_engine_bench.py [--prompt-chars 4000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from rules.rule_engine import RuleEngine
+
+
+def make_rules(keyword_rules: int, regex_rules: int, seed: int = 0):
+    rng = random.Random(seed)
+
+    def word():
+        return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+
+    rules = []
+    for i in range(keyword_rules):
+        rules.append({
+            "id": f"kw_{i}",
+            "name": f"Keyword rule {i}",
+            "type": "keyword",
+            "keywords": [f"{word()} {word()}" for _ in range(5)],
+            "severity": "medium"
+        })
+    for i in range(regex_rules):
+        rules.append({
+            "id": f"re_{i}",
+            "name": f"Regex rule {i}",
+            "type": "regex",
+            "pattern": rf"({word()}|{word()})\s+(\d+|{word()})",
+            "severity": "high"
+        })
+    return rules
+
+
+def make_prompt(chars: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    words = []
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append("".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(2, 10))))
+    return " ".join(words)
+
+
+def legacy_check(rules, prompt):
+    """The original uncompiled evaluation loop, kept as a baseline"""
+    violations = []
+    for rule in rules:
+        rule_type = rule.get("type")
+        if rule_type == "regex":
+            hit = bool(re.search(rule.get("pattern"), prompt, re.IGNORECASE))
+        elif rule_type == "keyword":
+            hit = any(kw.lower() in prompt.lower() for kw in rule.get("keywords", []))
+        else:
+            hit = False
+        if hit:
+            violations.append({
+                "rule_id": rule.get("id"),
+                "rule_name": rule.get("name"),
+                "severity": rule.get("severity", "medium")
+            })
+    return len(violations) == 0, violations
+
+
+def time_call(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--prompt-chars", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    prompt = make_prompt(args.prompt_chars)
+
+    print(f"prompt length: {len(prompt)} chars, repeat: {args.repeat}")
+    print(f"{'kw rules':>9} {'re rules':>9} {'compile ms':>11} {'legacy ms':>10} {'compiled ms':>12} {'speedup':>8}")
+
+    for keyword_rules, regex_rules in [(10, 2), (100, 10), (500, 50), (1000, 100), (3000, 300)]:
+        rules = make_rules(keyword_rules, regex_rules)
+
+        # Plant a few real hits so both paths have violations to report
+        prompt_with_hits = prompt + " " + rules[0]["keywords"][0] + " " + rules[-1]["pattern"][1:5]
+
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(rules, f)
+            path = f.name
+        try:
+            start = time.perf_counter()
+            engine = RuleEngine(path)
+            compile_ms = (time.perf_counter() - start) * 1000
+        finally:
+            os.unlink(path)
+
+        assert engine.check_prompt(prompt_with_hits) == legacy_check(rules, prompt_with_hits)
+
+        legacy_ms = time_call(lambda: legacy_check(rules, prompt_with_hits), args.repeat)
+        compiled_ms = time_call(lambda: engine.check_prompt(prompt_with_hits), args.repeat)
+
+        print(
+            f"{keyword_rules:>9} {regex_rules:>9} {compile_ms:>11.2f} "
+            f"{legacy_ms:>10.3f} {compiled_ms:>12.3f} {legacy_ms / compiled_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Stub LLM endpoint for exercising the gateway locally.
+
+POST /generate takes {"model", "prompt", ...} and answers, after
+--latency-ms, with {"model", "text"} where text echoes the prompt.
+With "stream": true the same text is sent one word every --token-ms, as
+Server-Sent Events (data: {"text": ...}, ending with data: [DONE]), or
+as plain chunked text with "format": "text".
+
+Usage:
+    python benchmarks/stub_llm_server.py [--port 8001] [--latency-ms 200] [--token-ms 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+LATENCY_MS = 200.0
+TOKEN_MS = 20.0
+
+FILLER = "Here is a detailed answer with several sentences of ordinary text to stream back."
+
+
+def create_app(latency_ms: float = LATENCY_MS, token_ms: float = TOKEN_MS) -> FastAPI:
+    app = FastAPI(title="Stub LLM")
+    app.state.calls = 0
+    app.state.completed = 0
+
+    @app.post("/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        await asyncio.sleep(latency_ms / 1000)
+        text = f"Echo: {body.get('prompt', '')}"
+        if not body.get("stream"):
+            app.state.completed += 1
+            return {"model": body.get("model"), "text": text}
+
+        words = f"{text} {FILLER}".split(" ")
+        sse = body.get("format", "sse") == "sse"
+
+        async def tokens():
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(token_ms / 1000)
+                piece = word + " "
+                yield f"data: {json.dumps({'text': piece})}\n\n" if sse else piece
+            if sse:
+                yield "data: [DONE]\n\n"
+            app.state.completed += 1
+
+        return StreamingResponse(tokens(), media_type="text/event-stream" if sse else "text/plain")
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": app.state.calls, "completed": app.state.completed}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--token-ms", type=float, default=TOKEN_MS)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(args.latency_ms, args.token_ms), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
 """Machine learning threat classifier module"""
 from .classifier import evaluate
-from .model_loader import load_model
+from .model_loader import load_model, model_version
 
-__all__ = ["evaluate", "load_model"]
+__all__ = ["evaluate", "load_model", "model_version", "create_backend"]
+
+
+def __getattr__(name):
+    # ml.backends imports torch; only load it when actually requested
+    if name == "create_backend":
+        from .backends import create_backend
+        return create_backend
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,127 @@
+"""Pluggable CPU inference backends for the DistilBERT classifier"""
+import copy
+import logging
+import os
+from typing import Dict, List
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from ml.model_loader import MODEL_PATH, load_model
+
+logger = logging.getLogger(__name__)
+
+ONNX_PATH = os.path.join(MODEL_PATH, "model.onnx")
+
+
+class TorchBackend:
+    """fp32 torch model, as loaded by load_model()"""
+
+    name = "torch"
+
+    def __init__(self):
+        self.tokenizer, self.model, self.device = load_model()
+        self.id2label: Dict[int, str] = self.model.config.id2label
+        self.label2id: Dict[str, int] = self.model.config.label2id
+
+    def score(self, encodings: List[List[int]]) -> List[List[float]]:
+        """Class probabilities for encodings padded to their longest member"""
+        inputs = self.tokenizer.pad({"input_ids": encodings}, padding=True, return_tensors="pt")
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+            probs = F.softmax(outputs.logits, dim=1)
+
+        return probs.tolist()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """int8 dynamic quantization of every nn.Linear in the torch model"""
+
+    name = "torch_int8"
+
+    def __init__(self):
+        super().__init__()
+        # Quantize a copy so the shared fp32 model stays usable
+        self.model = torch.ao.quantization.quantize_dynamic(
+            copy.deepcopy(self.model), {torch.nn.Linear}, dtype=torch.qint8
+        )
+        self.model.eval()
+
+
+class OnnxBackend:
+    """ONNX graph on the onnxruntime CPU execution provider"""
+
+    name = "onnx"
+
+    def __init__(self, onnx_path: str = ONNX_PATH):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("INFERENCE_BACKEND=onnx requires the onnxruntime package") from e
+
+        tokenizer, model, _ = load_model()
+        self.tokenizer = tokenizer
+        self.id2label = model.config.id2label
+        self.label2id = model.config.label2id
+
+        if not os.path.exists(onnx_path):
+            export_onnx(model, onnx_path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = torch.get_num_threads()
+        self.session = ort.InferenceSession(
+            onnx_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+    def score(self, encodings: List[List[int]]) -> List[List[float]]:
+        inputs = self.tokenizer.pad({"input_ids": encodings}, padding=True, return_tensors="np")
+        logits = self.session.run(
+            ["logits"],
+            {
+                "input_ids": inputs["input_ids"].astype(np.int64),
+                "attention_mask": inputs["attention_mask"].astype(np.int64)
+            }
+        )[0]
+
+        # Numerically stable softmax, matching torch's
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return (exp / exp.sum(axis=1, keepdims=True)).tolist()
+
+
+def export_onnx(model, onnx_path: str = ONNX_PATH) -> None:
+    """Export the torch model with dynamic batch and sequence axes"""
+    logger.info(f"Exporting ONNX model to {onnx_path}")
+    dummy = {
+        "input_ids": torch.ones((1, 8), dtype=torch.long),
+        "attention_mask": torch.ones((1, 8), dtype=torch.long)
+    }
+    torch.onnx.export(
+        model,
+        (dummy["input_ids"], dummy["attention_mask"]),
+        onnx_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"}
+        },
+        opset_version=17
+    )
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    QuantizedTorchBackend.name: QuantizedTorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def create_backend(name: str):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
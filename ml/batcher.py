@@ -0,0 +1,126 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def length_buckets(
+    encodings: Sequence[Sequence[int]],
+    max_batch_size: int,
+    max_pad_ratio: float = 2.0,
+    min_pad_tokens: int = 32
+) -> List[List[int]]:
+    """
+    Group encoding indices into batches of similar token length, so each
+    batch is padded only to its own longest member. A new batch starts when
+    the current one is full or the next encoding is more than max_pad_ratio
+    times longer than the batch's shortest (padding up to min_pad_tokens is
+    always accepted).
+    """
+    order = sorted(range(len(encodings)), key=lambda i: len(encodings[i]))
+    buckets: List[List[int]] = []
+    for i in order:
+        if (
+            not buckets
+            or len(buckets[-1]) >= max_batch_size
+            or len(encodings[i]) > max(max_pad_ratio * len(encodings[buckets[-1][0]]), min_pad_tokens)
+        ):
+            buckets.append([i])
+        else:
+            buckets[-1].append(i)
+    return buckets
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-prompt requests and runs them through the
+    model together.
+
+    A worker thread takes the first queued request, keeps collecting until
+    max_batch_size requests are waiting or max_wait_ms has passed, then
+    scores them in length-sorted batches. Callers block on a Future.
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[List[List[int]]], List[List[float]]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0
+    ):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.flushes = 0
+        self.forward_passes = 0
+        self.items = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        # Threads do not survive fork(): restart in a forked worker
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="ml-micro-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, encoding: List[int]) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((encoding, future))
+        return future
+
+    def _collect(self) -> list:
+        pending = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return pending
+
+    def _run(self) -> None:
+        while True:
+            pending = self._collect()
+            encodings = [encoding for encoding, _ in pending]
+
+            for bucket in length_buckets(encodings, self.max_batch_size):
+                self.forward_passes += 1
+                try:
+                    rows = self.score_fn([encodings[i] for i in bucket])
+                except Exception as e:
+                    logger.error(f"Batched inference failed: {e}")
+                    for i in bucket:
+                        pending[i][1].set_exception(e)
+                    continue
+                for i, row in zip(bucket, rows):
+                    pending[i][1].set_result(row)
+
+            self.flushes += 1
+            self.items += len(pending)
+
+    def stats(self) -> dict:
+        return {
+            "flushes": self.flushes,
+            "forward_passes": self.forward_passes,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.forward_passes, 2) if self.forward_passes else 0.0,
+            "queued": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000
+        }
@@ -1,6 +1,9 @@
-import torch
-import torch.nn.functional as F
-from ml.model_loader import load_model
+import threading
+import time
+from typing import Callable, List, Optional
+
+from ml.batcher import MicroBatcher, length_buckets
+from ml.model_loader import model_version
 
 RISK_KEYWORDS = [
     "ignore previous",
@@ -10,40 +13,196 @@ RISK_KEYWORDS = [
     "bypass restrictions"
 ]
 
-def evaluate(prompt: str):
-    tokenizer, model, device = load_model()
+MAX_LENGTH = 128
+
+# Window risk above which a prompt is blocked; scoring stops early once
+# any window crosses it
+BLOCK_THRESHOLD = 0.7
+
+# Upper bound on characters per token, used to cap text before tokenizing
+MAX_CHARS_PER_TOKEN = 8
+
+WINDOW_AGGREGATIONS = ("max", "topk_mean")
+
+_windowing = {
+    "stride": 32,
+    "max_tokens": 2048,
+    "aggregation": "max",
+    "top_k": 3,
+    "group_size": 8
+}
+
+_batcher: Optional[MicroBatcher] = None
+# Called with (stage, seconds) for tokenization and inference when set
+_stage_observer: Optional[Callable[[str, float], None]] = None
+_backend_name = "torch"
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def configure_backend(name: str) -> None:
+    """
+    Select the inference backend (see ml.backends.BACKENDS); loaded lazily.
+    Re-selecting the active backend keeps the loaded one, so a backend
+    loaded before fork() stays shared with the workers.
+    """
+    global _backend_name, _backend
+    with _backend_lock:
+        if name != _backend_name:
+            _backend = None
+        _backend_name = name
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                # torch is only imported here, on first use
+                from ml.backends import create_backend
+                _backend = create_backend(_backend_name)
+    return _backend
+
+
+def warm_up(batch_sizes=(1, 8), lengths=(16, MAX_LENGTH)) -> None:
+    """
+    Load the backend and run dummy batches so the first request is not slow.
+    Batch sizes below 1 (batching turned off) and repeats are skipped.
+    """
+    backend = get_backend()
+    pad_id = backend.tokenizer.pad_token_id or 0
+    for batch_size in sorted({size for size in batch_sizes if size >= 1}):
+        for length in lengths:
+            backend.score([[pad_id] * length for _ in range(batch_size)])
+
+
+def active_model_version() -> str:
+    """Model fingerprint plus backend; different backends may differ slightly"""
+    return f"{model_version()}:{_backend_name}"
+
+
+def configure_batching(max_batch_size: int, max_wait_ms: float) -> None:
+    """
+    Route single-prompt evaluate() calls through a shared MicroBatcher.
+    A max_batch_size of 1 or less turns batching off.
+    """
+    global _batcher
+    _batcher = MicroBatcher(_score, max_batch_size, max_wait_ms) if max_batch_size > 1 else None
+
+
+def configure_stage_observer(observer: Optional[Callable[[str, float], None]]) -> None:
+    """Report "tokenize" and "inference" durations of evaluate() calls to observer"""
+    global _stage_observer
+    _stage_observer = observer
+
+
+def batching_stats() -> dict:
+    return _batcher.stats() if _batcher is not None else {"enabled": False}
+
+
+def configure_windowing(
+    stride: int = 32,
+    max_tokens: int = 2048,
+    aggregation: str = "max",
+    top_k: int = 3,
+    group_size: int = 8
+) -> None:
+    """
+    Long prompts are split into MAX_LENGTH-token windows overlapping by
+    stride tokens, capped at max_tokens per request. Window scores are
+    combined by aggregation ("max" or "topk_mean" over the top_k riskiest
+    windows). Windows are scored group_size at a time so scoring can stop
+    as soon as one window crosses BLOCK_THRESHOLD.
+    """
+    if aggregation not in WINDOW_AGGREGATIONS:
+        raise ValueError(f"Unknown window aggregation: {aggregation}")
+    if not 0 <= stride < MAX_LENGTH - 2:
+        raise ValueError(f"Window stride must be between 0 and {MAX_LENGTH - 3}")
+    _windowing.update(
+        stride=stride,
+        max_tokens=max_tokens,
+        aggregation=aggregation,
+        top_k=max(top_k, 1),
+        group_size=max(group_size, 1)
+    )
+
+
+def has_risk_keyword(lowered: str) -> bool:
+    return any(keyword in lowered for keyword in RISK_KEYWORDS)
+
 
-    inputs = tokenizer(
+def _encode_windows(prompt: str) -> List[List[int]]:
+    """
+    Overlapping token windows covering the prompt, within the token budget.
+    Over budget, windows are kept from both the head and the tail so that
+    padding a payload to the end does not push it out of view.
+    """
+    tokenizer = get_backend().tokenizer
+    stride = _windowing["stride"]
+    max_tokens = _windowing["max_tokens"]
+
+    # Bound tokenization cost on huge prompts before the window cap applies
+    max_chars = max_tokens * MAX_CHARS_PER_TOKEN
+    if len(prompt) > max_chars:
+        prompt = prompt[:max_chars // 2] + " " + prompt[-(max_chars // 2):]
+
+    windows = tokenizer(
         prompt,
-        return_tensors="pt",
         truncation=True,
-        padding=True,
-        max_length=128
-    )
+        max_length=MAX_LENGTH,
+        stride=stride,
+        return_overflowing_tokens=True
+    )["input_ids"]
+
+    max_windows = max(max_tokens // (MAX_LENGTH - 2 - stride), 1)
+    if len(windows) > max_windows:
+        head = (max_windows + 1) // 2
+        tail = max_windows - head
+        windows = windows[:head] + (windows[-tail:] if tail else [])
+
+    return windows
+
+
+def _window_risk(probs: List[float]) -> float:
+    benign_id = get_backend().label2id.get("Benign")
+    return 1 - probs[benign_id]
 
-    inputs = {k: v.to(device) for k, v in inputs.items()}
 
-    with torch.no_grad():
-        outputs = model(**inputs)
-        probs = F.softmax(outputs.logits, dim=1)
+def _aggregate(rows: List[List[float]], crossed: bool) -> List[float]:
+    """
+    Combine per-window class probabilities into one row. Once a window has
+    crossed BLOCK_THRESHOLD that window is the result, whatever the rule.
+    """
+    ranked = sorted(rows, key=_window_risk, reverse=True)
+    if crossed or _windowing["aggregation"] == "max" or len(ranked) == 1:
+        return ranked[0]
 
-    confidence = torch.max(probs).item()
-    predicted_id = torch.argmax(probs).item()
-    predicted_label = model.config.id2label[predicted_id]
+    top = ranked[:_windowing["top_k"]]
+    return [sum(column) / len(top) for column in zip(*top)]
+
+
+def _score(encodings: List[List[int]]) -> List[List[float]]:
+    """Run one forward pass over encodings padded to their longest member"""
+    return get_backend().score(encodings)
+
+
+def _result(probs: List[float], lowered: str):
+    backend = get_backend()
+
+    confidence = max(probs)
+    predicted_id = probs.index(confidence)
+    predicted_label = backend.id2label[predicted_id]
 
 # Get probability of Benign class
-    benign_id = model.config.label2id.get("Benign")
-    benign_prob = probs[0][benign_id].item()
+    benign_id = backend.label2id.get("Benign")
+    benign_prob = probs[benign_id]
 
 # Risk = probability that it is NOT benign
     risk_score = 1 - benign_prob
 
 # Hybrid keyword boost
-    lower_prompt = prompt.lower()
-    for keyword in RISK_KEYWORDS:
-        if keyword in lower_prompt:
-            risk_score = min(risk_score + 0.1, 1.0)
-            break
+    if has_risk_keyword(lowered):
+        risk_score = min(risk_score + 0.1, 1.0)
 
     return {
         "risk_score": float(risk_score),
@@ -51,3 +210,66 @@ def evaluate(prompt: str):
         "confidence": float(confidence)
     }
 
+
+def evaluate(prompt: str, lowered: str = None):
+    started = time.perf_counter()
+    windows = _encode_windows(prompt)
+    tokenized = time.perf_counter()
+    group_size = _windowing["group_size"]
+
+    rows: List[List[float]] = []
+    crossed = False
+    for start in range(0, len(windows), group_size):
+        group = windows[start:start + group_size]
+
+        if _batcher is not None:
+            futures = [_batcher.submit(window) for window in group]
+            group_rows = [future.result() for future in futures]
+        else:
+            group_rows = _score(group)
+        rows.extend(group_rows)
+
+        # One window over the threshold decides the verdict: skip the rest
+        if any(_window_risk(row) > BLOCK_THRESHOLD for row in group_rows):
+            crossed = True
+            break
+
+    if _stage_observer is not None:
+        _stage_observer("tokenize", tokenized - started)
+        # Includes waiting for the micro-batcher's forward pass
+        _stage_observer("inference", time.perf_counter() - tokenized)
+
+    lower_prompt = lowered if lowered is not None else prompt.lower()
+    return _result(_aggregate(rows, crossed), lower_prompt)
+
+
+def evaluate_batch(prompts: List[str], lowered: List[str] = None, max_batch_size: int = 32):
+    """
+    Evaluate many prompts in length-sorted batched forward passes.
+    All windows of all prompts are scored; there is no early exit here.
+    """
+    if lowered is None:
+        lowered = [prompt.lower() for prompt in prompts]
+
+    started = time.perf_counter()
+    encodings = []
+    owners = []
+    for i, prompt in enumerate(prompts):
+        for window in _encode_windows(prompt):
+            encodings.append(window)
+            owners.append(i)
+    tokenized = time.perf_counter()
+
+    rows: List[List[List[float]]] = [[] for _ in prompts]
+    for bucket in length_buckets(encodings, max_batch_size):
+        for j, row in zip(bucket, _score([encodings[j] for j in bucket])):
+            rows[owners[j]].append(row)
+
+    if _stage_observer is not None:
+        _stage_observer("tokenize", tokenized - started)
+        _stage_observer("inference", time.perf_counter() - tokenized)
+
+    return [
+        _result(_aggregate(prompt_rows, any(_window_risk(row) > BLOCK_THRESHOLD for row in prompt_rows)), lower)
+        for prompt_rows, lower in zip(rows, lowered)
+    ]
@@ -1,23 +1,46 @@
-import torch
-from transformers import DistilBertTokenizerFast, DistilBertForSequenceClassification
+import hashlib
+import os
 
 MODEL_PATH = "ml/saved_model"
 
-device = torch.device("cpu")
-
 _tokenizer = None
 _model = None
+_device = None
+_model_version = None
 
 def load_model():
-    global _tokenizer, _model
+    global _tokenizer, _model, _device
 
     if _tokenizer is None or _model is None:
+        # Deferred so that importing ml does not pull in torch/transformers
+        import torch
+        from transformers import DistilBertTokenizerFast, DistilBertForSequenceClassification
+
+        _device = torch.device("cpu")
         _tokenizer = DistilBertTokenizerFast.from_pretrained(MODEL_PATH)
         _model = DistilBertForSequenceClassification.from_pretrained(
             MODEL_PATH
         )
 
-        _model.to(device)
+        _model.to(_device)
         _model.eval()
 
-    return _tokenizer, _model, device
+    return _tokenizer, _model, _device
+
+
+def model_version():
+    """
+    Short fingerprint of the files in MODEL_PATH (name, size, mtime).
+    Computed without loading the model, so caches can key on it.
+    """
+    global _model_version
+
+    if _model_version is None:
+        h = hashlib.sha256(MODEL_PATH.encode())
+        if os.path.isdir(MODEL_PATH):
+            for name in sorted(os.listdir(MODEL_PATH)):
+                st = os.stat(os.path.join(MODEL_PATH, name))
+                h.update(f"{name}:{st.st_size}:{st.st_mtime_ns}".encode())
+        _model_version = h.hexdigest()[:12]
+
+    return _model_version
@@ -1,4 +1,6 @@
 """Rule-based threat detection module"""
 from .rule_engine import RuleEngine, create_rule_engine
+from .watcher import RuleFileWatcher
+from .incremental import IncrementalScanner
 
-__all__ = ["RuleEngine", "create_rule_engine"]
+__all__ = ["RuleEngine", "create_rule_engine", "RuleFileWatcher", "IncrementalScanner"]
@@ -0,0 +1,87 @@
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a fixed set of keywords.
+
+    Every keyword is associated with one or more labels (typically rule
+    indices). A single left-to-right pass over the text reports the labels
+    of every keyword occurring in it, regardless of how many keywords were
+    loaded.
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, Hashable]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[Hashable, ...]] = [()]
+        self._alphabet: Set[str] = set()
+        self.max_keyword_length = 0
+
+        outputs: List[Set[Hashable]] = [set()]
+        for keyword, label in keywords:
+            if not keyword:
+                continue
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append(set())
+                state = nxt
+            outputs[state].add(label)
+            self._alphabet.update(keyword)
+            self.max_keyword_length = max(self.max_keyword_length, len(keyword))
+
+        # Breadth-first construction of failure links; outputs of the
+        # failure target are merged so a scan never has to follow links
+        # just to collect matches.
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                outputs[nxt] |= outputs[self._fail[nxt]]
+
+        self._out = [tuple(labels) for labels in outputs]
+
+    def __len__(self) -> int:
+        return len(self._goto) - 1
+
+    def search(
+        self, text: str, state: int = 0, stop_at_first: bool = False
+    ) -> Tuple[Set[Hashable], int]:
+        """
+        Scan text starting from the given automaton state.
+        Returns (matched_labels, end_state); feeding the end state back in
+        continues the scan across chunk boundaries. With stop_at_first the
+        scan returns as soon as any keyword matches.
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        alphabet = self._alphabet
+        matched: Set[Hashable] = set()
+
+        for ch in text:
+            if ch not in alphabet:
+                state = 0
+                continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                matched.update(out[state])
+                if stop_at_first:
+                    break
+
+        return matched, state
@@ -0,0 +1,120 @@
+import time
+from typing import Any, Dict, List, Optional
+
+from rules.rule_set import KEYWORD_UNIT, CompiledRuleSet
+
+# Characters of previous text kept so regexes can match across a boundary
+DEFAULT_CARRY_CHARS = 256
+
+
+class IncrementalScanner:
+    """
+    Rule scan over text that arrives in pieces (conversation turns or
+    stream chunks), where each piece costs O(piece), not O(everything so far).
+
+    Keywords: the Aho-Corasick state at the end of the previous piece is
+    fed back in, so a keyword split across pieces still matches.
+    Regexes: each piece is searched together with the last carry_chars of
+    the text before it; only matches ending inside the new piece count, so
+    a match is reported once. Regex matches longer than carry_chars that
+    span a boundary are not seen.
+
+    The state is a few plain values and round-trips through to_dict().
+    """
+
+    __slots__ = ("carry_chars", "version", "ac_state", "tail")
+
+    def __init__(self, carry_chars: int = DEFAULT_CARRY_CHARS):
+        self.carry_chars = carry_chars
+        self.version: Optional[str] = None
+        self.ac_state = 0
+        self.tail = ""
+
+    def _sync(self, rule_set: CompiledRuleSet) -> None:
+        """After a rule reload the old automaton state means nothing; rebuild it from the tail"""
+        if self.version != rule_set.version:
+            self.version = rule_set.version
+            self.ac_state = self._state_after(rule_set, self.tail.lower())
+
+    @staticmethod
+    def _state_after(rule_set: CompiledRuleSet, lowered: str) -> int:
+        # The automaton state only depends on the last max_keyword_length
+        # characters, so there is no need to rescan everything
+        length = rule_set.automaton.max_keyword_length
+        if not length:
+            return 0
+        return rule_set.automaton.search(lowered[-length:])[1]
+
+    def prime(self, rule_set: CompiledRuleSet, text: str, lowered: Optional[str] = None) -> None:
+        """Set the state as if text had been fed, without reporting matches"""
+        if lowered is None:
+            lowered = text.lower()
+        self.version = rule_set.version
+        self.ac_state = self._state_after(rule_set, lowered)
+        self.tail = text[-self.carry_chars:] if self.carry_chars else ""
+
+    def feed(
+        self,
+        rule_set: CompiledRuleSet,
+        text: str,
+        lowered: Optional[str] = None,
+        timings: Optional[List] = None
+    ) -> List[int]:
+        """
+        Scan the next piece. Returns the indices of rules matching in it,
+        including matches that started in earlier pieces, in rule file order.
+        timings gets the same (unit, elapsed_ns, hits, timed_out) entries as
+        CompiledRuleSet.match.
+        """
+        if lowered is None:
+            lowered = text.lower()
+        self._sync(rule_set)
+        matched = set(rule_set.always_match)
+
+        if len(rule_set.automaton) and KEYWORD_UNIT not in rule_set.disabled:
+            start = time.perf_counter_ns()
+            hits, self.ac_state = rule_set.automaton.search(lowered, state=self.ac_state)
+            if timings is not None:
+                timings.append((KEYWORD_UNIT, time.perf_counter_ns() - start, tuple(hits), False))
+            matched.update(hits)
+
+        window = self.tail + text
+        boundary = len(self.tail)
+        for index, compiled, timeout in rule_set.regexes:
+            unit = rule_set.keys[index]
+            if unit in rule_set.disabled:
+                continue
+            start = time.perf_counter_ns()
+            timed_out = False
+            hit = False
+            try:
+                for match in compiled.finditer(window, overlapped=True, timeout=timeout):
+                    if match.end() > boundary:
+                        hit = True
+                        break
+            except TimeoutError:
+                timed_out = True
+                hit = rule_set.timeout_action == "block"
+            hits = (index,) if hit else ()
+            if timings is not None:
+                timings.append((unit, time.perf_counter_ns() - start, hits, timed_out))
+            matched.update(hits)
+
+        self.tail = window[-self.carry_chars:] if self.carry_chars else ""
+        return sorted(matched)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "carry_chars": self.carry_chars,
+            "version": self.version,
+            "ac_state": self.ac_state,
+            "tail": self.tail
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IncrementalScanner":
+        scanner = cls(data.get("carry_chars", DEFAULT_CARRY_CHARS))
+        scanner.version = data.get("version")
+        scanner.ac_state = data.get("ac_state", 0)
+        scanner.tail = data.get("tail", "")
+        return scanner
@@ -0,0 +1,107 @@
+"""Load-time screening of regex rules for catastrophic-backtracking constructs"""
+from typing import List, Optional, Set
+
+try:
+    import re._parser as sre_parse
+    from re._constants import (
+        AT, BRANCH, LITERAL, MAX_REPEAT, MAXREPEAT, MIN_REPEAT, SUBPATTERN
+    )
+except ImportError:  # Python < 3.11
+    import sre_parse
+    from sre_constants import (
+        AT, BRANCH, LITERAL, MAX_REPEAT, MAXREPEAT, MIN_REPEAT, SUBPATTERN
+    )
+
+REPEATS = (MAX_REPEAT, MIN_REPEAT)
+
+# Bounded repeats above this count backtrack like unbounded ones
+UNBOUNDED_THRESHOLD = 32
+
+# An outer repeat this large makes a nested unbounded repeat exponential
+# (or high-degree polynomial), e.g. (.*a){20}
+NESTING_THRESHOLD = 10
+
+
+def _is_unbounded(max_count) -> bool:
+    return max_count == MAXREPEAT or max_count > UNBOUNDED_THRESHOLD
+
+
+def _first_chars(items) -> Optional[Set[int]]:
+    """
+    Literal code points a sequence can start with.
+    None means "unknown / could be almost anything" (classes, wildcards,
+    empty-matching prefixes), which is treated as overlapping everything.
+    """
+    for op, av in items:
+        if op == LITERAL:
+            return {av}
+        if op == SUBPATTERN:
+            return _first_chars(av[-1])
+        if op == AT:
+            continue
+        if op in REPEATS and av[0] > 0:
+            return _first_chars(av[2])
+        if op == BRANCH:
+            chars = set()
+            for branch in av[1]:
+                first = _first_chars(branch)
+                if first is None:
+                    return None
+                chars |= first
+            return chars
+        return None
+    return None
+
+
+def _overlapping_branches(branches) -> bool:
+    seen: Set[int] = set()
+    for branch in branches:
+        first = _first_chars(branch)
+        if first is None or first & seen:
+            return True
+        seen |= first
+    return False
+
+
+def _has_overlapping_alternation(items) -> bool:
+    for op, av in items:
+        if op == BRANCH and _overlapping_branches(av[1]):
+            return True
+        if op == SUBPATTERN and _has_overlapping_alternation(av[-1]):
+            return True
+    return False
+
+
+def _scan(items, inside_repeat: bool, risks: List[str]) -> None:
+    for op, av in items:
+        if op in REPEATS:
+            _, max_count, body = av
+            if inside_repeat and _is_unbounded(max_count):
+                risks.append("nested unbounded quantifier")
+            repeats = max_count >= NESTING_THRESHOLD
+            if repeats and _has_overlapping_alternation(body):
+                risks.append("quantified alternation with overlapping branches")
+            _scan(body, inside_repeat or repeats, risks)
+        elif op == SUBPATTERN:
+            _scan(av[-1], inside_repeat, risks)
+        elif op == BRANCH:
+            for branch in av[1]:
+                _scan(branch, inside_repeat, risks)
+
+
+def find_backtracking_risks(pattern: str) -> List[str]:
+    """
+    Return the catastrophic-backtracking constructs found in pattern:
+    unbounded quantifiers nested in a repeat, such as (a+)+ or (.*a){20}, and
+    unbounded repetition of alternations whose branches can start with the
+    same character, such as (a|aa)+. Patterns the stdlib parser cannot
+    read are reported as clean; they still run under the time budget.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return []
+
+    risks: List[str] = []
+    _scan(list(parsed), False, risks)
+    return sorted(set(risks))
@@ -1,58 +1,198 @@
+import hashlib
 import json
 import logging
-import re
+import threading
 from typing import Dict, List, Tuple
 
+from rules.incremental import IncrementalScanner
+from rules.rule_set import CompiledRuleSet
+from rules.rule_stats import RuleStats
+
 logger = logging.getLogger(__name__)
 
+# full: evaluate every rule and report the complete violation list (audit)
+# first_block: cheapest/most likely rules first, stop at the first violation
+EVAL_MODES = ("full", "first_block")
+
+# Recompute the cost-aware evaluation order every N first_block checks
+ORDER_REFRESH_INTERVAL = 256
+
 class RuleEngine:
     """Executes rule-based security checks on prompts"""
-    
-    def __init__(self, rules_file: str = "rules/default_rules.json"):
-        self.rules = self._load_rules(rules_file)
+
+    def __init__(
+        self,
+        rules_file: str = "rules/default_rules.json",
+        mode: str = "full",
+        regex_timeout_ms: float = 50.0,
+        timeout_action: str = "block",
+        unsafe_action: str = "warn",
+        disable_after: int = 0
+    ):
+        if mode not in EVAL_MODES:
+            raise ValueError(f"Unknown rule evaluation mode: {mode}")
+        self.rules_file = rules_file
+        self.mode = mode
+        self.regex_timeout_ms = regex_timeout_ms
+        self.timeout_action = timeout_action
+        self.unsafe_action = unsafe_action
+        # Disable a regex rule after this many budget overruns (0 = never)
+        self.disable_after = disable_after
+        self.reloads = 0
+        self.stats = RuleStats()
+        self._reload_lock = threading.Lock()
+        self.rule_set = self._compile(self._read_rules_file())
+        self._order = (None, None)
+        self._checks_since_order = 0
         self.violations = []
-    
-    def _load_rules(self, rules_file: str) -> List[Dict]:
-        """Load rules from JSON file"""
+
+    @property
+    def rules(self) -> List[Dict]:
+        return self.rule_set.rules
+
+    def _read_rules_file(self) -> bytes:
+        """Load raw rules JSON from file"""
         try:
-            with open(rules_file, "r") as f:
-                return json.load(f)
+            with open(self.rules_file, "rb") as f:
+                return f.read()
         except FileNotFoundError:
-            logger.warning(f"Rules file not found: {rules_file}. Using empty rules.")
-            return []
-    
-    def check_prompt(self, prompt: str) -> Tuple[bool, List[Dict]]:
+            logger.warning(f"Rules file not found: {self.rules_file}. Using empty rules.")
+            return b"[]"
+
+    def _compile(self, raw: bytes) -> CompiledRuleSet:
+        rules = json.loads(raw)
+        version = hashlib.sha256(raw).hexdigest()[:12]
+        return CompiledRuleSet(
+            rules,
+            version=version,
+            regex_timeout_ms=self.regex_timeout_ms,
+            timeout_action=self.timeout_action,
+            unsafe_action=self.unsafe_action
+        )
+
+    def reload(self) -> bool:
+        """
+        Re-read and recompile the rules file, then swap it in.
+        The running rule set is kept if the file is missing or invalid.
+        Returns True if a new rule set was activated.
+        """
+        with self._reload_lock:
+            try:
+                with open(self.rules_file, "rb") as f:
+                    raw = f.read()
+                rule_set = self._compile(raw)
+            except (OSError, ValueError) as e:
+                logger.error(f"Rule reload failed, keeping version {self.rule_set.version}: {e}")
+                return False
+
+            if rule_set.version == self.rule_set.version:
+                return False
+
+            # Single reference assignment: callers that already grabbed the
+            # previous rule set finish on it, new calls see the new one.
+            self.rule_set = rule_set
+            self.reloads += 1
+            logger.info(f"Rules reloaded: version={rule_set.version} rules={len(rule_set.rules)}")
+            return True
+
+    def version_info(self) -> Dict:
+        rule_set = self.rule_set
+        return {
+            "version": rule_set.version,
+            "compiled_at": rule_set.compiled_at,
+            "rules_file": self.rules_file,
+            "rule_count": len(rule_set.rules),
+            "reloads": self.reloads
+        }
+
+    def _evaluation_order(self, rule_set: CompiledRuleSet) -> List[str]:
+        version, order = self._order
+        self._checks_since_order += 1
+        if version != rule_set.version or self._checks_since_order >= ORDER_REFRESH_INTERVAL:
+            order = self.stats.order(rule_set)
+            self._order = (rule_set.version, order)
+            self._checks_since_order = 0
+        return order
+
+    def rule_stats(self) -> List[Dict]:
+        return self.stats.snapshot(self.rule_set)
+
+    def _handle_timeout(self, rule_set: CompiledRuleSet, unit: str, elapsed_ns: int) -> None:
+        timeouts = self.stats.timeouts(unit)
+        logger.warning(
+            f"Regex rule {unit} exceeded its time budget "
+            f"({elapsed_ns / 1e6:.1f} ms, {timeouts} timeouts, action={self.timeout_action})"
+        )
+        if self.disable_after and timeouts >= self.disable_after and unit not in rule_set.disabled:
+            rule_set.disabled.add(unit)
+            logger.error(f"Regex rule {unit} disabled after {timeouts} timeouts")
+
+    def check_prompt(self, prompt: str, mode: str = None, lowered: str = None) -> Tuple[bool, List[Dict]]:
         """
         Check prompt against all rules.
+        In "first_block" mode only the first violation found is reported.
+        lowered: prompt.lower(), if already computed by a shared normalization stage
         Returns (is_safe, violations_list)
         """
-        violations = []
-        
-        for rule in self.rules:
-            if self._evaluate_rule(prompt, rule):
-                violations.append({
-                    "rule_id": rule.get("id"),
-                    "rule_name": rule.get("name"),
-                    "severity": rule.get("severity", "medium")
-                })
-        
+        rule_set = self.rule_set
+        mode = mode or self.mode
+        timings = []
+
+        if mode == "first_block":
+            matched = rule_set.match(
+                prompt,
+                order=self._evaluation_order(rule_set),
+                first_only=True,
+                timings=timings,
+                lowered=lowered
+            )
+        else:
+            matched = rule_set.match(prompt, timings=timings, lowered=lowered)
+
+        violations = self._record(rule_set, timings, matched)
         is_safe = len(violations) == 0
         return is_safe, violations
-    
-    def _evaluate_rule(self, prompt: str, rule: Dict) -> bool:
-        """Evaluate a single rule against prompt"""
-        rule_type = rule.get("type")
-        
-        if rule_type == "regex":
-            pattern = rule.get("pattern")
-            return bool(re.search(pattern, prompt, re.IGNORECASE))
-        
-        elif rule_type == "keyword":
-            keywords = rule.get("keywords", [])
-            return any(kw.lower() in prompt.lower() for kw in keywords)
-        
-        # TODO: Add more rule types (token_limit, context_window, etc.)
-        return False
+
+    def check_increment(
+        self, scanner: IncrementalScanner, text: str, lowered: str = None
+    ) -> Tuple[bool, List[Dict]]:
+        """
+        Check the next piece of a conversation or stream, carrying matches
+        across the boundary with the previous piece (see IncrementalScanner).
+        All units are evaluated; the mode setting does not apply.
+        Returns (is_safe, violations_list) for rules matching in this piece.
+        """
+        rule_set = self.rule_set
+        timings = []
+        matched = scanner.feed(rule_set, text, lowered=lowered, timings=timings)
+        violations = self._record(rule_set, timings, matched)
+        return len(violations) == 0, violations
+
+    def _record(self, rule_set: CompiledRuleSet, timings: List, matched: List[int]) -> List[Dict]:
+        """
+        Feed stats and timeout handling; return the violation dicts for
+        matched. A match that is only a timed-out search (timeout_action
+        "block") is marked "timed_out", so it is not cached as a verdict.
+        """
+        self.stats.record(rule_set, timings)
+        timed_out_units = set()
+        for unit, elapsed_ns, _, timed_out in timings:
+            if timed_out:
+                timed_out_units.add(unit)
+                self._handle_timeout(rule_set, unit, elapsed_ns)
+
+        violations = []
+        for index in matched:
+            rule = rule_set.rules[index]
+            violation = {
+                "rule_id": rule.get("id"),
+                "rule_name": rule.get("name"),
+                "severity": rule.get("severity", "medium")
+            }
+            if rule_set.keys[index] in timed_out_units:
+                violation["timed_out"] = True
+            violations.append(violation)
+        return violations
 
 # Factory function
 def create_rule_engine(rules_file: str = "rules/default_rules.json") -> RuleEngine:
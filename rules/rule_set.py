@@ -0,0 +1,149 @@
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import regex
+
+from rules.aho_corasick import KeywordAutomaton
+from rules.redos import find_backtracking_risks
+
+logger = logging.getLogger(__name__)
+
+# Stats key for the shared keyword automaton; regex rules use their rule key
+KEYWORD_UNIT = "__keywords__"
+
+
+def rule_key(rule: Dict, index: int) -> str:
+    """Stable identifier for a rule across reloads"""
+    return str(rule.get("id") or f"rule_{index}")
+
+
+class CompiledRuleSet:
+    """
+    Pre-compiled form of a loaded rule list.
+
+    All keyword rules share one Aho-Corasick automaton over the lowercased
+    prompt, and every regex rule is compiled once up front, so a scan is a
+    single pass for keywords plus one search per regex.
+
+    The scan is split into evaluation units (the keyword automaton and one
+    unit per regex) so callers can reorder them and stop early.
+
+    Regexes run on the `regex` package under a per-rule time budget
+    (rule "timeout_ms", else regex_timeout_ms). A search that runs out of
+    budget counts as a match when timeout_action is "block" and as a miss
+    when it is "skip". Patterns with catastrophic-backtracking constructs
+    are logged at load time, or left out when unsafe_action is "reject".
+    Only `disabled` is mutated after construction.
+    """
+
+    def __init__(
+        self,
+        rules: List[Dict],
+        version: str = "unversioned",
+        regex_timeout_ms: float = 50.0,
+        timeout_action: str = "block",
+        unsafe_action: str = "warn"
+    ):
+        self.rules = rules
+        self.version = version
+        self.timeout_action = timeout_action
+        self.regexes = []
+        self.always_match = set()
+        self.unsafe: Dict[str, List[str]] = {}
+        self.disabled = set()
+
+        keyword_entries = []
+        for index, rule in enumerate(rules):
+            rule_type = rule.get("type")
+
+            if rule_type == "regex":
+                pattern = rule.get("pattern")
+                try:
+                    compiled = regex.compile(pattern, regex.IGNORECASE)
+                except (regex.error, TypeError) as e:
+                    logger.error(f"Invalid regex in rule {rule.get('id')}: {e}")
+                    continue
+
+                risks = find_backtracking_risks(pattern)
+                if risks:
+                    self.unsafe[rule_key(rule, index)] = risks
+                    if unsafe_action == "reject":
+                        logger.error(f"Rejected regex rule {rule.get('id')}: {', '.join(risks)}")
+                        continue
+                    logger.warning(f"Regex rule {rule.get('id')} may backtrack catastrophically: {', '.join(risks)}")
+
+                timeout = rule.get("timeout_ms", regex_timeout_ms) / 1000
+                self.regexes.append((index, compiled, timeout))
+
+            elif rule_type == "keyword":
+                for kw in rule.get("keywords", []):
+                    kw = kw.lower()
+                    if not kw:
+                        # An empty keyword is a substring of every prompt
+                        self.always_match.add(index)
+                    else:
+                        keyword_entries.append((kw, index))
+
+            # TODO: Add more rule types (token_limit, context_window, etc.)
+
+        self.automaton = KeywordAutomaton(keyword_entries)
+        self.keys = [rule_key(rule, index) for index, rule in enumerate(rules)]
+
+        self.units = []
+        if len(self.automaton):
+            self.units.append(KEYWORD_UNIT)
+        self.units.extend(self.keys[entry[0]] for entry in self.regexes)
+        self._regex_by_unit = {self.keys[entry[0]]: entry for entry in self.regexes}
+
+        self.compiled_at = datetime.now().isoformat()
+
+    def match(
+        self,
+        prompt: str,
+        order: Optional[Sequence[str]] = None,
+        first_only: bool = False,
+        timings: Optional[List] = None,
+        lowered: Optional[str] = None
+    ) -> List[int]:
+        """
+        Return the indices of matching rules, in rule file order.
+
+        order: evaluation order of units (defaults to self.units)
+        first_only: stop after the first unit that produces a match
+        timings: if given, (unit, elapsed_ns, matched_indices, timed_out)
+                 is appended for every unit evaluated
+        lowered: prompt.lower() if the caller already has it
+        """
+        matched = set(self.always_match)
+        if first_only and matched:
+            return sorted(matched)
+
+        for unit in (order if order is not None else self.units):
+            if unit in self.disabled:
+                continue
+            start = time.perf_counter_ns()
+            timed_out = False
+
+            if unit == KEYWORD_UNIT:
+                if lowered is None:
+                    lowered = prompt.lower()
+                hits, _ = self.automaton.search(lowered, stop_at_first=first_only)
+            else:
+                index, compiled, timeout = self._regex_by_unit[unit]
+                try:
+                    hits = (index,) if compiled.search(prompt, timeout=timeout) else ()
+                except TimeoutError:
+                    timed_out = True
+                    hits = (index,) if self.timeout_action == "block" else ()
+
+            if timings is not None:
+                timings.append((unit, time.perf_counter_ns() - start, hits, timed_out))
+
+            if hits:
+                matched.update(hits)
+                if first_only:
+                    break
+
+        return sorted(matched)
@@ -0,0 +1,91 @@
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from rules.rule_set import KEYWORD_UNIT, CompiledRuleSet
+
+
+class RuleStats:
+    """
+    Per-rule timing and hit counters.
+
+    Regex rules are timed individually; keyword rules share the cost of the
+    keyword automaton pass but are counted separately for hits. Counters
+    are keyed by rule id so they survive rule reloads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # unit -> [evaluations, total_ns, hits, timeouts]
+        self._units: Dict[str, List[int]] = {}
+        self._rule_hits: Dict[str, int] = {}
+
+    def record(
+        self,
+        rule_set: CompiledRuleSet,
+        timings: Iterable[Tuple[str, int, Sequence[int], bool]]
+    ) -> None:
+        with self._lock:
+            for unit, elapsed_ns, hits, timed_out in timings:
+                counters = self._units.setdefault(unit, [0, 0, 0, 0])
+                counters[0] += 1
+                counters[1] += elapsed_ns
+                if hits:
+                    counters[2] += 1
+                if timed_out:
+                    counters[3] += 1
+                for index in hits:
+                    key = rule_set.keys[index]
+                    self._rule_hits[key] = self._rule_hits.get(key, 0) + 1
+
+    def order(self, rule_set: CompiledRuleSet) -> List[str]:
+        """
+        Evaluation order that minimises expected cost until the first hit:
+        units sorted by average cost divided by hit rate.
+        """
+        with self._lock:
+            def expected_cost(unit: str) -> float:
+                evaluations, total_ns, hits, _ = self._units.get(unit, (0, 0, 0, 0))
+                if not evaluations:
+                    # Unmeasured units run first so they get measured
+                    return 0.0
+                avg_ns = total_ns / evaluations
+                hit_rate = hits / evaluations
+                return avg_ns / (hit_rate + 1e-3)
+
+            return sorted(rule_set.units, key=expected_cost)
+
+    def timeouts(self, unit: str) -> int:
+        with self._lock:
+            return self._units.get(unit, (0, 0, 0, 0))[3]
+
+    def snapshot(self, rule_set: CompiledRuleSet) -> List[Dict]:
+        """Per-rule statistics for the given rule set, most expensive first"""
+        with self._lock:
+            result = []
+            for index, rule in enumerate(rule_set.rules):
+                key = rule_set.keys[index]
+                unit = KEYWORD_UNIT if rule.get("type") == "keyword" else key
+                evaluations, total_ns, _, timeouts = self._units.get(unit, (0, 0, 0, 0))
+                hits = self._rule_hits.get(key, 0)
+                result.append({
+                    "rule_id": rule.get("id"),
+                    "rule_name": rule.get("name"),
+                    "type": rule.get("type"),
+                    "evaluations": evaluations,
+                    "hits": hits,
+                    "hit_rate": round(hits / evaluations, 4) if evaluations else 0.0,
+                    "avg_us": round(total_ns / evaluations / 1000, 3) if evaluations else 0.0,
+                    "total_ms": round(total_ns / 1e6, 3),
+                    "shared_cost": unit == KEYWORD_UNIT,
+                    "timeouts": timeouts,
+                    "disabled": unit in rule_set.disabled,
+                    "backtracking_risks": rule_set.unsafe.get(key, [])
+                })
+
+        result.sort(key=lambda r: r["total_ms"], reverse=True)
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._units.clear()
+            self._rule_hits.clear()
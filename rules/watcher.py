@@ -0,0 +1,57 @@
+import logging
+import os
+import threading
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RuleFileWatcher:
+    """
+    Background thread that polls a RuleEngine's rules file and triggers a
+    reload when its modification time or size changes.
+
+    Polling os.stat (rather than inotify-style events) also catches editors
+    and deploy tools that replace the file via rename.
+    """
+
+    def __init__(self, rule_engine, interval: float = 2.0):
+        self.rule_engine = rule_engine
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_stat = self._stat()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.rule_engine.rules_file)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="rule-file-watcher", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Watching {self.rule_engine.rules_file} every {self.interval}s")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            current = self._stat()
+            if current is None or current == self._last_stat:
+                continue
+            self._last_stat = current
+            try:
+                self.rule_engine.reload()
+            except Exception as e:
+                logger.error(f"Rule watcher reload error: {e}")
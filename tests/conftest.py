@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+# Read by backend.config at import: decide short prompts by rules and
+# heuristics and keep the classifier off the output screen, so the API
+# runs without loading the model
+os.environ.update({
+    "CASCADE_ENABLED": "true",
+    "MODEL_WARMUP": "false",
+    "VERDICT_CACHE_SIZE": "0",
+    "RULES_RELOAD_INTERVAL": "0",
+    "LLM_OUTPUT_CLASSIFIER": "false",
+    "RULES_FILE": os.path.abspath(os.path.join(ROOT, "rules", "default_rules.json")),
+})
+
+
+def serve(app):
+    """Run an ASGI app on a free local port in a background thread"""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    for _ in range(200):
+        if server.started:
+            break
+        time.sleep(0.02)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def stub_llm(latency_ms: float = 0, token_ms: float = 1, gzip: bool = False):
+    """
+    Stub LLM upstream: POST /generate answers after latency_ms with
+    {"model", "text"}, text echoing the prompt or given as "reply". With
+    "stream": true the text goes out one word every token_ms, as SSE or,
+    with "format": "text", as plain chunked text.
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.middleware.gzip import GZipMiddleware
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    if gzip:
+        app.add_middleware(GZipMiddleware, minimum_size=0)
+    app.state.calls = 0
+
+    @app.post("/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        await asyncio.sleep(latency_ms / 1000)
+        text = body.get("reply") or f"Echo: {body.get('prompt', '')}"
+        if not body.get("stream"):
+            return {"model": body.get("model"), "text": text}
+        sse = body.get("format", "sse") == "sse"
+
+        async def tokens():
+            for i, word in enumerate(f"{text} and some more ordinary text.".split(" ")):
+                if i:
+                    await asyncio.sleep(token_ms / 1000)
+                yield f"data: {json.dumps({'text': word + ' '})}\n\n" if sse else word + " "
+            if sse:
+                yield "data: [DONE]\n\n"
+
+        return StreamingResponse(tokens(), media_type="text/event-stream" if sse else "text/plain")
+
+    return app
+
+
+@pytest.fixture(scope="session")
+def stub():
+    """Stub LLM answering at once, one streamed word per millisecond"""
+    app = stub_llm()
+    server, thread, endpoint = serve(app)
+    yield app, endpoint
+    server.should_exit = True
+    thread.join()
+
+
+@pytest.fixture(scope="session")
+def gzip_stub():
+    """Stub LLM that gzip-compresses its responses"""
+    app = stub_llm(gzip=True)
+    server, thread, endpoint = serve(app)
+    yield app, endpoint
+    server.should_exit = True
+    thread.join()
+
+
+@pytest.fixture(scope="session")
+def slow_stub():
+    """Stub LLM that takes a second before answering"""
+    app = stub_llm(latency_ms=1000)
+    server, thread, endpoint = serve(app)
+    yield app, endpoint
+    server.should_exit = True
+    thread.join()
+
+
+@pytest.fixture(scope="session")
+def api(tmp_path_factory):
+    """TestClient over the API, with audit data and logs in a temp directory"""
+    from fastapi.testclient import TestClient
+
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("bastion"))
+    import backend.bastion_api as bastion_api
+    try:
+        with TestClient(bastion_api.app) as client:
+            yield bastion_api, client
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def use_proxy(api):
+    """Point the gateway at another upstream (or with other options) for one test"""
+    from backend.llm_server import create_llm_proxy
+
+    bastion_api, client = api
+    original = bastion_api.pipeline.llm_proxy
+    proxies = []
+
+    def use(endpoint, **options):
+        options = {
+            "output_screen": bastion_api.output_screen,
+            "classify_output": False,
+            "run_blocking": bastion_api.pipeline.executor.run,
+            "on_output_block": bastion_api.record_output_block,
+            **options
+        }
+        proxy = create_llm_proxy(endpoint, bastion_api.gateway_check, **options)
+        bastion_api.pipeline.llm_proxy = proxy
+        proxies.append(proxy)
+        return proxy
+
+    yield use
+    bastion_api.pipeline.llm_proxy = original
+    for proxy in proxies:
+        client.portal.call(proxy.aclose)
@@ -0,0 +1,28 @@
+from backend.audit_export import iter_log_chunks
+from backend.audit_logger import INSERT_WITH_ID_SQL, init_db, open_partition, write_rows
+
+
+def row(day: str, session_id: str) -> tuple:
+    return (f"{day} 12:00:00", session_id, 0.1, "Benign", "allow", 0.9, 0, 0, "m")
+
+
+def test_rows_past_the_committed_sequence_are_left_for_later(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    init_db()
+    today = open_partition("20260102")
+    write_rows(today, [row("2026-01-02", "a"), row("2026-01-02", "b")])
+    # A row whose id is past what the sequence has committed, as seen by
+    # a reader that got to this partition before the writer committed
+    with today:
+        today.execute(INSERT_WITH_ID_SQL, (4, *row("2026-01-02", "c")))
+
+    exported = [r for chunk in iter_log_chunks() for r in chunk]
+    assert [r[0] for r in exported] == [1, 2]
+
+    # id 3 committed late to an older partition is not skipped
+    yesterday = open_partition("20260101")
+    write_rows(yesterday, [row("2026-01-01", "late")])
+    exported = [r for chunk in iter_log_chunks(after_id=2) for r in chunk]
+    assert [(r[0], r[2]) for r in exported] == [(3, "late")]
+    today.close()
+    yesterday.close()
@@ -0,0 +1,52 @@
+import os
+import sqlite3
+
+import pytest
+
+from backend.audit_logger import init_db, open_partition, partition_path, write_rows
+from backend.audit_query import ReadPool, query_logs, query_stats, session_logs
+
+DAYS = [f"2026-01-{day:02d}" for day in range(1, 13)]
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    init_db()
+    for day in DAYS:
+        conn = open_partition(day.replace("-", ""))
+        write_rows(conn, [(f"{day} 12:00:00", "s1", 0.9, "RuleViolation", "block", 0.1, 1, 1, "m")])
+        conn.close()
+    pool = ReadPool(size=1, max_open=4)
+    yield pool
+    pool.close()
+
+
+def test_reader_keeps_a_bounded_number_of_partitions_open(pool):
+    assert len(query_logs(pool, limit=100)["logs"]) == len(DAYS)
+    with pool.reader() as reader:
+        assert len(reader._conns) == 4
+
+
+def test_partition_dropped_by_retention_is_skipped(pool):
+    query_logs(pool)
+    os.remove(partition_path("20260112"))
+    assert len(query_logs(pool)["logs"]) == len(DAYS) - 1
+    assert query_stats(pool, since="2026-01-12", until="2026-01-13")["totals"]["total"] == 0
+
+
+def test_unreadable_partition_is_an_error(pool):
+    # Present but without the audit tables: not to be mistaken for a dropped one
+    os.remove(partition_path("20260105"))
+    sqlite3.connect(partition_path("20260105")).execute("CREATE TABLE other (x)").connection.close()
+    with pytest.raises(sqlite3.OperationalError):
+        query_logs(pool, limit=100)
+    with pytest.raises(sqlite3.OperationalError):
+        query_stats(pool, since="2026-01-05", until="2026-01-06")
+
+
+def test_session_logs_pages_through_every_partition(pool):
+    logs = session_logs(pool, "s1")
+    assert [log["timestamp"][:10] for log in logs] == DAYS[::-1]
+    assert set(logs[0]) == {"timestamp", "risk_score", "decision", "integrity_score"}
+    assert session_logs(pool, "nobody") == []
@@ -0,0 +1,97 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from backend.audit_logger import build_log_record, init_db, list_partitions
+from backend.audit_writer import AuditRecord, AuditWriter
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    init_db()
+    return tmp_path
+
+
+def record(session_id: str) -> AuditRecord:
+    row, line = build_log_record(session_id, 0.1, "Benign", "allow", 0.9, 0, 0)
+    return AuditRecord(row, line)
+
+
+def stored_sessions():
+    sessions = []
+    for _, path in list_partitions():
+        with sqlite3.connect(path) as conn:
+            sessions += [row[0] for row in conn.execute("SELECT session_id FROM audit_logs ORDER BY id")]
+    return sessions
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_bad_record_does_not_stop_the_writer(workdir):
+    writer = AuditWriter(log_file="logs/bastion.log", overflow="block", max_queue=1)
+    writer.start()
+    # No timestamp to pick a partition by
+    writer.submit(AuditRecord((None,), "bad\n"))
+    writer.submit(record("after"))
+    deadline = time.monotonic() + 5
+    while writer.stats()["written"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.close()
+    assert stored_sessions() == ["after"]
+    assert writer.stats()["rejected"] == 1
+
+
+def test_failed_batch_is_spilled_and_replayed(workdir):
+    writer = AuditWriter(log_file="logs/bastion.log")
+    write = writer._write
+    calls = []
+
+    def fail_once(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        write(batch)
+
+    writer._write = fail_once
+    writer.start()
+    writer.submit(record("retried"))
+    writer.close()
+    assert stored_sessions() == ["retried"]
+    assert writer.stats()["spilled"] == 1
+
+
+def test_replay_rejects_truncated_lines(workdir):
+    spill = f"data/audit_spill.{dead_pid()}.jsonl"
+    with open(spill, "w") as f:
+        f.write(json.dumps(record("good")) + "\n")
+        f.write(json.dumps(record("cut"))[:20])
+    writer = AuditWriter(log_file="logs/bastion.log")
+    writer._replay_spill()
+    writer.close()
+    assert stored_sessions() == ["good"]
+    assert writer.stats()["rejected"] == 1
+    assert os.path.exists("data/audit_spill.rejected.jsonl")
+    assert not [name for name in os.listdir("data") if ".replay" in name]
+
+
+def test_replay_leaves_live_workers_spill_alone(workdir):
+    live = f"data/audit_spill.{os.getppid()}.jsonl"
+    legacy = "data/audit_spill.jsonl.replay"
+    for path, session_id in ((live, "live"), (legacy, "legacy")):
+        with open(path, "w") as f:
+            f.write(json.dumps(record(session_id)) + "\n")
+    writer = AuditWriter(log_file="logs/bastion.log")
+    writer._replay_spill()
+    writer.close()
+    assert stored_sessions() == ["legacy"]
+    assert os.path.exists(live)
@@ -0,0 +1,39 @@
+import os
+
+from backend.stream_analysis import StreamAnalyzer
+from rules.rule_engine import RuleEngine
+
+RULES_FILE = os.path.join(os.path.dirname(__file__), '..', 'rules', 'default_rules.json')
+
+CHUNK = ("Here is a detailed answer with several sentences of ordinary text. " * 16).encode()
+
+
+def feed_megabyte(analyzer: StreamAnalyzer) -> None:
+    for _ in range((1 << 20) // len(CHUNK)):
+        assert not analyzer.feed(CHUNK)
+
+
+def test_rules_only_screen_keeps_no_windows():
+    analyzer = StreamAnalyzer(RuleEngine(RULES_FILE), classify=False)
+    feed_megabyte(analyzer)
+    assert analyzer.take_windows() == []
+    assert analyzer._window == ""
+    assert analyzer.finish()["violations"] == []
+    assert analyzer.windows_scored == 0
+
+
+def test_deferred_windows_are_queued_until_taken():
+    analyzer = StreamAnalyzer(RuleEngine(RULES_FILE), window_chars=512, overlap_chars=128, defer_scoring=True)
+    analyzer.feed(CHUNK)
+    windows = analyzer.take_windows()
+    assert windows and all(len(window) == 512 for window in windows)
+    assert analyzer.take_windows() == []
+
+
+def test_gateway_output_screen_follows_classifier_setting(api):
+    bastion_api, _ = api
+    screen = bastion_api.output_screen()
+    # LLM_OUTPUT_CLASSIFIER=false in conftest
+    assert not screen.classify and not screen.defer_scoring
+    feed_megabyte(screen)
+    assert screen.take_windows() == []
@@ -0,0 +1,12 @@
+from types import SimpleNamespace
+
+import ml.classifier as classifier
+
+
+def test_warm_up_skips_empty_and_repeated_batch_sizes(monkeypatch):
+    batches = []
+    backend = SimpleNamespace(tokenizer=SimpleNamespace(pad_token_id=0), score=batches.append)
+    monkeypatch.setattr(classifier, "get_backend", lambda: backend)
+    # ML_BATCH_MAX_SIZE=0 turns batching off
+    classifier.warm_up(batch_sizes=(1, 0, 1), lengths=(4,))
+    assert [len(batch) for batch in batches] == [1]
@@ -233,6 +233,33 @@ with tab1:
 with tab2:
     st.header("Audit Trail")
 
+    # Summary from the per-minute rollups; cost does not depend on log size
+    try:
+        response = requests.get(f"{API_URL}/stats", params={"max_points": 60})
+
+        if response.status_code == 200:
+            stats = response.json()
+            totals = stats["totals"]
+
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Requests (last hour)", totals["total"])
+            col2.metric("Blocked", totals["decision"].get("block", 0))
+            col3.metric("Block rate", f"{totals['block_rate'] * 100:.1f}%")
+
+            if totals["total"]:
+                st.line_chart(
+                    {
+                        "total": [bucket["total"] for bucket in stats["series"]],
+                        "blocked": [bucket["decision"].get("block", 0) for bucket in stats["series"]]
+                    }
+                )
+                st.bar_chart(totals["violation_type"])
+        else:
+            st.error("Failed to fetch stats.")
+
+    except:
+        st.error("Backend not reachable.")
+
     try:
         response = requests.get(f"{API_URL}/logs/recent")
 